@@ -0,0 +1,260 @@
+"""CalibrationIQ: Configurable tolerance-allowance rules.
+
+Customers and programs grant different tolerance allowances depending on a
+feature's criticality, feature name, tolerance type and part family. A rule
+set is an ordered list of rules; the first rule matching a row decides its
+allowance fraction, and rows that match no rule get no allowance.
+
+The rule set is compiled once into one axis per key column, holding the
+values the rules name plus an "any other value" slot, and one match mask per
+rule and column. Rows are reduced to their combination of axis positions,
+and the first matching rule is resolved once per distinct combination in
+the data rather than once per row or per possible combination, so the
+compiled form stays linear in the number of rules. Spark evaluates the rules
+as one first-match CASE expression yielding an allowance id, and the id
+indexes a small array of the distinct allowances.
+"""
+
+import json
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+
+RULE_KEY_COLUMNS = ["criticality", "feature_name", "tolerance_type", "part_family"]
+ALLOWANCE_KEY = "allowance"
+
+
+def _normalize_rule(rule):
+    """Returns a rule as ({column: tuple of values}, Fraction allowance)."""
+    unknown = set(rule) - set(RULE_KEY_COLUMNS) - {ALLOWANCE_KEY}
+    if unknown:
+        raise ValueError(f"Unknown allowance rule keys: {sorted(unknown)}")
+    if ALLOWANCE_KEY not in rule:
+        raise ValueError(f"Allowance rule {rule} has no '{ALLOWANCE_KEY}'.")
+    allowance = Fraction(str(rule[ALLOWANCE_KEY]))
+    if allowance < 0:
+        raise ValueError(f"Allowance rule {rule} has a negative allowance.")
+    match = {}
+    for column in RULE_KEY_COLUMNS:
+        if column in rule:
+            values = rule[column]
+            if isinstance(values, str):
+                values = [values]
+            match[column] = tuple(str(value) for value in values)
+    return match, allowance
+
+
+def _axis_positions(values, axis):
+    """Returns each value's position on a table axis.
+
+    Values the rules do not name map to the trailing "other" slot.
+    Dictionary-encoded columns are looked up once per category and gathered
+    by code, so the labels are never decoded row by row.
+    """
+    other = len(axis)
+    if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.array
+    if isinstance(values, pd.Categorical):
+        lookup = axis.get_indexer(np.asarray(values.categories, dtype=object))
+        lookup[lookup < 0] = other
+        # Missing values have code -1 and pick up the trailing "other" slot.
+        return np.append(lookup, other)[values.codes]
+    positions = axis.get_indexer(np.asarray(values, dtype=object))
+    positions[positions < 0] = other
+    return positions
+
+
+class AllowanceRules:
+    """An ordered tolerance-allowance rule set compiled for fast lookups.
+
+    Each rule maps key columns (``RULE_KEY_COLUMNS``) to a value or a list
+    of values, plus the ``allowance`` fraction of the tolerance span to add
+    on each side. Omitted key columns match any value; columns missing from
+    the data only match rules that omit them.
+
+    Args:
+        rules: List of rule dicts, first match wins
+
+    Example:
+        >>> AllowanceRules([
+        ...     {"criticality": ["Critical", "Major"], "allowance": 0},
+        ...     {"tolerance_type": "UNILATERAL", "allowance": 0.1},
+        ...     {"allowance": 0.2},
+        ... ])
+    """
+
+    def __init__(self, rules):
+        self.rules = [dict(rule) for rule in rules]
+        self.matches = []
+        allowances = []
+        for rule in self.rules:
+            match, allowance = _normalize_rule(rule)
+            self.matches.append(match)
+            allowances.append(allowance)
+
+        self.columns = [
+            column
+            for column in RULE_KEY_COLUMNS
+            if any(column in match for match in self.matches)
+        ]
+        self.axes = {
+            column: pd.Index(
+                sorted(
+                    {value for match in self.matches for value in match.get(column, ())}
+                ),
+                dtype=object,
+            )
+            for column in self.columns
+        }
+        # One mask over each axis (including the "other" slot) per rule and
+        # named column; wildcard columns have no mask.
+        self.masks = []
+        for match in self.matches:
+            masks = {}
+            for column, values in match.items():
+                mask = np.zeros(len(self.axes[column]) + 1, dtype=bool)
+                mask[self.axes[column].get_indexer(list(values))] = True
+                masks[column] = mask
+            self.masks.append(masks)
+
+        # Each rule, and the trailing "no rule matched" entry, points at one
+        # of the distinct allowances.
+        self.allowances = sorted(set(allowances) | {Fraction(0)})
+        self.allowance_ids = np.array(
+            [self.allowances.index(allowance) for allowance in allowances]
+            + [self.allowances.index(Fraction(0))],
+            dtype=np.int64,
+        )
+        self.fractions_by_id = np.array(
+            [float(allowance) for allowance in self.allowances], dtype=np.float64
+        )
+        self.numerators_by_id = np.array(
+            [allowance.numerator for allowance in self.allowances], dtype=np.int64
+        )
+        self.denominators_by_id = np.array(
+            [allowance.denominator for allowance in self.allowances], dtype=np.int64
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Loads a rule set from a JSON file holding a list of rules."""
+        with open(path) as f:
+            return cls(json.load(f))
+
+    @property
+    def size(self):
+        """Number of distinct allowances the rules resolve to."""
+        return len(self.allowances)
+
+    def version(self):
+        """Returns a stable identifier of the rule set's contents."""
+        return json.dumps(
+            [_normalize_rule(rule) for rule in self.rules], sort_keys=True, default=str
+        )
+
+    def _first_match(self, positions):
+        """Returns the first matching rule of each row of axis positions.
+
+        Args:
+            positions: Mapping of column -> int64 axis positions, all of the
+                same length
+
+        Returns:
+            ndarray: Rule index per row, ``len(rules)`` where none matches
+        """
+        count = len(next(iter(positions.values()))) if positions else 1
+        rule = np.full(count, len(self.rules), dtype=np.int64)
+        undecided = np.ones(count, dtype=bool)
+        for index, masks in enumerate(self.masks):
+            matched = undecided.copy()
+            for column, mask in masks.items():
+                matched &= mask[positions[column]]
+            rule[matched] = index
+            undecided &= ~matched
+            if not undecided.any():
+                break
+        return rule
+
+    def _ids(self, df):
+        """Returns the allowance id of each row of a pandas DataFrame."""
+        if not self.columns:
+            return np.full(len(df), self.allowance_ids[self._first_match({})[0]])
+        # Rows are reduced to their distinct combinations of axis positions,
+        # so the rules are matched once per combination.
+        codes = np.zeros(len(df), dtype=np.int64)
+        for column in self.columns:
+            axis = self.axes[column]
+            if column in df:
+                positions = _axis_positions(df[column], axis)
+            else:
+                positions = np.full(len(df), len(axis), dtype=np.int64)
+            codes = codes * (len(axis) + 1) + positions
+        combinations, inverse = np.unique(codes, return_inverse=True)
+
+        positions = {}
+        for column in reversed(self.columns):
+            size = len(self.axes[column]) + 1
+            positions[column] = combinations % size
+            combinations = combinations // size
+        return self.allowance_ids[self._first_match(positions)][inverse.ravel()]
+
+    def fractions(self, df):
+        """Returns the allowance fraction of each row as a float64 array."""
+        return self.fractions_by_id[self._ids(df)]
+
+    def exact_fractions(self, df):
+        """Returns each row's allowance as int64 (numerator, denominator) arrays."""
+        ids = self._ids(df)
+        return self.numerators_by_id[ids], self.denominators_by_id[ids]
+
+    def spark_allowance_ids(self, df):
+        """Returns the allowance id of each Spark row as a first-match CASE.
+
+        Rules naming a column the data does not carry can never match and
+        are left out of the expression.
+        """
+        from pyspark.sql.functions import col, lit, when
+
+        case = None
+        for index, match in enumerate(self.matches):
+            if any(column not in df.columns for column in match):
+                continue
+            condition = lit(True)
+            for column, values in match.items():
+                condition = condition & col(column).isin(list(values))
+            allowance_id = lit(int(self.allowance_ids[index]))
+            case = (
+                when(condition, allowance_id)
+                if case is None
+                else case.when(condition, allowance_id)
+            )
+            if not match:
+                break
+        unmatched = lit(int(self.allowance_ids[-1]))
+        return unmatched if case is None else case.otherwise(unmatched)
+
+    @staticmethod
+    def _spark_lookup(ids, table, dtype):
+        from pyspark.sql.functions import array, element_at, lit
+
+        values = array(*[lit(value.item()) for value in table]).cast(f"array<{dtype}>")
+        return element_at(values, ids + 1)
+
+    def spark_fractions(self, df):
+        """Returns the allowance fraction of each Spark row as a double Column."""
+        return self._spark_lookup(
+            self.spark_allowance_ids(df), self.fractions_by_id, "double"
+        )
+
+    def spark_exact_fractions(self, ids):
+        """Returns the (numerator, denominator) long Columns of allowance ids.
+
+        Args:
+            ids: Column of ``spark_allowance_ids``, materialized once so the
+                CASE expression is not evaluated for each of the two lookups
+        """
+        return (
+            self._spark_lookup(ids, self.numerators_by_id, "long"),
+            self._spark_lookup(ids, self.denominators_by_id, "long"),
+        )
@@ -5,7 +5,10 @@
 # Purpose: Imports libraries, sets up configuration, and defines placeholders
 # for parameters that would normally be extracted from a live system like Jira.
 # ============================================================================
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import requests
 import json
 import base64
@@ -14,9 +17,51 @@ import re
 from decimal import Decimal
 from datetime import datetime
 
-print("=" * 80)
-print("BLOCK 1: CONFIGURATION & SETUP")
-print("=" * 80)
+from oot_engine import (
+    DEFAULT_ALLOWANCE_RULES,
+    STATUS_FAIL,
+    ErrorCurve,
+    encode_categories,
+    evaluate_fixed_point,
+    evaluate_fixed_point_spark,
+    evaluate_numpy,
+    evaluate_spark,
+    memory_footprint,
+    render_labels,
+    rule_config_version,
+)
+from allowance_rules import AllowanceRules
+from checkpoints import CheckpointStore
+from column_cache import open_column_cache
+from drift_model import DriftingDeviation, DriftModel, filter_to_window, window_mask
+from exposure_index import ExposureIndex
+from latest_readings import (
+    SOURCE_FILE_COLUMN,
+    SUPERSEDED_REASON_COLUMN,
+    latest_mask,
+    latest_readings,
+)
+from measurement_store import (
+    data_files,
+    files_for_window,
+    read_measurements,
+    read_measurements_spark,
+)
+from monte_carlo import simulate_nonconformance
+from part_rollup import part_reading_counts, rollup_parts
+from profiler import run_profiler, write_profile
+from result_cache import ResultCache, content_hash, result_key, snapshot_id
+from ticket_state import TicketState, analysis_signature
+from unit_conversion import (
+    LOGGED_UNIT_COLUMN,
+    UNIT_COLUMN,
+    canonical_unit,
+    known_units_mask,
+    logged_units,
+    normalize_units,
+    unit_counts,
+)
+from zone_maps import load_store_zone_map
 
 # --- Configuration (Replaced with Secure Placeholders) ---
 # In a real environment, these would be loaded from environment variables.
@@ -30,67 +75,635 @@ bc_number = "BC1234567"
 start_date = "01/01/2023"
 end_date = "12/31/2023"
 
-print("🚀 OOT ANALYSIS NOTEBOOK - CONFIGURATION")
-print(f"Jira Ticket:                 {jira_ticket}")
-print(f"BC Number:                   {bc_number}")
-print(f"Start Date:                  {start_date}")
-print(f"End Date:                    {end_date}")
-print("=" * 80)
+# --- Measurement Store ---
+# Path to a partitioned Parquet measurement store. When unset, Block 5-6
+# generates a sample history instead of querying the store. The store's zone
+# map is checked before the history is queried.
+MEASUREMENT_STORE_PATH = os.environ.get("CALIBRATIONIQ_MEASUREMENT_STORE")
+
+# Path to a local CSV measurement export (e.g. from generate_sample_data.py).
+# It is converted once into a memory-mapped column cache next to the file.
+MEASUREMENT_EXPORT_PATH = os.environ.get("CALIBRATIONIQ_MEASUREMENT_EXPORT")
+
+# --- Exposure Index ---
+# JSON file of the reverse index from serial numbers and jobs to OOT events.
+# Each completed ticket is recorded in it so disposition can look parts up
+# without rerunning the pipeline.
+EXPOSURE_INDEX_PATH = os.environ.get("CALIBRATIONIQ_EXPOSURE_INDEX")
+
+# --- Incremental Re-analysis ---
+# Directory for per-ticket evaluated readings and results. When set, a rerun
+# of an open ticket only reads the store files ingested since its previous
+# run and only evaluates measurements not analyzed before, including late
+# records dated inside the analyzed period.
+TICKET_STATE_DIR = os.environ.get("CALIBRATIONIQ_TICKET_STATE")
+
+# --- Result Cache ---
+# Directory of memoized ticket results. A rerun whose certificate, deviation,
+# tool, window, rules and measurement data are unchanged is served from it.
+RESULT_CACHE_DIR = os.environ.get("CALIBRATIONIQ_RESULT_CACHE")
+RESULT_CACHE_MAX_BYTES = 512 * 1024**2
+
+# --- Checkpoints ---
+# Directory for block-level checkpoints. An interrupted run of a ticket
+# resumes from the last completed block whose inputs are unchanged; the
+# checkpoints are removed once the run completes.
+CHECKPOINT_DIR = os.environ.get("CALIBRATIONIQ_CHECKPOINTS")
+
+# --- Allowance Rules ---
+# JSON file of the program's tolerance-allowance rules, keyed by criticality,
+# feature name, tolerance type and part family (first match wins). When
+# unset, key characteristics get no allowance and every other feature 20%.
+ALLOWANCE_RULES_PATH = os.environ.get("CALIBRATIONIQ_ALLOWANCE_RULES")
+
+# --- Profiling ---
+# Directory for per-run profiles. When set, the run is wrapped in a sampling
+# profiler (PROFILE_MODE = "cprofile" for the deterministic fallback) and a
+# collapsed-stack file and hotspot table are written there. Nothing is
+# started when unset.
+PROFILE_DIR = os.environ.get("CALIBRATIONIQ_PROFILE")
+PROFILE_MODE = "sampling"
+PROFILE_TOP_N = 25
+
+# --- Evaluation Mode ---
+# "float" evaluates Block 7 in binary floating point; "fixed_point" scales
+# every value to int64 steps of FIXED_POINT_RESOLUTION so the limit checks
+# are exact and reproducible.
+EVALUATION_MODE = "float"
+FIXED_POINT_RESOLUTION = "0.0000001"
+
+# --- Drift Model ---
+# When the certificate carries the tool's calibration history, a drift model
+# narrows the impact window to the period after the tool likely crossed its
+# limits. The estimated crossing is moved earlier by DRIFT_SAFETY_DAYS. Only
+# histories that fit a steady linear drift narrow the window.
+USE_DRIFT_MODEL = False
+DRIFT_SAFETY_DAYS = 30
+
+# --- Monte Carlo Analysis ---
+# When enabled, Block 7 also reports each part's probability of being out of
+# its expanded limits, given the certificate's measurement uncertainty.
+RUN_MONTE_CARLO = False
+MONTE_CARLO_DRAWS = 2000
+MONTE_CARLO_SEED = 12345
+GAUGE_REPEATABILITY = 0.0  # 1-sigma, in certificate units
+
+
+def calculate_deviation(measured, nominal):
+    """Calculates the tool's deviation: Deviation = Measured - Nominal.
+
+    Args:
+        measured: The measured value from the calibration certificate
+        nominal: The target/nominal value
+
+    Returns:
+        float: The deviation (measured - nominal)
+    """
+    return float(Decimal(str(measured)) - Decimal(str(nominal)))
+
+
+# Batch deviations subtract exact int64 counts of 1e-9 whenever a value has
+# at most this many decimal places; other values go through Decimal.
+BATCH_DECIMAL_PLACES = 9
+BATCH_SCALE = 10**BATCH_DECIMAL_PLACES
+# Scaled values below this bound are recovered exactly from their float.
+BATCH_EXACT_LIMIT = 2**51
+# Text of at most this many characters has at most 15 significant digits, so
+# a value that is not a multiple of 1e-9 cannot parse to the same float as one.
+BATCH_TEXT_LENGTH = 15
+# Rows per block; a block's temporaries stay in the CPU cache.
+BATCH_BLOCK_ROWS = 32768
+BATCH_DECIMAL_PATTERN = r"^[+-]?(?:\d+(?:\.\d{0,9})?|\.\d{1,9})$"
+# Spark subtracts in this decimal type; the difference still fits 38 digits.
+SPARK_DEVIATION_DECIMAL = "decimal(36,18)"
+
+
+def _batch_values(values):
+    """Returns values as a 1-D NumPy array, or an Arrow array for text.
+
+    Sequences go to Arrow directly, so lists of strings are not copied into
+    a fixed-width NumPy string array first.
+    """
+    if isinstance(values, np.ndarray) or np.isscalar(values):
+        return np.asarray(values).ravel()
+    try:
+        array = pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return np.asarray(values).ravel()
+    if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+        return array
+    if pa.types.is_floating(array.type) or pa.types.is_integer(array.type):
+        return array.to_numpy(zero_copy_only=False)
+    return np.asarray(values).ravel()
+
+
+def _text_floats(text):
+    """Parses Arrow text to float64, NaN where the text is not a decimal."""
+    try:
+        return pc.cast(text, pa.float64()).to_numpy(zero_copy_only=False)
+    except pa.ArrowInvalid:
+        # Exports with stray text take the slower path; NaN is never exact.
+        is_decimal = pc.match_substring_regex(text, BATCH_DECIMAL_PATTERN)
+        text = pc.if_else(is_decimal, text, pa.scalar(None, pa.string()))
+        return pc.cast(text, pa.float64()).to_numpy(zero_copy_only=False)
+
+
+def _scaled_decimals(values):
+    """Scales values to whole counts of 1e-9 where that is exact.
+
+    The counts are held as integer-valued float64 below ``BATCH_EXACT_LIMIT``,
+    so differences of two counts are exact as well.
+
+    Args:
+        values: ``_batch_values`` result, numbers or text
+
+    Returns:
+        tuple: (float64 array of scaled values, mask of the exact ones)
+    """
+    text = None
+    if isinstance(values, pa.Array):
+        text = values
+    elif values.dtype.kind not in "fiu":
+        text = pa.array(np.asarray(values, dtype=str))
+    if text is None:
+        floats = values.astype(np.float64, copy=False)
+    else:
+        floats = _text_floats(text)
+    scaled = np.multiply(floats, BATCH_SCALE)
+    np.rint(scaled, out=scaled)
+
+    # A float is exact when its shortest repr has at most
+    # BATCH_DECIMAL_PLACES places, i.e. the count maps back to it; short
+    # text is exact under the same test.
+    exact = np.divide(scaled, BATCH_SCALE) == floats
+    if text is not None:
+        lengths = pc.binary_length(text).to_numpy(zero_copy_only=False)
+        exact &= lengths <= BATCH_TEXT_LENGTH
+    limit = BATCH_EXACT_LIMIT / BATCH_SCALE
+    if not (len(floats) and -limit < floats.min() and floats.max() < limit):
+        with np.errstate(invalid="ignore"):
+            exact &= np.abs(floats) < limit
+    return scaled, exact
+
+
+def _batch_item(values, index):
+    """Returns one input value for the scalar fallback."""
+    value = values[index if len(values) > 1 else 0]
+    return value.as_py() if isinstance(value, pa.Scalar) else value
+
+
+def _is_spark_column(value):
+    try:
+        from pyspark.sql import Column
+    except ImportError:
+        return False
+    return isinstance(value, Column)
+
+
+def _spark_operand(value):
+    """Returns a Spark Column operand, wrapping a scalar in ``lit``.
+
+    The scalar's text is cast to the decimal type, as ``calculate_deviation``
+    parses ``str(value)``.
+
+    Raises:
+        TypeError: If ``value`` is a sequence, which cannot be aligned with
+            the rows of a Column
+    """
+    if _is_spark_column(value):
+        return value
+    if not np.isscalar(value):
+        raise TypeError(
+            "A Spark Column can only be combined with another Column or a scalar."
+        )
+    from pyspark.sql.functions import lit
+
+    return lit(str(value))
+
+
+def calculate_deviation_batch(measured, nominal):
+    """Calculates the deviations of many (measured, nominal) pairs at once.
+
+    Every deviation equals ``calculate_deviation`` of the same pair. Values
+    with at most nine decimal places are subtracted exactly as int64 counts
+    of 1e-9 and converted to float once; any other pair falls back to the
+    scalar Decimal calculation. Rows are processed in cache-sized blocks and
+    text is parsed by Arrow in bulk. Spark Columns are subtracted as
+    decimals.
+
+    Args:
+        measured: Sequence or array of measured values (numbers or numeric
+            strings), or a Spark Column
+        nominal: The nominal values, matching ``measured``; a Spark Column
+            may be paired with a scalar
+
+    Returns:
+        tuple: (float64 deviations, reads_high flags): True where the tool
+        reads HIGH (deviation > 0) and False where it reads LOW. Spark input
+        returns a double and a boolean Column
+
+    Raises:
+        ValueError: If the arrays differ in length
+        TypeError: If a Spark Column is paired with a sequence
+    """
+    if _is_spark_column(measured) or _is_spark_column(nominal):
+        measured, nominal = _spark_operand(measured), _spark_operand(nominal)
+        deviation = (
+            measured.cast(SPARK_DEVIATION_DECIMAL)
+            - nominal.cast(SPARK_DEVIATION_DECIMAL)
+        ).cast("double")
+        return deviation, deviation > 0
+
+    measured, nominal = _batch_values(measured), _batch_values(nominal)
+    rows = len(nominal) if len(measured) == 1 else len(measured)
+    if len(measured) != len(nominal) and 1 not in (len(measured), len(nominal)):
+        raise ValueError("measured and nominal must have the same length.")
+    deviations = np.empty(rows, dtype=np.float64)
+    exact = np.empty(rows, dtype=bool)
+    for start in range(0, rows, BATCH_BLOCK_ROWS):
+        block = slice(start, start + BATCH_BLOCK_ROWS)
+        measured_scaled, measured_exact = _scaled_decimals(
+            measured[block] if len(measured) > 1 else measured
+        )
+        nominal_scaled, nominal_exact = _scaled_decimals(
+            nominal[block] if len(nominal) > 1 else nominal
+        )
+        np.subtract(measured_scaled, nominal_scaled, out=deviations[block])
+        np.logical_and(measured_exact, nominal_exact, out=exact[block])
+    deviations /= BATCH_SCALE
+    if not exact.all():
+        for index in np.flatnonzero(~exact):
+            deviations[index] = calculate_deviation(
+                _batch_item(measured, index), _batch_item(nominal, index)
+            )
+    return deviations, deviations > 0
+
+
+# Block 3 stands in for the AI service with this extraction of the sample
+# certificate.
+SIMULATED_AI_RESPONSE = {
+    "parameter_name": "Inside Jaws at 1.0000 in",
+    "max_error_as_found": 0.9985,
+    "nominal_for_max_error": 1.0000,
+    "lower_limit": 0.9990,
+    "upper_limit": 1.0010,
+    "units": "in",
+    "expanded_uncertainty": 0.0002,
+    "coverage_factor": 2.0,
+    "check_points": [
+        {"nominal": 0.0000, "as_found": 0.0000},
+        {"nominal": 1.0000, "as_found": 0.9985},
+        {"nominal": 2.0000, "as_found": 1.9988},
+        {"nominal": 4.0000, "as_found": 3.9991},
+        {"nominal": 6.0000, "as_found": 5.9993},
+    ],
+    "calibration_history": [
+        {"date": "2021-01-05", "nominal": 1.0000, "as_found": 1.0000},
+        {"date": "2022-01-04", "nominal": 1.0000, "as_found": 0.9997},
+        {"date": "2023-01-01", "nominal": 1.0000, "as_found": 0.9994},
+        {"date": "2023-12-31", "nominal": 1.0000, "as_found": 0.9985},
+    ],
+}
+
+
+SAMPLE_MEASUREMENT_COLUMNS = [
+    "job_number",
+    "sample_serial_number",
+    "dimension_id",
+    "feature_name",
+    "measured_value",
+    "nominal_value",
+    "original_upper_tol",
+    "original_lower_tol",
+    "tolerance_type",
+    "criticality",
+    "tool_id",
+    "measurement_date",
+]
+
+SAMPLE_MEASUREMENTS = [
+    (
+        "WO-001",
+        "SN-101",
+        "Char 1",
+        "Hole Diameter",
+        0.5005,
+        0.5000,
+        0.5010,
+        0.4990,
+        "BILATERAL",
+        "Critical",
+        bc_number,
+        "2023-02-14",
+    ),
+    (
+        "WO-001",
+        "SN-101",
+        "Char 2",
+        "Step Height",
+        1.2510,
+        1.2500,
+        1.2520,
+        1.2480,
+        "BILATERAL",
+        "Major",
+        bc_number,
+        "2023-02-14",
+    ),
+    (
+        "WO-002",
+        "SN-201",
+        "Char 5",
+        "Outer Diameter",
+        3.0001,
+        3.0000,
+        3.0005,
+        2.9995,
+        "BILATERAL",
+        "NotSpecified",
+        bc_number,
+        "2023-07-11",
+    ),
+    (
+        "WO-002",
+        "SN-201",
+        "Char 6",
+        "Groove Depth",
+        0.1008,
+        0.1000,
+        0.1010,
+        0.0990,
+        "BILATERAL",
+        "NotSpecified",
+        bc_number,
+        "2023-07-11",
+    ),
+    (
+        "WO-003",
+        "SN-301",
+        "Char 9",
+        "Slot Width",
+        0.7511,
+        0.7500,
+        0.7510,
+        0.7490,
+        "BILATERAL",
+        "Minor",
+        bc_number,
+        "2023-10-03",
+    ),
+]
+
+
+def generate_sample_dataframe(spark_session):
+    """Generates a sample DataFrame simulating historical measurements.
+
+    Returns a Spark DataFrame when a SparkSession is available and a pandas
+    DataFrame for the local NumPy engine otherwise.
+    """
+    if not spark_session:
+        df = pd.DataFrame(SAMPLE_MEASUREMENTS, columns=SAMPLE_MEASUREMENT_COLUMNS)
+        print("✅ Sample pandas DataFrame generated for the local NumPy engine.")
+        return df
+
+    df = spark_session.createDataFrame(SAMPLE_MEASUREMENTS, SAMPLE_MEASUREMENT_COLUMNS)
+    print("✅ Sample Spark DataFrame generated successfully.")
+    return df
+
+
+def take_history(df, rows, target_unit):
+    """Takes the selected rows of a pandas history in the certificate's unit.
+
+    The ingestion filters only mark rows of the loaded history, which may be
+    memory-mapped; this is where the selected rows are copied.
+
+    Args:
+        df: pandas DataFrame of the loaded history
+        rows: Boolean mask of the rows to take
+        target_unit: The certificate's unit
+
+    Returns:
+        DataFrame: The selected rows, rescaled into ``target_unit``
+    """
+    if not rows.all():
+        df = df[rows]
+    return normalize_units(df, target_unit)[0]
+
+
+def evaluate_history(df, tool_deviation, allowance_rules):
+    """Evaluates measurements with the engine of ``df`` and the configured mode.
+
+    Args:
+        df: pandas or Spark DataFrame of measurements
+        tool_deviation: Scalar deviation, ``ErrorCurve`` or drifting deviation
+        allowance_rules: The ``AllowanceRules`` in use
+
+    Returns:
+        DataFrame: ``df`` with the Block 7 columns
+    """
+    spark = hasattr(df, "rdd")
+    if spark and EVALUATION_MODE == "fixed_point":
+        return evaluate_fixed_point_spark(
+            df, tool_deviation, FIXED_POINT_RESOLUTION, allowance_rules
+        )
+    if spark:
+        return evaluate_spark(df, tool_deviation, allowance_rules)
+    if EVALUATION_MODE == "fixed_point":
+        return evaluate_fixed_point(
+            df, tool_deviation, FIXED_POINT_RESOLUTION, allowance_rules
+        )
+    return evaluate_numpy(df, tool_deviation, allowance_rules)
+
+
+class TicketRun:
+    """State of one ticket's analysis, handed from each block to the next.
+
+    Each block reads what the earlier blocks set and adds its own results.
+    """
+
+    def __init__(self):
+        # Block 1
+        self.allowance_rules = DEFAULT_ALLOWANCE_RULES
+        self.checkpoints = None
+        self.profiler = None
+        # Block 2 & 3
+        self.pdf_hash = None
+        self.extraction_fingerprint = None
+        self.caliper_data = {}
+        self.measured_val = None
+        self.nominal_val = None
+        self.lower_limit = None
+        self.upper_limit = None
+        self.units = None
+        self.check_points = []
+        self.calibration_history = []
+        self.deviation_uncertainty = 0.0
+        # Block 4
+        self.window_start = None
+        self.window_end = None
+        self.deviation_value_inches = None
+        self.tool_deviation = None
+        self.deviation_fingerprint = None
+        # Block 5 & 6
+        self.spark = None
+        self.data_snapshot = None
+        self.result_cache = None
+        self.cache_key = None
+        self.cached_result = None
+        self.ticket_state = None
+        self.incremental_run = False
+        self.store_files = None
+        self.no_new_readings = False
+        self.history_fingerprint = None
+        self.history_checkpoint = None
+        self.stored_zone_map = None
+        self.cleared_before_query = False
+        self.no_measurements_found = True
+        self.all_measurements_df = None
+        self.fresh_history = False
+        self.cached_history_df = None
+        self.logged_units = None
+        self.history_df = None
+        self.history_rows = None
+        self.window_measurements_df = None
+        # Block 7
+        self.evaluation_fingerprint = None
+        self.evaluation_checkpoint = None
+        self.cleared_by_zone_map = False
+        # Block 8
+        self.failures_fingerprint = None
+        self.failure_checkpoint = None
+        self.failures_df = None
+        self.failure_count = 0
+        self.report_artifacts = {}
+
+
+def show_rows(df, columns, spark):
+    """Prints the rows of a set-aside history, only ``columns`` on pandas."""
+    if spark:
+        df.show()
+    else:
+        print(df[columns].to_string(index=False))
+
+
+def print_artifacts(artifacts):
+    """Prints the text report artifacts of a stored run."""
+    for name, text in artifacts.items():
+        print(f"--- {name} ---")
+        print(text)
+
+
+def configure_run():
+    """Block 1: prints the ticket's configuration and starts its run."""
+    print("=" * 80)
+    print("BLOCK 1: CONFIGURATION & SETUP")
+    print("=" * 80)
+
+    print("🚀 OOT ANALYSIS NOTEBOOK - CONFIGURATION")
+    print(f"Jira Ticket:                 {jira_ticket}")
+    print(f"BC Number:                   {bc_number}")
+    print(f"Start Date:                  {start_date}")
+    print(f"End Date:                    {end_date}")
+    print(f"Evaluation Mode:             {EVALUATION_MODE}")
+
+    run = TicketRun()
+    # The rule table is compiled once into per-rule match masks for both engines.
+    if ALLOWANCE_RULES_PATH:
+        run.allowance_rules = AllowanceRules.load(ALLOWANCE_RULES_PATH)
+    print(
+        f"Allowance Rules:             {len(run.allowance_rules.rules)} rules, "
+        f"{run.allowance_rules.size} distinct allowances"
+    )
+    print("=" * 80)
+
+    if CHECKPOINT_DIR:
+        run.checkpoints = CheckpointStore(CHECKPOINT_DIR, jira_ticket)
+    if PROFILE_DIR:
+        run.profiler = run_profiler(PROFILE_MODE).start()
+        print(f"⏱️ Profiling this run ({PROFILE_MODE}) into {PROFILE_DIR}.")
+    return run
 
-# --- Initialize Global Variables for the script ---
-selected_pdf_base64 = ""
-selected_pdf_filename = "sample_cal_cert.pdf"
-caliper_data = {}
-no_measurements_found = True
 
 # ============================================================================
 # Block 2: PDF Data Simulation
 # Purpose: Simulates fetching a PDF calibration certificate and encoding it.
 # This avoids needing a live connection to a ticket system.
 # ============================================================================
-print("\nBLOCK 2: PDF DATA SIMULATION")
-try:
-    fake_pdf_content = b"%PDF-1.4\nFake calibration certificate content."
-    selected_pdf_base64 = base64.b64encode(fake_pdf_content).decode("utf-8")
-    print(f"✅ PDF processing simulated for: '{selected_pdf_filename}'")
-except Exception as e:
-    print(f"❌ ERROR in Block 2: {e}")
+def simulate_pdf(run):
+    """Block 2: encodes the ticket's (simulated) calibration certificate."""
+    print("\nBLOCK 2: PDF DATA SIMULATION")
+    selected_pdf_filename = "sample_cal_cert.pdf"
+    try:
+        fake_pdf_content = b"%PDF-1.4\nFake calibration certificate content."
+        selected_pdf_base64 = base64.b64encode(fake_pdf_content).decode("utf-8")
+        run.pdf_hash = content_hash(fake_pdf_content)
+        print(
+            f"✅ PDF processing simulated for: '{selected_pdf_filename}' "
+            f"({len(selected_pdf_base64)} base64 characters)"
+        )
+    except Exception as e:
+        print(f"❌ ERROR in Block 2: {e}")
+
 
 # ============================================================================
 # Block 3: AI-Powered Data Extraction Simulation
 # Purpose: Simulates calling an AI model to extract data from the PDF.
 # A hardcoded JSON response makes the project runnable without a live service.
 # ============================================================================
-print("\nBLOCK 3: AI-POWERED DATA EXTRACTION SIMULATION")
-simulated_ai_response = {
-    "parameter_name": "Inside Jaws at 1.0000 in",
-    "max_error_as_found": 0.9985,
-    "nominal_for_max_error": 1.0000,
-    "lower_limit": 0.9990,
-    "upper_limit": 1.0010,
-    "units": "in",
-}
+def extract_certificate(run):
+    """Block 3: extracts the certificate's results, or resumes them."""
+    print("\nBLOCK 3: AI-POWERED DATA EXTRACTION SIMULATION")
 
-try:
-    caliper_data = simulated_ai_response
-    measured_val = float(caliper_data["max_error_as_found"])
-    nominal_val = float(caliper_data["nominal_for_max_error"])
-    lower_limit = float(caliper_data["lower_limit"])
-    upper_limit = float(caliper_data["upper_limit"])
-    units = caliper_data["units"]
-    parameter_name = caliper_data["parameter_name"]
-
-    if measured_val < lower_limit:
-        violated_limit = lower_limit
-        limit_type = "LOW LIMIT"
-    else:
-        violated_limit = upper_limit
-        limit_type = "HIGH LIMIT"
+    # The extraction is checkpointed per certificate, so a resumed run does not
+    # call the AI service again.
+    run.extraction_fingerprint = analysis_signature({"pdf_hash": run.pdf_hash})
+    extraction_checkpoint = None
+    if run.checkpoints is not None:
+        extraction_checkpoint = run.checkpoints.load(
+            "extraction", run.extraction_fingerprint
+        )
+
+    try:
+        if extraction_checkpoint is not None:
+            run.caliper_data = extraction_checkpoint["data"]
+            print(
+                "⏩ Resumed from checkpoint: extraction saved "
+                f"{extraction_checkpoint['created']}; AI call skipped."
+            )
+        else:
+            run.caliper_data = SIMULATED_AI_RESPONSE
+        caliper_data = run.caliper_data
+        run.measured_val = float(caliper_data["max_error_as_found"])
+        run.nominal_val = float(caliper_data["nominal_for_max_error"])
+        run.lower_limit = float(caliper_data["lower_limit"])
+        run.upper_limit = float(caliper_data["upper_limit"])
+        run.units = caliper_data["units"]
+        parameter_name = caliper_data["parameter_name"]
+        run.check_points = caliper_data.get("check_points", [])
+        run.calibration_history = caliper_data.get("calibration_history", [])
+        # Certificates state an expanded uncertainty U = k * u; the Monte Carlo
+        # analysis draws from the standard uncertainty u.
+        expanded_uncertainty = float(caliper_data.get("expanded_uncertainty", 0.0))
+        coverage_factor = float(caliper_data.get("coverage_factor", 2.0))
+        run.deviation_uncertainty = expanded_uncertainty / coverage_factor
 
-    print("✅ AI data extraction simulated successfully.")
-    print(json.dumps(caliper_data, indent=2))
-except (KeyError, ValueError) as e:
-    print(f"❌ ERROR in Block 3: {e}")
+        if run.measured_val < run.lower_limit:
+            violated_limit = run.lower_limit
+            limit_type = "LOW LIMIT"
+        else:
+            violated_limit = run.upper_limit
+            limit_type = "HIGH LIMIT"
+
+        print("✅ AI data extraction simulated successfully.")
+        print(
+            f"   -> {parameter_name}: as found {run.measured_val} {run.units} is "
+            f"beyond the {limit_type} ({violated_limit} {run.units})."
+        )
+        print(json.dumps(caliper_data, indent=2))
+        if run.checkpoints is not None and extraction_checkpoint is None:
+            run.checkpoints.save("extraction", run.extraction_fingerprint, caliper_data)
+    except (KeyError, ValueError) as e:
+        print(f"❌ ERROR in Block 3: {e}")
 
 
 # ============================================================================
@@ -98,31 +711,90 @@ except (KeyError, ValueError) as e:
 # Purpose: Calculates the tool's error (deviation) and interprets its
 # physical impact on measurements.
 # ============================================================================
-print("\nBLOCK 4: DEVIATION CALCULATION & VALIDATION")
+def calculate_tool_deviation(run):
+    """Block 4: calculates the tool deviation applied to the history."""
+    print("\nBLOCK 4: DEVIATION CALCULATION & VALIDATION")
+    run.window_start = pd.to_datetime(start_date, format="%m/%d/%Y")
+    run.window_end = pd.to_datetime(end_date, format="%m/%d/%Y")
+    units = run.units
+    try:
+        run.deviation_value_inches = calculate_deviation(
+            run.measured_val, run.nominal_val
+        )
+        direction = "HIGH" if run.deviation_value_inches > 0 else "LOW"
+        print(
+            f"✅ Deviation calculated: {run.deviation_value_inches:+.6f} {units} "
+            f"(Caliper reads {direction})"
+        )
 
+        # Multi-point certificates give a size-dependent error curve that Block 7
+        # interpolates per measurement instead of applying one scalar everywhere.
+        run.tool_deviation = run.deviation_value_inches
+        if len(run.check_points) > 1:
+            check_point_errors, _ = calculate_deviation_batch(
+                [point["as_found"] for point in run.check_points],
+                [point["nominal"] for point in run.check_points],
+            )
+            run.tool_deviation = ErrorCurve(
+                [point["nominal"] for point in run.check_points], check_point_errors
+            )
+            print(f"✅ Error curve built from {len(run.check_points)} check points:")
+            for nominal, error in zip(
+                run.tool_deviation.nominals, run.tool_deviation.errors
+            ):
+                print(f"   -> {nominal:.4f} {units}: {error:+.6f} {units}")
 
-def calculate_deviation(measured, nominal):
-    """Calculates the tool's deviation: Deviation = Measured - Nominal.
+        apply_drift_model(run)
+    except Exception as e:
+        print(f"❌ ERROR in Block 4: {e}")
 
-    Args:
-        measured: The measured value from the calibration certificate
-        nominal: The target/nominal value
+    # The deviation is rebuilt from the extraction in milliseconds; its
+    # fingerprint chains the extraction into every later checkpoint.
+    run.deviation_fingerprint = analysis_signature(
+        {
+            "extraction": run.extraction_fingerprint,
+            "window": [run.window_start, run.window_end],
+            "drift_model": USE_DRIFT_MODEL,
+            "drift_safety_days": DRIFT_SAFETY_DAYS,
+        }
+    )
 
-    Returns:
-        float: The deviation (measured - nominal)
-    """
-    return float(Decimal(str(measured)) - Decimal(str(nominal)))
 
+def apply_drift_model(run):
+    """Narrows the window and scales the deviation by the tool's drift.
 
-try:
-    deviation_value_inches = calculate_deviation(measured_val, nominal_val)
-    direction = "HIGH" if deviation_value_inches > 0 else "LOW"
+    A drift model over the tool's calibration history narrows the impact
+    window and scales the deviation to the error present on each date.
+    """
+    if not USE_DRIFT_MODEL or len(run.calibration_history) <= 1:
+        return
+    history_errors, _ = calculate_deviation_batch(
+        [point["as_found"] for point in run.calibration_history],
+        [point["nominal"] for point in run.calibration_history],
+    )
+    drift_model = DriftModel.fit(
+        [point["date"] for point in run.calibration_history], history_errors
+    )
+    if not drift_model.is_linear:
+        print(
+            "⚠️ Drift model: calibration history is not steady linear drift "
+            f"(R² {drift_model.r_squared:.3f}); full window kept."
+        )
+        return
+    run.window_start, run.window_end = drift_model.at_risk_window(
+        run.window_start,
+        run.window_end,
+        run.lower_limit - run.nominal_val,
+        run.upper_limit - run.nominal_val,
+        safety_days=DRIFT_SAFETY_DAYS,
+    )
+    run.tool_deviation = DriftingDeviation(
+        run.tool_deviation, drift_model, run.window_end
+    )
     print(
-        f"✅ Deviation calculated: {deviation_value_inches:+.6f} {units} "
-        f"(Caliper reads {direction})"
+        f"✅ Drift model: {drift_model.slope_per_day * 365:+.6f} {run.units}/year; "
+        f"at-risk window {run.window_start:%m/%d/%Y} to {run.window_end:%m/%d/%Y}"
     )
-except Exception as e:
-    print(f"❌ ERROR in Block 4: {e}")
 
 
 # ============================================================================
@@ -130,106 +802,444 @@ except Exception as e:
 # Purpose: Simulates querying a database for historical measurements.
 # For this portfolio version, we generate a sample Pandas DataFrame.
 # ============================================================================
-print("\nBLOCK 5 & 6: HISTORICAL DATA SIMULATION")
+def start_spark():
+    """Returns the SparkSession, or None when PySpark is not installed."""
+    try:
+        from pyspark.sql import SparkSession
+
+        spark = SparkSession.builder.appName("CalibrationIQ_Portfolio").getOrCreate()
+        print("✅ SparkSession created (or retrieved).")
+        return spark
+    except ImportError:
+        print(
+            "⚠️ PySpark not found. This script should be run in a PySpark environment."
+        )
+        return None
 
-try:
-    from pyspark.sql import SparkSession
 
-    spark = SparkSession.builder.appName("CalibrationIQ_Portfolio").getOrCreate()
-    print("✅ SparkSession created (or retrieved).")
-except ImportError:
-    print("⚠️ PySpark not found. This script should be run in a PySpark environment.")
-    spark = None
+def load_history(run):
+    """Block 5 & 6: loads the tool's latest readings in the impact window."""
+    print("\nBLOCK 5 & 6: HISTORICAL DATA SIMULATION")
+    run.spark = start_spark()
+    check_result_cache(run)
+    load_ticket_state(run)
+    load_history_checkpoint(run)
+    check_store_zone_map(run)
+    query_history(run)
+    encode_history(run)
 
+    if run.fresh_history:
+        if run.spark:
+            cache_history(run)
+        set_aside_unknown_units(run)
+        apply_history_window(run)
+        keep_latest_readings(run)
+        if run.incremental_run:
+            skip_analyzed_readings(run)
+    take_window(run)
 
-def generate_sample_dataframe(spark_session):
-    """Generates a sample Spark DataFrame simulating historical measurements."""
-    if not spark_session:
-        print("   -> Skipping DataFrame generation as Spark is not available.")
-        return None
+    if (
+        run.checkpoints is not None
+        and run.history_checkpoint is None
+        and run.all_measurements_df is not None
+    ):
+        run.checkpoints.save(
+            "history",
+            run.history_fingerprint,
+            {
+                "incremental_run": run.incremental_run,
+                "store_files": run.store_files,
+                "no_new_readings": run.no_new_readings,
+            },
+            {"history": run.all_measurements_df},
+        )
+
+
+def check_result_cache(run):
+    """Serves the ticket from the result cache when its inputs are unchanged.
+
+    A ticket whose inputs and measurement data are unchanged since a
+    previous run is served without querying the history.
+    """
+    if MEASUREMENT_STORE_PATH:
+        run.data_snapshot = snapshot_id(MEASUREMENT_STORE_PATH)
+    elif MEASUREMENT_EXPORT_PATH and not run.spark:
+        run.data_snapshot = snapshot_id(MEASUREMENT_EXPORT_PATH)
+    else:
+        run.data_snapshot = analysis_signature(SAMPLE_MEASUREMENTS)
+    if not RESULT_CACHE_DIR:
+        return
+
+    run.cache_key = result_key(
+        run.pdf_hash,
+        {
+            "deviation": run.deviation_value_inches,
+            "check_points": run.check_points,
+            "calibration_history": (
+                run.calibration_history if USE_DRIFT_MODEL else None
+            ),
+            "drift_safety_days": DRIFT_SAFETY_DAYS,
+        },
+        bc_number,
+        (run.window_start, run.window_end),
+        rule_config_version(run.allowance_rules),
+        run.data_snapshot,
+        evaluation_mode=EVALUATION_MODE,
+        resolution=FIXED_POINT_RESOLUTION,
+    )
+    run.result_cache = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES)
+    run.cached_result = run.result_cache.get(run.cache_key)
+    if run.cached_result is not None:
+        print(
+            f"🗄️ SERVED FROM CACHE: result {run.cache_key[:12]} computed "
+            f"{run.cached_result['created']}; history query and evaluation skipped."
+        )
 
-    sample_data = [
-        (
-            "WO-001",
-            "SN-101",
-            "Char 1",
-            "Hole Diameter",
-            0.5005,
-            0.5000,
-            0.5010,
-            0.4990,
-            "BILATERAL",
-            "Critical",
-        ),
-        (
-            "WO-001",
-            "SN-101",
-            "Char 2",
-            "Step Height",
-            1.2510,
-            1.2500,
-            1.2520,
-            1.2480,
-            "BILATERAL",
-            "Major",
-        ),
-        (
-            "WO-002",
-            "SN-201",
-            "Char 5",
-            "Outer Diameter",
-            3.0001,
-            3.0000,
-            3.0005,
-            2.9995,
-            "BILATERAL",
-            "NotSpecified",
-        ),
-        (
-            "WO-002",
-            "SN-201",
-            "Char 6",
-            "Groove Depth",
-            0.1008,
-            0.1000,
-            0.1010,
-            0.0990,
-            "BILATERAL",
-            "NotSpecified",
-        ),
-        (
-            "WO-003",
-            "SN-301",
-            "Char 9",
-            "Slot Width",
-            0.7511,
-            0.7500,
-            0.7510,
-            0.7490,
-            "BILATERAL",
-            "Minor",
-        ),
-    ]
-    schema = [
-        "job_number",
-        "sample_serial_number",
-        "dimension_id",
-        "feature_name",
-        "measured_value",
-        "nominal_value",
-        "original_upper_tol",
-        "original_lower_tol",
-        "tolerance_type",
-        "criticality",
-    ]
-    df = spark_session.createDataFrame(sample_data, schema)
-    global no_measurements_found
-    no_measurements_found = False
-    print("✅ Sample Spark DataFrame generated successfully.")
-    return df
 
+def load_ticket_state(run):
+    """Loads the readings and results of the ticket's previous runs.
+
+    A rerun of an open ticket skips the readings evaluated by previous runs,
+    as long as the certificate and configuration are unchanged. From a
+    measurement store it only reads the files ingested since, which also
+    hold the records that arrived late; an export is read in full.
+    """
+    if TICKET_STATE_DIR:
+        ticket_signature = analysis_signature(
+            {
+                "certificate": run.caliper_data,
+                "tool": bc_number,
+                "store": MEASUREMENT_STORE_PATH,
+                "window": [run.window_start, run.window_end],
+                "evaluation_mode": EVALUATION_MODE,
+                "resolution": FIXED_POINT_RESOLUTION,
+                "rules": rule_config_version(run.allowance_rules),
+                "drift_model": USE_DRIFT_MODEL,
+                "drift_safety_days": DRIFT_SAFETY_DAYS,
+            }
+        )
+        run.ticket_state = TicketState.load(
+            TICKET_STATE_DIR, jira_ticket, ticket_signature
+        )
+        if run.ticket_state is None:
+            run.ticket_state = TicketState(jira_ticket, ticket_signature)
+    run.incremental_run = (
+        run.ticket_state is not None and run.ticket_state.evaluated_rows > 0
+    )
+
+
+def load_history_checkpoint(run):
+    """Resumes an interrupted run from its checkpointed history.
+
+    The checkpoint keeps the run's incremental mode and the store files it
+    read, since Block 8 may already have moved the ticket's evaluated
+    readings and ingestion watermark past these rows.
+    """
+    if run.checkpoints is None or run.cached_result is not None:
+        return
+    run.history_fingerprint = analysis_signature(
+        {
+            "deviation": run.deviation_fingerprint,
+            "tool": bc_number,
+            "data_snapshot": run.data_snapshot,
+            "engine": "spark" if run.spark else "numpy",
+            "ticket_state": run.ticket_state is not None,
+        }
+    )
+    run.history_checkpoint = run.checkpoints.load(
+        "history", run.history_fingerprint, run.spark
+    )
+    if run.history_checkpoint is not None:
+        run.incremental_run = run.history_checkpoint["data"]["incremental_run"]
+        run.store_files = run.history_checkpoint["data"]["store_files"]
+        run.no_new_readings = run.history_checkpoint["data"]["no_new_readings"]
+        print(
+            "⏩ Resumed from checkpoint: history saved "
+            f"{run.history_checkpoint['created']}; history query skipped."
+        )
+
+
+def check_store_zone_map(run):
+    """Checks the store's zone map before the history is queried.
+
+    The ingestion job keeps the store's zone map current. When it shows that
+    the deviation cannot fail any of the tool's measurements, the detail
+    history is not read at all. Monte Carlo reports every reading and the
+    exposure index records the measured parts, so those still read it.
+    """
+    if (
+        MEASUREMENT_STORE_PATH
+        and run.cached_result is None
+        and run.history_checkpoint is None
+    ):
+        run.stored_zone_map = load_store_zone_map(
+            MEASUREMENT_STORE_PATH, run.allowance_rules, run.units
+        )
+        if run.stored_zone_map is None:
+            print("⚠️ Zone map: the store's zone map is missing or outdated.")
+    run.cleared_before_query = (
+        run.stored_zone_map is not None
+        and not (RUN_MONTE_CARLO and not run.spark)
+        and not EXPOSURE_INDEX_PATH
+        and run.stored_zone_map.can_clear(bc_number, run.tool_deviation)
+    )
+
+
+def query_history(run):
+    """Reads the tool's history from the store, the export or the sample."""
+    if run.cached_result is not None:
+        run.all_measurements_df = None
+    elif run.history_checkpoint is not None:
+        run.all_measurements_df = run.history_checkpoint["frames"].get("history")
+        run.no_measurements_found = run.all_measurements_df is None
+    elif run.cleared_before_query:
+        run.all_measurements_df = None
+        run.no_measurements_found = False
+        print(
+            "✅ Zone map: the store's zone map clears the tool; history query skipped."
+        )
+    elif MEASUREMENT_STORE_PATH:
+        query_store(run)
+    elif MEASUREMENT_EXPORT_PATH and not run.spark:
+        # Repeated local analyses memory-map the cached columns instead of
+        # re-parsing the CSV.
+        run.all_measurements_df = open_column_cache(MEASUREMENT_EXPORT_PATH)
+        run.history_rows = (run.all_measurements_df["tool_id"] == bc_number).to_numpy()
+        run.no_measurements_found = False
+        print(
+            f"✅ Column cache: {int(run.history_rows.sum())} measurements "
+            "memory-mapped."
+        )
+    else:
+        run.all_measurements_df = generate_sample_dataframe(run.spark)
+        run.no_measurements_found = False
+    run.fresh_history = (
+        run.all_measurements_df is not None and run.history_checkpoint is None
+    )
 
-all_measurements_df = generate_sample_dataframe(spark)
+    # On the local engine the filters below only mark the selected rows, so
+    # the loaded (possibly memory-mapped) history is not copied by each of
+    # them; the selected rows are taken once afterwards.
+    if run.fresh_history and not run.spark and run.history_rows is None:
+        run.history_rows = np.ones(len(run.all_measurements_df), dtype=bool)
+
+
+def query_store(run):
+    """Reads the tool's history in the window from the measurement store.
+
+    The window and tool filters prune partitions and row groups, so only the
+    at-risk period of this tool is read. A rerun of an open ticket only reads
+    the files ingested since its previous run.
+    """
+    # The files are listed before the read, so files ingested during the run
+    # are left for the next one.
+    run.store_files = data_files(MEASUREMENT_STORE_PATH)
+    new_files = None
+    if run.incremental_run:
+        new_files = run.ticket_state.unread_files(run.store_files)
+    if new_files is not None:
+        print(
+            f"♻️ Ingestion watermark: {len(new_files)} store files ingested since "
+            "the previous run."
+        )
+        run.no_new_readings = not new_files
+    if run.spark:
+        run.all_measurements_df = read_measurements_spark(
+            run.spark,
+            MEASUREMENT_STORE_PATH,
+            run.window_start,
+            run.window_end,
+            bc_number,
+            files=new_files,
+        )
+    else:
+        files_read, files_total = files_for_window(
+            MEASUREMENT_STORE_PATH,
+            run.window_start,
+            run.window_end,
+            bc_number,
+            files=new_files,
+        )
+        run.all_measurements_df = read_measurements(
+            MEASUREMENT_STORE_PATH,
+            run.window_start,
+            run.window_end,
+            bc_number,
+            files=new_files,
+        )
+        print(f"✅ Measurement store: read {files_read} of {files_total} files.")
+    run.no_measurements_found = False
+
+
+def encode_history(run):
+    """Dictionary-encodes the repeated text columns of a local history.
+
+    The local engine holds them as categories instead of one string object
+    per row. The column cache already maps them as categoricals.
+    """
+    if run.all_measurements_df is None or run.spark:
+        return
+    encoded_df = encode_categories(run.all_measurements_df)
+    if encoded_df is not run.all_measurements_df:
+        print(
+            "📦 Dictionary-encoded text columns: "
+            f"{memory_footprint(run.all_measurements_df):,} -> "
+            f"{memory_footprint(encoded_df):,} bytes."
+        )
+        run.all_measurements_df = encoded_df
+
+
+def cache_history(run):
+    """Caches the queried Spark history for the rest of the run.
+
+    The unit, latest-reading and ticket-state checks and the evaluation each
+    run a Spark job on the history; cached, the store is scanned only once.
+    The history is this tool's window, or only the files ingested since the
+    previous run. A cached row has no input file, so the source file the
+    latest-reading tie-break needs is kept as a column.
+    """
+    from pyspark.sql.functions import input_file_name
+
+    run.cached_history_df = run.all_measurements_df.withColumn(
+        SOURCE_FILE_COLUMN, input_file_name()
+    ).persist()
+    run.all_measurements_df = run.cached_history_df
+
+
+def set_aside_unknown_units(run):
+    """Sets aside the readings whose unit is not recognized.
+
+    Histories may be logged in another unit than the certificate (e.g. mm
+    against an inch certificate). Unit labels are normalized at ingestion,
+    rows with an unrecognized unit are set aside rather than evaluated, and
+    values are rescaled into the certificate's unit. On Spark one aggregate
+    counts the unrecognized rows and finds the logged units.
+    """
+    if run.spark:
+        counts = unit_counts(run.all_measurements_df)
+        unknown_unit_count = counts.pop(None, 0)
+        run.logged_units = sorted(counts)
+        run.all_measurements_df, unknown_units_df = normalize_units(
+            run.all_measurements_df, run.units
+        )
+    else:
+        known_units = known_units_mask(run.all_measurements_df)
+        unknown_units_df = run.all_measurements_df[run.history_rows & ~known_units]
+        run.history_rows &= known_units
+        unknown_unit_count = len(unknown_units_df)
+    if unknown_unit_count:
+        print(
+            f"⚠️ Units: {unknown_unit_count} measurements with an unrecognized "
+            "unit set aside."
+        )
+        show_rows(
+            unknown_units_df,
+            [
+                "job_number",
+                "sample_serial_number",
+                "dimension_id",
+                "measured_value",
+                UNIT_COLUMN,
+            ],
+            run.spark,
+        )
+
+
+def apply_history_window(run):
+    """Keeps the readings in the at-risk window the history query reads."""
+    if run.spark:
+        run.all_measurements_df = filter_to_window(
+            run.all_measurements_df, run.window_start, run.window_end
+        )
+    else:
+        run.history_rows &= window_mask(
+            run.all_measurements_df, run.window_start, run.window_end
+        )
+    print(
+        f"✅ History window {run.window_start:%m/%d/%Y} to "
+        f"{run.window_end:%m/%d/%Y} applied."
+    )
+
+
+def keep_latest_readings(run):
+    """Keeps the latest reading of each re-inspected characteristic.
+
+    The superseded readings are listed for the record.
+    """
+    if run.spark:
+        run.all_measurements_df, superseded_df = latest_readings(
+            run.all_measurements_df
+        )
+        superseded_counts = {
+            row[0]: row[1]
+            for row in superseded_df.groupBy(SUPERSEDED_REASON_COLUMN).count().collect()
+        }
+    else:
+        run.history_rows, superseded_df = latest_mask(
+            run.all_measurements_df, run.history_rows
+        )
+        superseded_counts = (
+            superseded_df[SUPERSEDED_REASON_COLUMN].value_counts().to_dict()
+        )
+    if not superseded_counts:
+        print("✅ Latest readings: no re-measurements or duplicate uploads.")
+        return
+    print(
+        f"🧹 Latest readings: {sum(superseded_counts.values())} superseded "
+        f"readings set aside ({superseded_counts})."
+    )
+    show_rows(
+        superseded_df,
+        [
+            "job_number",
+            "sample_serial_number",
+            "dimension_id",
+            "measured_value",
+            "measurement_date",
+            SUPERSEDED_REASON_COLUMN,
+        ],
+        run.spark,
+    )
+
+
+def skip_analyzed_readings(run):
+    """Skips the readings an earlier run of the ticket already analyzed."""
+    if run.spark:
+        run.all_measurements_df = run.ticket_state.new_rows(run.all_measurements_df)
+    else:
+        run.history_rows = run.ticket_state.new_row_mask(
+            run.all_measurements_df, run.history_rows
+        )
+        run.no_new_readings = not run.history_rows.any()
+    print(
+        f"♻️ Incremental run: {run.ticket_state.evaluated_rows} readings analyzed "
+        "before are skipped."
+    )
+
+
+def take_window(run):
+    """Takes the selected rows of the window in the certificate's unit.
+
+    The loaded history keeps its row mask, so Block 7 can take the at-risk
+    rows from it directly. On Spark the logged units were already found by
+    the unit aggregate of the queried history, so no job lists them again.
+    """
+    run.history_df = run.all_measurements_df
+    if run.history_rows is not None:
+        run.all_measurements_df = take_history(
+            run.history_df, run.history_rows, run.units
+        )
+    if run.fresh_history:
+        measured_units = run.logged_units
+        if measured_units is None:
+            measured_units = logged_units(run.all_measurements_df)
+        if measured_units and measured_units != [canonical_unit(run.units)]:
+            print(
+                f"📏 History logged in {', '.join(measured_units)}: values rescaled "
+                f"into {run.units}; the logged unit is kept in "
+                f"'{LOGGED_UNIT_COLUMN}'."
+            )
+    run.window_measurements_df = run.all_measurements_df
 
 
 # ============================================================================
@@ -237,53 +1247,174 @@ all_measurements_df = generate_sample_dataframe(spark)
 # Purpose: Applies the tool deviation to historical data to find the "true"
 # part dimensions and determines the final pass/fail status.
 # ============================================================================
-print("\nBLOCK 7: ADJUSTED VALUE CALCULATION & IMPACT ANALYSIS")
+def evaluate_impact(run):
+    """Block 7: evaluates the window's at-risk readings, or clears the tool."""
+    print("\nBLOCK 7: ADJUSTED VALUE CALCULATION & IMPACT ANALYSIS")
+    load_evaluation_checkpoint(run)
 
-if not no_measurements_found and all_measurements_df:
-    from pyspark.sql.functions import col, lit, when
+    if run.evaluation_checkpoint is not None:
+        run.all_measurements_df = run.evaluation_checkpoint["frames"].get("evaluated")
+        run.cleared_by_zone_map = run.evaluation_checkpoint["data"][
+            "cleared_by_zone_map"
+        ]
+        print(
+            "⏩ Resumed from checkpoint: evaluation saved "
+            f"{run.evaluation_checkpoint['created']}; evaluation skipped."
+        )
+    elif run.cleared_before_query:
+        run.cleared_by_zone_map = True
+        print(
+            "✅ Zone map: the deviation cannot push any measurement outside its "
+            "expanded limits. All Clear without reading the detail history."
+        )
+    elif run.no_new_readings:
+        # Nothing was evaluated, so the zone map cannot clear the ticket; its
+        # stored results stand.
+        print("♻️ Incremental run: no new readings to evaluate.")
+    elif not run.no_measurements_found and run.all_measurements_df is not None:
+        run.cleared_by_zone_map = prune_to_at_risk_zones(run)
+        if not run.cleared_by_zone_map:
+            evaluate_at_risk_readings(run)
+    elif run.cached_result is not None:
+        print("🗄️ Served from cache: no evaluation needed.")
+    else:
+        print("⚠️ No measurements to analyze.")
 
-    all_measurements_df = all_measurements_df.withColumn(
-        "adjusted_value", col("measured_value") - lit(deviation_value_inches)
-    )
+    if (
+        run.checkpoints is not None
+        and run.evaluation_checkpoint is None
+        and run.all_measurements_df is not None
+    ):
+        run.checkpoints.save(
+            "evaluation",
+            run.evaluation_fingerprint,
+            {"cleared_by_zone_map": run.cleared_by_zone_map},
+            {
+                "evaluated": (
+                    None if run.cleared_by_zone_map else run.all_measurements_df
+                )
+            },
+        )
 
-    all_measurements_df = all_measurements_df.withColumn(
-        "allowance_eligible",
-        when(col("criticality").isin(["Critical", "Major"]), lit("NO - KC")).otherwise(
-            lit("YES")
-        ),
-    )
 
-    all_measurements_df = all_measurements_df.withColumn(
-        "expanded_upper_tol",
-        when(
-            col("allowance_eligible") == "YES",
-            col("original_upper_tol")
-            + ((col("original_upper_tol") - col("nominal_value")) * 0.20),
-        ).otherwise(col("original_upper_tol")),
+def load_evaluation_checkpoint(run):
+    """Resumes an interrupted run from its checkpointed evaluation."""
+    if run.checkpoints is None or run.cached_result is not None:
+        return
+    run.evaluation_fingerprint = analysis_signature(
+        {
+            "history": run.history_fingerprint,
+            "rules": rule_config_version(run.allowance_rules),
+            "evaluation_mode": EVALUATION_MODE,
+            "resolution": FIXED_POINT_RESOLUTION,
+            "monte_carlo": [
+                RUN_MONTE_CARLO,
+                MONTE_CARLO_DRAWS,
+                MONTE_CARLO_SEED,
+                GAUGE_REPEATABILITY,
+            ],
+        }
+    )
+    run.evaluation_checkpoint = run.checkpoints.load(
+        "evaluation", run.evaluation_fingerprint, run.spark
     )
 
-    all_measurements_df = all_measurements_df.withColumn(
-        "expanded_lower_tol",
-        when(
-            col("allowance_eligible") == "YES",
-            col("original_lower_tol")
-            - ((col("nominal_value") - col("original_lower_tol")) * 0.20),
-        ).otherwise(col("original_lower_tol")),
+
+def prune_to_at_risk_zones(run):
+    """Prunes the window to the zones the deviation can fail.
+
+    Only the store's zone map, kept current by ingestion, is used: building
+    one from the ticket's window would cost as much as evaluating it, so
+    without it the window is evaluated directly. Monte Carlo reports a
+    probability for every reading, including the ones the as-found deviation
+    alone cannot fail, so it evaluates the whole window as well.
+
+    Returns:
+        bool: Whether the zone map clears the tool
+    """
+    if run.stored_zone_map is None:
+        print("🔎 Zone map: no current store zone map; the window is evaluated.")
+        return False
+    if RUN_MONTE_CARLO and not run.spark:
+        print("🎲 Monte Carlo: every reading in the window is evaluated.")
+        return False
+    zone_map = run.stored_zone_map
+    at_risk_zones = zone_map.at_risk_zones(bc_number, run.tool_deviation)
+    if not at_risk_zones:
+        print(
+            "✅ Zone map: the deviation cannot push any measurement outside its "
+            "expanded limits. All Clear without scanning the detail data."
+        )
+        return True
+
+    print(
+        f"🔎 Zone map: {len(at_risk_zones)} of "
+        f"{len(zone_map.tool_zones(bc_number))} zones can hold failures; "
+        "pruning the history to those zones."
     )
+    if run.history_rows is None:
+        run.all_measurements_df = zone_map.prune(
+            run.all_measurements_df, bc_number, run.tool_deviation
+        )
+    else:
+        # The engine takes the at-risk rows straight from the loaded
+        # history, with every mask applied in one step.
+        run.all_measurements_df = take_history(
+            run.history_df,
+            run.history_rows
+            & zone_map.prune_mask(
+                run.history_df, bc_number, run.tool_deviation, at_risk_zones
+            ),
+            run.units,
+        )
+    return False
+
 
-    all_measurements_df = all_measurements_df.withColumn(
-        "final_status",
-        when(
-            (col("adjusted_value") >= col("expanded_lower_tol"))
-            & (col("adjusted_value") <= col("expanded_upper_tol")),
-            lit("✅ PASS"),
-        ).otherwise(lit("❌ FAIL")),
+def evaluate_at_risk_readings(run):
+    """Calculates the adjusted values and final status of the readings."""
+    run.all_measurements_df = evaluate_history(
+        run.all_measurements_df, run.tool_deviation, run.allowance_rules
     )
 
     print("✅ Adjusted values calculated and final status determined.")
-    all_measurements_df.show(5)
-else:
-    print("⚠️ No measurements to analyze.")
+    if run.spark:
+        render_labels(run.all_measurements_df).show(5)
+    else:
+        # Status and allowance are stored as int8/boolean flags; labels are
+        # only rendered for reports.
+        label_bytes = memory_footprint(render_labels(run.all_measurements_df))
+        print(
+            f"📦 Result flags: {label_bytes:,} bytes with labels -> "
+            f"{memory_footprint(run.all_measurements_df):,} bytes."
+        )
+        print(render_labels(run.all_measurements_df.head(5)).to_string(index=False))
+
+    if RUN_MONTE_CARLO and run.spark:
+        print("⚠️ Monte Carlo analysis runs on the local NumPy engine only.")
+    elif RUN_MONTE_CARLO:
+        run_monte_carlo(run)
+
+
+def run_monte_carlo(run):
+    """Adds each reading's probability of nonconformance."""
+    run.all_measurements_df = simulate_nonconformance(
+        run.all_measurements_df,
+        run.tool_deviation,
+        run.deviation_uncertainty,
+        repeatability=GAUGE_REPEATABILITY,
+        draws=MONTE_CARLO_DRAWS,
+        seed=MONTE_CARLO_SEED,
+    )
+    print(
+        f"✅ Monte Carlo ({MONTE_CARLO_DRAWS} draws, "
+        f"u = {run.deviation_uncertainty:.6f} {run.units}) probability of "
+        "nonconformance:"
+    )
+    print(
+        run.all_measurements_df[
+            ["sample_serial_number", "dimension_id", "prob_nonconformance"]
+        ].to_string(index=False)
+    )
 
 
 # ============================================================================
@@ -291,20 +1422,177 @@ else:
 # Purpose: Filters the analysis to only show the measurements that are
 # confirmed failures, which require engineering review.
 # ============================================================================
-print("\nBLOCK 8: FAILURE REPORT GENERATION")
+def report_failures(run):
+    """Block 8: reports the failures and merges them into the ticket."""
+    print("\nBLOCK 8: FAILURE REPORT GENERATION")
+    load_failure_checkpoint(run)
+
+    if run.failure_checkpoint is not None:
+        # The checkpoint is saved after the ticket state and result cache were
+        # updated, so those steps are not repeated.
+        run.failures_df = run.failure_checkpoint["frames"].get("failures")
+        run.failure_count = run.failure_checkpoint["data"]["failure_count"]
+        run.report_artifacts = run.failure_checkpoint["data"]["artifacts"]
+        print(
+            "⏩ Resumed from checkpoint: failure summary saved "
+            f"{run.failure_checkpoint['created']} with {run.failure_count} failures."
+        )
+        print_artifacts(run.report_artifacts)
+    elif run.cleared_by_zone_map:
+        run.failure_count = 0
+        print("✅ No failures possible: ticket cleared by the zone map.")
+    elif run.no_new_readings:
+        run.failure_count = 0
+        print("♻️ No new readings: the ticket's stored failures are reported.")
+    elif not run.no_measurements_found and run.all_measurements_df is not None:
+        list_failures(run)
+    elif run.cached_result is not None:
+        run.failures_df = run.cached_result["failures"]
+        run.failure_count = run.cached_result["summary"]["failure_count"]
+        print(
+            f"🗄️ SERVED FROM CACHE ({run.cached_result['key'][:12]}): "
+            f"{run.failure_count} measurements requiring engineering review."
+        )
+        print_artifacts(run.cached_result["artifacts"])
+    else:
+        run.failure_count = 0
+        print("✅ No failures found as no measurements were analyzed.")
+
+    if run.failure_count == 0:
+        run.failures_df = None
+
+    update_ticket_state(run)
+    if (
+        run.failure_count
+        and run.cached_result is None
+        and run.failure_checkpoint is None
+    ):
+        roll_up_parts(run)
+    store_result(run)
+    if (
+        run.checkpoints is not None
+        and run.cached_result is None
+        and run.failure_checkpoint is None
+    ):
+        run.checkpoints.save(
+            "failures",
+            run.failures_fingerprint,
+            {"failure_count": run.failure_count, "artifacts": run.report_artifacts},
+            {"failures": run.failures_df},
+        )
+
+
+def load_failure_checkpoint(run):
+    """Resumes an interrupted run from its checkpointed failure summary."""
+    if run.checkpoints is None or run.cached_result is not None:
+        return
+    run.failures_fingerprint = analysis_signature(
+        {"evaluation": run.evaluation_fingerprint}
+    )
+    run.failure_checkpoint = run.checkpoints.load(
+        "failures", run.failures_fingerprint, run.spark
+    )
+
 
-if not no_measurements_found and all_measurements_df:
-    failures_df = all_measurements_df.filter(col("final_status") == "❌ FAIL")
-    failure_count = failures_df.count()
+def list_failures(run):
+    """Lists the failing readings and the parts that require an NC."""
+    if run.spark:
+        from pyspark.sql.functions import col
 
-    if failure_count > 0:
-        print(f"🔥 Found {failure_count} measurements requiring engineering review.")
-        failures_df.show()
+        run.failures_df = run.all_measurements_df.filter(
+            col("final_status") == STATUS_FAIL
+        )
+        run.failure_count = run.failures_df.count()
     else:
+        run.failures_df = run.all_measurements_df[
+            run.all_measurements_df["final_status"] == STATUS_FAIL
+        ]
+        run.failure_count = len(run.failures_df)
+    if run.failure_count == 0:
         print("✅ No failures found after analysis.")
-else:
-    failure_count = 0
-    print("✅ No failures found as no measurements were analyzed.")
+        return
+
+    print(f"🔥 Found {run.failure_count} measurements requiring engineering review.")
+    if run.spark:
+        render_labels(run.failures_df).show()
+        if run.result_cache is not None:
+            run.report_artifacts["failure_report.txt"] = (
+                render_labels(run.failures_df).toPandas().to_string(index=False)
+            )
+    else:
+        run.report_artifacts["failure_report.txt"] = render_labels(
+            run.failures_df
+        ).to_string(index=False)
+        print(run.report_artifacts["failure_report.txt"])
+
+
+def roll_up_parts(run):
+    """Prints the per-part disposition needed to raise NCs.
+
+    The ticket's failures, merged over its runs, are rolled up in one
+    aggregation. Block 7 only evaluated the zones that can fail, so the
+    number of readings per part is counted from the ticket's stored readings
+    or the unpruned window rather than by evaluating them again.
+    """
+    if run.ticket_state is not None:
+        failures = run.ticket_state.failures
+        reading_counts = part_reading_counts(run.ticket_state.readings)
+    else:
+        failures = run.failures_df
+        reading_counts = part_reading_counts(run.window_measurements_df)
+    parts_df = rollup_parts(failures, reading_counts)
+    if hasattr(parts_df, "rdd"):
+        # One small record per failing part.
+        parts_df = parts_df.toPandas()
+    print(f"🧾 {len(parts_df)} parts require an NC:")
+    run.report_artifacts["part_rollup.txt"] = parts_df.to_string(index=False)
+    print(run.report_artifacts["part_rollup.txt"])
+
+
+def update_ticket_state(run):
+    """Merges this run into the ticket's stored results and readings."""
+    if (
+        run.ticket_state is None
+        or run.window_measurements_df is None
+        or run.failure_checkpoint is not None
+    ):
+        return
+    run.ticket_state.add_failures(run.failures_df, run.window_measurements_df)
+    run.ticket_state.advance(run.window_measurements_df, files=run.store_files)
+    run.ticket_state.save(TICKET_STATE_DIR)
+    run.failure_count = run.ticket_state.failure_count
+    # The zone map only cleared this run's readings; failures found by earlier
+    # runs still stand.
+    run.cleared_by_zone_map = run.cleared_by_zone_map and run.failure_count == 0
+    print(
+        f"♻️ Ticket state: {run.failure_count} failures over "
+        f"{run.ticket_state.evaluated_rows} evaluated measurements."
+    )
+
+
+def store_result(run):
+    """Memoizes this run's result for reruns with the same inputs."""
+    if (
+        run.result_cache is None
+        or run.cached_result is not None
+        or run.failure_checkpoint is not None
+    ):
+        return
+    cached_failures = run.failures_df
+    if run.ticket_state is not None:
+        cached_failures = run.ticket_state.failures
+    elif run.spark and run.failures_df is not None:
+        cached_failures = run.failures_df.toPandas()
+    run.result_cache.put(
+        run.cache_key,
+        {
+            "failure_count": run.failure_count,
+            "cleared_by_zone_map": run.cleared_by_zone_map,
+        },
+        cached_failures,
+        run.report_artifacts,
+    )
+    print(f"🗄️ Result {run.cache_key[:12]} stored in the result cache.")
 
 
 # ============================================================================
@@ -312,13 +1600,94 @@ else:
 # Purpose: Simulates the final steps of the process, such as creating
 # reports, posting to a ticket system, and cleaning up resources.
 # ============================================================================
-print("\nBLOCK 9-12: FINAL REPORTING SIMULATION")
+def finish_run(run):
+    """Block 9-12: records the ticket's exposure and completes the run."""
+    print("\nBLOCK 9-12: FINAL REPORTING SIMULATION")
+    record_exposure(run)
+
+    if run.failure_count > 0:
+        print(f"✅ Simulation Complete: {run.failure_count} failures were identified.")
+        print("   -> Next steps: generate HTML report, create NC, post to Jira.")
+    else:
+        print("✅ Simulation Complete: No failures were identified.")
+        print("   -> Next step: post 'All Clear' comment to Jira and close ticket.")
+
+    if run.cached_history_df is not None:
+        run.cached_history_df.unpersist()
+
+    # The run is complete, so a later run of the ticket starts from Block 1.
+    if run.checkpoints is not None:
+        run.checkpoints.clear()
+        print("🧹 Run complete: checkpoints removed.")
+
+    if run.profiler is not None:
+        run.profiler.stop()
+        collapsed_path, hotspots_path = write_profile(
+            run.profiler,
+            os.path.join(PROFILE_DIR, f"{jira_ticket}-{datetime.now():%Y%m%d-%H%M%S}"),
+            PROFILE_TOP_N,
+        )
+        print(f"⏱️ Profile: {collapsed_path} (flame graph input), {hotspots_path}")
+        print(run.profiler.hotspots(10).to_string(index=False))
+
+
+def record_exposure(run):
+    """Records this ticket in the exposure index so parts can be looked up."""
+    if run.window_measurements_df is None:
+        return
+    if EXPOSURE_INDEX_PATH and os.path.exists(EXPOSURE_INDEX_PATH):
+        exposure_index = ExposureIndex.load(EXPOSURE_INDEX_PATH)
+    else:
+        exposure_index = ExposureIndex()
+    # Incremental runs add their new rows to the ticket's recorded exposure;
+    # the parts they touch take their status from the ticket's merged
+    # failures, so a superseded failure no longer marks its part.
+    exposure_index.record_event(
+        jira_ticket,
+        bc_number,
+        run.window_measurements_df,
+        run.ticket_state.failures if run.ticket_state is not None else run.failures_df,
+        replace=not run.incremental_run,
+    )
+    linked = exposure_index.check_serials(exposure_index.events[jira_ticket]["serials"])
+    print(
+        f"✅ Exposure index: {len(linked)} parts linked to {jira_ticket}, "
+        f"{int(linked['failed'].sum())} with open failures."
+    )
+    if EXPOSURE_INDEX_PATH:
+        exposure_index.save(EXPOSURE_INDEX_PATH)
+
+
+def main():
+    """Runs the OOT analysis of one ticket, Block 1 to Block 12.
+
+    Returns:
+        dict: The ticket's ``failure_count`` and ``failures`` (merged over
+        incremental runs), the ``evaluated`` measurements of this run and
+        whether the ticket was ``cleared_by_zone_map``
+    """
+    run = configure_run()
+    simulate_pdf(run)
+    extract_certificate(run)
+    calculate_tool_deviation(run)
+    load_history(run)
+    evaluate_impact(run)
+    report_failures(run)
+    finish_run(run)
+
+    print("\n✅ Notebook execution finished.")
+    ticket_state = run.ticket_state
+    return {
+        "failure_count": run.failure_count,
+        "failures": (
+            ticket_state.failures if ticket_state is not None else run.failures_df
+        ),
+        "evaluated": None if run.cleared_by_zone_map else run.all_measurements_df,
+        "cleared_by_zone_map": run.cleared_by_zone_map,
+    }
 
-if failure_count > 0:
-    print(f"✅ Simulation Complete: {failure_count} failures were identified.")
-    print("   -> Next steps: generate HTML report, create NC, post to Jira.")
-else:
-    print("✅ Simulation Complete: No failures were identified.")
-    print("   -> Next step: post 'All Clear' comment to Jira and close ticket.")
 
-print("\n✅ Notebook execution finished.")
+# Worker processes (e.g. the Monte Carlo pool under spawn) import this module
+# again; only the launching process runs the pipeline.
+if __name__ == "__main__":
+    main()
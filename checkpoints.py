@@ -0,0 +1,113 @@
+"""CalibrationIQ: Block-level checkpoints for resuming interrupted runs.
+
+A failure late in the notebook (a report or Jira post in Block 9-12, or a
+crashed Spark job) would otherwise mean rerunning from Block 1, including
+the AI extraction and the history scan. Each block saves its outputs as a
+checkpoint: JSON for small results and Parquet for DataFrames. A rerun loads
+every checkpoint whose input fingerprint still matches and recomputes from
+the first block that has none.
+
+Fingerprints chain: each block's fingerprint covers its own inputs and the
+fingerprint of the block before it, so a changed certificate, configuration
+or measurement snapshot invalidates every later checkpoint. The manifest is
+written last, so a block interrupted while saving is never treated as done.
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime
+
+import pandas as pd
+
+MANIFEST_FILE = "manifest.json"
+DATA_FILE = "data.json"
+
+
+class CheckpointStore:
+    """Checkpoints of one ticket's run under ``root/<run_name>/<block>``.
+
+    Args:
+        root: Directory holding the checkpoints of every run
+        run_name: Name of the run, e.g. the ticket id
+    """
+
+    def __init__(self, root, run_name):
+        self.path = os.path.join(root, run_name)
+
+    def _block_path(self, block):
+        return os.path.join(self.path, block)
+
+    def save(self, block, fingerprint, data=None, frames=None):
+        """Saves a block's outputs.
+
+        Args:
+            block: Name of the block, e.g. "extraction"
+            fingerprint: Fingerprint of the inputs the outputs were built from
+            data: JSON-serializable outputs
+            frames: Mapping of name -> pandas or Spark DataFrame (or None)
+        """
+        path = self._block_path(block)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        with open(os.path.join(path, DATA_FILE), "w") as f:
+            json.dump(data, f, indent=2, default=str)
+
+        engines = {}
+        for name, df in (frames or {}).items():
+            if df is None:
+                continue
+            frame_path = os.path.join(path, f"{name}.parquet")
+            if hasattr(df, "rdd"):
+                df.write.mode("overwrite").parquet(frame_path)
+                engines[name] = "spark"
+            else:
+                df.to_parquet(frame_path, index=False)
+                engines[name] = "pandas"
+
+        manifest = {
+            "block": block,
+            "fingerprint": fingerprint,
+            "created": datetime.now().isoformat(),
+            "frames": engines,
+        }
+        with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    def load(self, block, fingerprint, spark=None):
+        """Loads a block's outputs if they were built from the same inputs.
+
+        Args:
+            block: Name of the block
+            fingerprint: Fingerprint of the current inputs
+            spark: SparkSession for reading Spark frames
+
+        Returns:
+            dict: ``data``, ``frames`` and ``created``, or None when the
+            checkpoint is missing, incomplete or stale
+        """
+        path = self._block_path(block)
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["fingerprint"] != fingerprint:
+            return None
+
+        with open(os.path.join(path, DATA_FILE)) as f:
+            data = json.load(f)
+        frames = {}
+        for name, engine in manifest["frames"].items():
+            frame_path = os.path.join(path, f"{name}.parquet")
+            if engine == "spark":
+                if spark is None:
+                    return None
+                frames[name] = spark.read.parquet(frame_path)
+            else:
+                frames[name] = pd.read_parquet(frame_path)
+        return {"data": data, "frames": frames, "created": manifest["created"]}
+
+    def clear(self):
+        """Removes the run's checkpoints once it has completed."""
+        shutil.rmtree(self.path, ignore_errors=True)
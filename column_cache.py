@@ -0,0 +1,127 @@
+"""CalibrationIQ: Memory-mapped column cache for local measurement exports.
+
+Each analysis of a local CSV export would otherwise re-parse the text. The
+first run converts the export once into one binary ``.npy`` file per column:
+float64 arrays for numeric columns, datetime64 arrays for dates, and integer
+codes plus a category list for text columns. Later runs memory-map those
+files and hand the NumPy engine a pandas DataFrame whose columns are views
+of the mapped buffers, so loading involves no parsing or copying and worker
+processes share the same pages through the OS page cache.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILE = "manifest.json"
+DATE_COLUMNS = ["measurement_date"]
+
+
+def _code_dtype(category_count):
+    """Returns the smallest signed integer dtype that can hold the codes."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if category_count < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {
+        "path": os.path.abspath(csv_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def build_column_cache(csv_path, cache_dir):
+    """Converts a CSV export into per-column binary files.
+
+    Args:
+        csv_path: Path to the CSV measurement export
+        cache_dir: Directory to write the column files into
+
+    Returns:
+        dict: The cache manifest
+    """
+    df = pd.read_csv(csv_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    columns = {}
+
+    for name in df.columns:
+        values = df[name]
+        if name in DATE_COLUMNS:
+            array = pd.to_datetime(values).to_numpy(dtype="datetime64[ns]")
+            columns[name] = {"kind": "datetime"}
+        elif pd.api.types.is_numeric_dtype(values):
+            array = values.to_numpy(dtype=np.float64)
+            columns[name] = {"kind": "float64"}
+        else:
+            categorical = pd.Categorical(values)
+            categories = [str(category) for category in categorical.categories]
+            array = categorical.codes.astype(_code_dtype(len(categories)))
+            columns[name] = {"kind": "dictionary", "categories": categories}
+        np.save(os.path.join(cache_dir, f"{name}.npy"), array)
+
+    manifest = {
+        "rows": len(df),
+        "order": list(df.columns),
+        "columns": columns,
+        "source": _source_signature(csv_path),
+    }
+    with open(os.path.join(cache_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_column_cache(cache_dir):
+    """Memory-maps a column cache as a zero-copy pandas DataFrame.
+
+    Args:
+        cache_dir: Directory written by ``build_column_cache``
+
+    Returns:
+        DataFrame: Columns backed by read-only memory-mapped buffers
+    """
+    with open(os.path.join(cache_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    data = {}
+    for name in manifest["order"]:
+        spec = manifest["columns"][name]
+        array = np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode="r")
+        if spec["kind"] == "dictionary":
+            data[name] = pd.Categorical.from_codes(
+                array, spec["categories"], validate=False
+            )
+        else:
+            data[name] = array
+    return pd.DataFrame(data, copy=False)
+
+
+def is_cache_current(csv_path, cache_dir):
+    """Returns True when the cache exists and matches the CSV on disk."""
+    manifest_path = os.path.join(cache_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return False
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    return manifest.get("source") == _source_signature(csv_path)
+
+
+def open_column_cache(csv_path, cache_dir=None):
+    """Loads a CSV export through its column cache, building it if stale.
+
+    Args:
+        csv_path: Path to the CSV measurement export
+        cache_dir: Cache directory (default: ``<csv_path>.columns``)
+
+    Returns:
+        DataFrame: Columns backed by read-only memory-mapped buffers
+    """
+    cache_dir = cache_dir or f"{csv_path}.columns"
+    if not is_cache_current(csv_path, cache_dir):
+        build_column_cache(csv_path, cache_dir)
+    return load_column_cache(cache_dir)
@@ -0,0 +1,228 @@
+"""CalibrationIQ: Drift-model narrowing of the historical impact window.
+
+Without a drift model, Block 5-6 treats every measurement since the last
+good calibration as affected by the full as-found error. When the tool's
+calibration history shows gradual drift, a linear model over its past
+results estimates when the error crossed the tool's limits. The history
+query then reads only the at-risk period, and Block 7 removes the error the
+model predicts at each measurement date instead of the full as-found error.
+
+A line is only trusted when the history actually looks like steady drift:
+the fit must explain most of the variance and the results must move one way.
+A tool that failed suddenly (e.g. after a drop) keeps the full window.
+"""
+
+import numpy as np
+import pandas as pd
+
+DATE_COLUMN = "measurement_date"
+# A fit must explain at least this share of the history's variance.
+MIN_R_SQUARED = 0.95
+# Crossings further than this from the origin are treated as "never".
+MAX_CROSSING_DAYS = 100 * 365
+
+
+class DriftModel:
+    """Linear drift of a tool's error over time.
+
+    Args:
+        origin: The date that ``day 0`` refers to
+        intercept: Modelled error on the origin date
+        slope_per_day: Modelled change in error per day
+        r_squared: Share of the history's variance explained by the fit, or
+            None for a model that was not fitted
+        monotonic: Whether the history moves in the slope's direction only
+    """
+
+    def __init__(
+        self, origin, intercept, slope_per_day, r_squared=None, monotonic=True
+    ):
+        self.origin = pd.Timestamp(origin)
+        self.intercept = float(intercept)
+        self.slope_per_day = float(slope_per_day)
+        self.r_squared = r_squared
+        self.monotonic = monotonic
+
+    @classmethod
+    def fit(cls, dates, errors):
+        """Fits a least-squares line to a tool's calibration history.
+
+        Args:
+            dates: Calibration dates
+            errors: As-found error (measured - nominal) at each calibration
+
+        Returns:
+            DriftModel: The fitted model
+        """
+        dates = pd.to_datetime(pd.Series(dates))
+        if dates.nunique() < 2:
+            raise ValueError("A drift model needs at least two calibration dates.")
+        origin = dates.min()
+        days = (dates - origin).dt.days.to_numpy(dtype=np.float64)
+        errors = np.asarray(errors, dtype=np.float64)
+        slope, intercept = np.polyfit(days, errors, 1)
+
+        residuals = errors - (intercept + slope * days)
+        spread = np.sum((errors - errors.mean()) ** 2)
+        r_squared = 1.0 - np.sum(residuals**2) / spread if spread > 0 else 0.0
+        steps = np.diff(errors[np.argsort(days, kind="stable")])
+        monotonic = bool(np.all(steps * np.sign(slope) >= 0))
+        return cls(origin, intercept, slope, float(r_squared), monotonic)
+
+    @property
+    def is_linear(self):
+        """Whether the history supports a linear drift model."""
+        if self.r_squared is None:
+            return True
+        return self.monotonic and self.r_squared >= MIN_R_SQUARED
+
+    def _days(self, dates):
+        dates = pd.to_datetime(pd.Series(dates))
+        return (dates - self.origin).dt.days.to_numpy(dtype=np.float64)
+
+    def error_at(self, dates):
+        """Returns the modelled error on each date."""
+        return self.intercept + self.slope_per_day * self._days(dates)
+
+    def crossing_date(self, lower_error, upper_error):
+        """Returns the date the modelled error leaves ``[lower, upper]``.
+
+        Args:
+            lower_error: Lowest acceptable tool error (lower limit - nominal)
+            upper_error: Highest acceptable tool error (upper limit - nominal)
+
+        Returns:
+            Timestamp: The crossing date, or None if the model never drifts
+            or would only cross more than ``MAX_CROSSING_DAYS`` away
+        """
+        if self.slope_per_day == 0:
+            return None
+        limit = upper_error if self.slope_per_day > 0 else lower_error
+        days = (limit - self.intercept) / self.slope_per_day
+        # A near-zero slope from a flat history puts the crossing centuries
+        # away, beyond what a Timestamp can hold.
+        if not np.isfinite(days) or abs(days) > MAX_CROSSING_DAYS:
+            return None
+        return self.origin + pd.Timedelta(days=float(np.floor(days)))
+
+    def at_risk_window(self, start, end, lower_error, upper_error, safety_days=0):
+        """Narrows a ``[start, end]`` impact window to the at-risk period.
+
+        The window is left unchanged when the model cannot explain the
+        out-of-tolerance result: the history is not linear (``is_linear``),
+        or the model never crosses or crosses after ``end``.
+
+        Args:
+            start: Date of the last good calibration
+            end: Date the tool was found out of tolerance
+            lower_error: Lowest acceptable tool error (lower limit - nominal)
+            upper_error: Highest acceptable tool error (upper limit - nominal)
+            safety_days: Days to move the estimated crossing earlier
+
+        Returns:
+            tuple: (window start, window end) as Timestamps
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if not self.is_linear:
+            return start, end
+        crossing = self.crossing_date(lower_error, upper_error)
+        if crossing is None or crossing > end:
+            return start, end
+        return max(start, crossing - pd.Timedelta(days=safety_days)), end
+
+
+class DriftingDeviation:
+    """A tool deviation that grows with the drift model over time.
+
+    The as-found deviation (a scalar or an ``ErrorCurve``) is exact on the
+    date the tool was found out of tolerance. Earlier measurements are
+    corrected by the fraction of that error the drift model predicts on
+    their measurement date.
+
+    Args:
+        base: The as-found deviation, a scalar or an ``ErrorCurve``
+        model: The fitted ``DriftModel``
+        found_date: Date the tool was found out of tolerance
+        date_column: Column holding each measurement's date
+    """
+
+    def __init__(self, base, model, found_date, date_column=DATE_COLUMN):
+        self.base = base
+        self.model = model
+        self.found_date = pd.Timestamp(found_date)
+        self.date_column = date_column
+        self.found_error = float(model.error_at([self.found_date])[0])
+        if self.found_error == 0:
+            raise ValueError("The drift model predicts no error when found.")
+
+    def fraction_at(self, dates):
+        """Returns the fraction of the as-found error present on each date."""
+        return np.clip(self.model.error_at(dates) / self.found_error, 0.0, 1.0)
+
+    def row_values(self, df):
+        """Returns the deviation for each row of a pandas DataFrame."""
+        base = self.base
+        if hasattr(base, "row_values"):
+            base = base.row_values(df)
+        return base * self.fraction_at(df[self.date_column])
+
+    def row_column(self):
+        """Returns the deviation for each row as a Spark Column."""
+        from pyspark.sql.functions import col, datediff, greatest, least, lit, to_date
+
+        days = datediff(to_date(col(self.date_column)), lit(self.model.origin.date()))
+        error = lit(self.model.intercept) + days * self.model.slope_per_day
+        fraction = greatest(lit(0.0), least(lit(1.0), error / self.found_error))
+        base = self.base
+        base = base.row_column() if hasattr(base, "row_column") else lit(base)
+        return base * fraction
+
+    def bounds(self, low, high):
+        """Returns the (min, max) deviation for sizes in ``[low, high]``.
+
+        The drift fraction lies in ``[0, 1]``, so the deviation lies between
+        zero and the as-found deviation at each size.
+        """
+        if hasattr(self.base, "bounds"):
+            base_low, base_high = self.base.bounds(low, high)
+        else:
+            base_low = base_high = float(self.base)
+        return min(base_low, 0.0), max(base_high, 0.0)
+
+
+def filter_to_window(df, start, end, date_column=DATE_COLUMN):
+    """Keeps the measurements taken within ``[start, end]``.
+
+    Args:
+        df: pandas or Spark DataFrame of measurements
+        start: First date of the window
+        end: Last date of the window
+        date_column: Column holding each measurement's date
+
+    Returns:
+        DataFrame: The measurements inside the window
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if hasattr(df, "rdd"):
+        from pyspark.sql.functions import col, lit, to_date
+
+        date = to_date(col(date_column))
+        return df.filter((date >= lit(start.date())) & (date <= lit(end.date())))
+
+    return df[window_mask(df, start, end, date_column)]
+
+
+def window_mask(df, start, end, date_column=DATE_COLUMN):
+    """Marks the rows of a pandas DataFrame taken within ``[start, end]``.
+
+    Masks of several filters can be combined and applied once, so a
+    memory-mapped history is not copied by every filter. Like the Spark
+    filter, it compares calendar dates, so readings taken during the day of
+    ``end`` are inside the window.
+
+    Returns:
+        ndarray: Boolean mask over the rows of ``df``
+    """
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    dates = pd.to_datetime(df[date_column]).dt.normalize()
+    return ((dates >= start) & (dates <= end)).to_numpy()
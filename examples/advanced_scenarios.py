@@ -4,11 +4,14 @@ Advanced Usage Scenarios for CalibrationIQ
 This example demonstrates complex real-world scenarios including:
 - Conservative vs non-conservative OOT events
 - Multi-tool analysis
-- Statistical analysis of impact
+- Statistical analysis of impact (streaming statistics and Cp/Cpk)
 """
 
 from calibrationiq_notebook import calculate_deviation
-import statistics
+from oot_engine import evaluate_numpy
+from feature_stats import feature_statistics
+from top_exceedances import top_exceedances
+import pandas as pd
 
 
 def scenario_1_conservative_vs_nonconservative():
@@ -124,21 +127,39 @@ def scenario_3_statistical_analysis():
     # Calculate adjusted values
     adjusted_values = [m - tool_deviation for m in measured_values]
 
+    # Streaming statistics: chunks are folded into mergeable per-feature
+    # states, so the same code runs over billions of rows.
+    evaluated = evaluate_numpy(
+        pd.DataFrame(
+            {
+                "tool_id": "BC1234567",
+                "feature_name": "Hole Diameter",
+                "measured_value": measured_values,
+                "nominal_value": 0.5000,
+                "original_upper_tol": upper_tol,
+                "original_lower_tol": lower_tol,
+                "criticality": "Critical",
+            }
+        ),
+        tool_deviation,
+    )
+    chunks = [chunk for _, chunk in evaluated.groupby(evaluated.index // 5)]
+    stats = feature_statistics(chunks).iloc[0]
+
     # Statistical analysis
     print("\n📊 Measurement Statistics:")
-    print(f"\nOriginal Measurements:")
-    print(f"   Mean:    {statistics.mean(measured_values):.4f}\"")
-    print(f"   Median:  {statistics.median(measured_values):.4f}\"")
-    print(f"   Std Dev: {statistics.stdev(measured_values):.4f}\"")
-    print(f"   Min:     {min(measured_values):.4f}\"")
-    print(f"   Max:     {max(measured_values):.4f}\"")
-
-    print(f"\nAdjusted (True) Values:")
-    print(f"   Mean:    {statistics.mean(adjusted_values):.4f}\"")
-    print(f"   Median:  {statistics.median(adjusted_values):.4f}\"")
-    print(f"   Std Dev: {statistics.stdev(adjusted_values):.4f}\"")
-    print(f"   Min:     {min(adjusted_values):.4f}\"")
-    print(f"   Max:     {max(adjusted_values):.4f}\"")
+    for kind, title in [
+        ("raw", "Original Measurements"),
+        ("adjusted", "Adjusted (True) Values"),
+    ]:
+        print(f"\n{title}:")
+        print(f"   Mean:    {stats[f'{kind}_mean']:.4f}\"")
+        print(f"   Median:  {stats[f'{kind}_p50']:.4f}\"")
+        print(f"   Std Dev: {stats[f'{kind}_std']:.4f}\"")
+        print(f"   Min:     {stats[f'{kind}_min']:.4f}\"")
+        print(f"   Max:     {stats[f'{kind}_max']:.4f}\"")
+        print(f"   Cp:      {stats[f'{kind}_cp']:.2f}")
+        print(f"   Cpk:     {stats[f'{kind}_cpk']:.2f}")
 
     # Pass/Fail analysis
     original_passes = sum(1 for m in measured_values if lower_tol <= m <= upper_tol)
@@ -151,7 +172,7 @@ def scenario_3_statistical_analysis():
     print(f"   New Failures:             {original_passes - adjusted_passes}")
 
     # Distribution shift
-    mean_shift = statistics.mean(adjusted_values) - statistics.mean(measured_values)
+    mean_shift = stats["mean_shift"]
     print(f"\n📉 Distribution Shift:")
     print(f"   Mean shifted by:          {mean_shift:+.4f}\"")
     print(f"   Direction:                {'Higher' if mean_shift > 0 else 'Lower'}")
@@ -193,6 +214,33 @@ def scenario_4_risk_assessment():
 
         print(f"{part['id']:<12} {part['criticality']:<15} {part['qty']:<6} {adjusted:<10.4f} {over_limit:+.4f}\"     {risk_score:<10}")
 
+    # Triage list: worst exceedance beyond the expanded limits per
+    # criticality, weighted by quantity, without sorting every failure.
+    evaluated = evaluate_numpy(
+        pd.DataFrame(
+            {
+                "sample_serial_number": [part["id"] for part in parts],
+                "measured_value": [part["measured"] for part in parts],
+                "nominal_value": [
+                    (part["upper"] + part["lower"]) / 2 for part in parts
+                ],
+                "original_upper_tol": [part["upper"] for part in parts],
+                "original_lower_tol": [part["lower"] for part in parts],
+                "criticality": [part["criticality"] for part in parts],
+                "qty": [part["qty"] for part in parts],
+            }
+        ),
+        tool_deviation,
+    )
+    worst = top_exceedances(
+        evaluated, 1, record_columns=["sample_serial_number"], quantity_column="qty"
+    )
+
+    print("\n🏆 Worst Exceedance per Criticality (exceedance x qty):\n")
+    for _, row in worst.iterrows():
+        serial = row["sample_serial_number"]
+        print(f"   {row['criticality']:<15} {serial:<12} {row['score']:.4f}")
+
     print("\n📋 Recommended Actions:")
     print("   🔴 HIGH Risk:   Immediate containment, 100% inspection, engineering review")
     print("   🟡 MEDIUM Risk: Sample inspection, disposition by quality engineer")
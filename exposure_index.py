@@ -0,0 +1,205 @@
+"""CalibrationIQ: Reverse index from parts and jobs to OOT exposure.
+
+Disposition and shipping teams need to know whether a serial number or a job
+is affected by an open OOT event without rerunning the pipeline per ticket.
+The exposure index maps each part to its jobs and the tools used to measure
+it, and each completed ticket records which parts its impact window touched
+and whether they failed. Lookups are dictionary reads, and the index is
+updated incrementally as tickets complete.
+"""
+
+import json
+
+import pandas as pd
+
+from oot_engine import STATUS_FAIL, STATUS_PASS
+
+SERIAL_COLUMN = "sample_serial_number"
+JOB_COLUMN = "job_number"
+TOOL_COLUMN = "tool_id"
+
+
+def _distinct_rows(df, columns):
+    """Returns the distinct values of ``columns`` as a list of tuples."""
+    if hasattr(df, "rdd"):
+        return [tuple(row) for row in df.select(*columns).distinct().collect()]
+    frame = df[columns].drop_duplicates()
+    return list(frame.itertuples(index=False, name=None))
+
+
+class ExposureIndex:
+    """Reverse index from serial numbers and jobs to OOT events.
+
+    Args:
+        parts: Mapping of serial -> {"jobs": set, "tools": set}
+        jobs: Mapping of job -> set of serials
+        events: Mapping of ticket -> {"tool_id", "open", "serials"}
+        exposure: Mapping of serial -> {ticket: status code}
+    """
+
+    def __init__(self, parts=None, jobs=None, events=None, exposure=None):
+        self.parts = parts if parts is not None else {}
+        self.jobs = jobs if jobs is not None else {}
+        self.events = events if events is not None else {}
+        self.exposure = exposure if exposure is not None else {}
+
+    def ingest(self, df):
+        """Records which jobs and tools each part was measured with.
+
+        Args:
+            df: pandas or Spark DataFrame of measurements
+
+        Returns:
+            ExposureIndex: ``self``, so calls can be chained
+        """
+        columns = [SERIAL_COLUMN, JOB_COLUMN, TOOL_COLUMN]
+        for serial, job, tool_id in _distinct_rows(df, columns):
+            part = self.parts.setdefault(serial, {"jobs": set(), "tools": set()})
+            part["jobs"].add(job)
+            part["tools"].add(tool_id)
+            self.jobs.setdefault(job, set()).add(serial)
+        return self
+
+    def record_event(
+        self, ticket_id, tool_id, measurements, failures=None, replace=True
+    ):
+        """Records the parts touched by a completed OOT ticket.
+
+        Recording a ticket again (e.g. after a rerun) replaces its exposure,
+        unless ``replace`` is False: then the measurements are new rows of
+        an incremental run and are added to the ticket's existing exposure.
+        The status of each part they touch is set from ``failures`` again,
+        so a part whose failing reading was re-measured and passed is no
+        longer reported as failed.
+
+        Args:
+            ticket_id: The OOT ticket
+            tool_id: The out-of-tolerance tool
+            measurements: pandas or Spark DataFrame of the measurements in
+                the ticket's impact window
+            failures: DataFrame of the confirmed failures, if any. With
+                ``replace`` False, the ticket's failures over all runs
+            replace: Replace the ticket's previous exposure
+
+        Returns:
+            ExposureIndex: ``self``, so calls can be chained
+        """
+        self.ingest(measurements)
+        previous = set()
+        if replace:
+            self._forget_event(ticket_id)
+        elif ticket_id in self.events:
+            previous = set(self.events[ticket_id]["serials"])
+
+        failed = set()
+        if failures is not None:
+            failed = {row[0] for row in _distinct_rows(failures, [SERIAL_COLUMN])}
+        serials = {row[0] for row in _distinct_rows(measurements, [SERIAL_COLUMN])}
+        for serial in serials:
+            status = STATUS_FAIL if serial in failed else STATUS_PASS
+            self.exposure.setdefault(serial, {})[ticket_id] = status
+        self.events[ticket_id] = {
+            "tool_id": tool_id,
+            "open": True,
+            "serials": sorted(previous | serials),
+        }
+        return self
+
+    def _forget_event(self, ticket_id):
+        event = self.events.pop(ticket_id, None)
+        if event is None:
+            return
+        for serial in event["serials"]:
+            tickets = self.exposure.get(serial, {})
+            tickets.pop(ticket_id, None)
+            if not tickets:
+                self.exposure.pop(serial, None)
+
+    def close_event(self, ticket_id):
+        """Marks a ticket as dispositioned; closed events no longer expose parts."""
+        self.events[ticket_id]["open"] = False
+
+    def lookup_serial(self, serial, include_closed=False):
+        """Returns the OOT events touching one part.
+
+        Args:
+            serial: The part's serial number
+            include_closed: Also return events that have been closed
+
+        Returns:
+            dict: ticket -> {"tool_id", "status", "open"}
+        """
+        found = {}
+        for ticket_id, status in self.exposure.get(serial, {}).items():
+            event = self.events[ticket_id]
+            if event["open"] or include_closed:
+                found[ticket_id] = {
+                    "tool_id": event["tool_id"],
+                    "status": status,
+                    "open": event["open"],
+                }
+        return found
+
+    def lookup_job(self, job, include_closed=False):
+        """Returns the OOT events touching each part of a job.
+
+        Returns:
+            dict: serial -> the ``lookup_serial`` result, for exposed parts only
+        """
+        found = {}
+        for serial in self.jobs.get(job, ()):
+            events = self.lookup_serial(serial, include_closed)
+            if events:
+                found[serial] = events
+        return found
+
+    def check_serials(self, serials):
+        """Checks many serial numbers against the open OOT events.
+
+        Args:
+            serials: Iterable of serial numbers
+
+        Returns:
+            DataFrame: One row per serial with ``exposed``, ``failed`` and
+            the comma-separated open ``events``
+        """
+        rows = []
+        for serial in serials:
+            events = self.lookup_serial(serial)
+            rows.append(
+                (
+                    serial,
+                    bool(events),
+                    any(event["status"] == STATUS_FAIL for event in events.values()),
+                    ",".join(sorted(events)),
+                )
+            )
+        return pd.DataFrame(
+            rows, columns=[SERIAL_COLUMN, "exposed", "failed", "events"]
+        )
+
+    def save(self, path):
+        """Persists the exposure index as JSON."""
+        data = {
+            "parts": {
+                serial: {"jobs": sorted(part["jobs"]), "tools": sorted(part["tools"])}
+                for serial, part in self.parts.items()
+            },
+            "jobs": {job: sorted(serials) for job, serials in self.jobs.items()},
+            "events": self.events,
+            "exposure": self.exposure,
+        }
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """Loads an exposure index previously written by ``save``."""
+        with open(path) as f:
+            data = json.load(f)
+        parts = {
+            serial: {"jobs": set(part["jobs"]), "tools": set(part["tools"])}
+            for serial, part in data["parts"].items()
+        }
+        jobs = {job: set(serials) for job, serials in data["jobs"].items()}
+        return cls(parts, jobs, data["events"], data["exposure"])
@@ -0,0 +1,314 @@
+"""CalibrationIQ: Streaming per-feature statistics and capability indices.
+
+Shows how the tool deviation shifts each feature's distribution. For every
+feature specification (tool, feature, nominal and limits) the raw and the
+adjusted values are summarized in one pass over chunks or Spark partitions:
+count, mean and variance (Welford, merged with Chan's parallel update),
+min/max, approximate quantiles from a mergeable KLL-style sketch, and the
+Cp/Cpk capability indices. Keying by the specification keeps parts with
+different limits apart, so capability is never computed against limits that
+no row actually had. The moments merge exactly; the sketch holds a bounded
+number of values however many rows are folded in.
+"""
+
+import math
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+FEATURE_KEY_COLUMNS = [
+    "tool_id",
+    "feature_name",
+    "nominal_value",
+    "original_upper_tol",
+    "original_lower_tol",
+]
+
+# Values kept per sketch level. Quantile ranks are accurate to roughly
+# log2(n / k) / k of the count, e.g. well under 1% for a million rows.
+SKETCH_SIZE = 512
+
+# Rows per batch when folding a Spark partition.
+PARTITION_BATCH_ROWS = 65536
+
+QUANTILES = [0.05, 0.5, 0.95]
+
+
+class QuantileSketch:
+    """Mergeable KLL-style sketch for approximate quantiles.
+
+    Values enter level 0 with weight 1. A level holding more than ``k``
+    values is compacted: it is sorted and every other value moves up one
+    level with double the weight. Memory stays at about ``k`` values per
+    level, i.e. ``O(k log(n / k))`` for ``n`` values. The compaction offset
+    alternates per level instead of being drawn at random, so results are
+    reproducible.
+
+    Args:
+        k: Values kept per level
+    """
+
+    def __init__(self, k=SKETCH_SIZE):
+        self.k = k
+        self.levels = []
+        self._offsets = []
+
+    def _level(self, height):
+        while len(self.levels) <= height:
+            self.levels.append(np.empty(0, dtype=np.float64))
+            self._offsets.append(0)
+        return self.levels[height]
+
+    def _compact(self):
+        height = 0
+        while height < len(self.levels):
+            level = self.levels[height]
+            if level.size > self.k:
+                level = np.sort(level)
+                # An odd value out stays behind so the total weight is exact.
+                odd = level.size % 2
+                keep, pairs = level[:odd], level[odd:]
+                offset = self._offsets[height]
+                self._offsets[height] = 1 - offset
+                promoted = pairs[offset::2]
+                self.levels[height] = keep
+                self._level(height + 1)
+                self.levels[height + 1] = np.concatenate(
+                    [self.levels[height + 1], promoted]
+                )
+            height += 1
+
+    def update(self, values):
+        """Adds an array of values to the sketch."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        self.levels[0] = np.concatenate([self._level(0), values])
+        self._compact()
+
+    def merge(self, other):
+        """Adds another sketch with the same ``k``."""
+        if other.k != self.k:
+            raise ValueError("Only sketches with the same size can merge.")
+        for height, level in enumerate(other.levels):
+            self.levels[height] = np.concatenate([self._level(height), level])
+        self._compact()
+
+    @property
+    def retained(self):
+        """Number of values held by the sketch."""
+        return sum(level.size for level in self.levels)
+
+    def quantile(self, q):
+        """Returns the approximate ``q`` quantile, or NaN when empty."""
+        if not self.retained:
+            return float("nan")
+        values = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [np.full(level.size, 2**height) for height, level in enumerate(self.levels)]
+        )
+        order = np.argsort(values, kind="stable")
+        counts = np.cumsum(weights[order])
+        rank = q * (counts[-1] - 1)
+        index = int(np.searchsorted(counts, rank, side="right"))
+        return float(values[order][index])
+
+
+class RunningStats:
+    """Count, mean, variance, extremes and quantiles of a value stream."""
+
+    def __init__(self, k=SKETCH_SIZE):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.sketch = QuantileSketch(k)
+
+    def _combine(self, count, mean, m2):
+        """Chan's parallel update of the Welford state."""
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def update(self, values):
+        """Folds an array of values into the state."""
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return
+        mean = float(values.mean())
+        self._combine(values.size, mean, float(((values - mean) ** 2).sum()))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.sketch.update(values)
+
+    def merge(self, other):
+        """Folds another partial state into this one."""
+        if other.count == 0:
+            return
+        self._combine(other.count, other.mean, other.m2)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    @property
+    def std(self):
+        """Sample standard deviation, or NaN with fewer than two values."""
+        if self.count < 2:
+            return float("nan")
+        return math.sqrt(self.m2 / (self.count - 1))
+
+
+def capability(stats, upper, lower):
+    """Returns the (Cp, Cpk) of a value stream against its tolerance limits.
+
+    Args:
+        stats: ``RunningStats`` of the values
+        upper: Upper tolerance limit
+        lower: Lower tolerance limit
+
+    Returns:
+        tuple: (Cp, Cpk), NaN when the spread is zero or undefined
+    """
+    sigma = stats.std
+    if not sigma > 0:
+        return float("nan"), float("nan")
+    cp = (upper - lower) / (6 * sigma)
+    cpk = min(upper - stats.mean, stats.mean - lower) / (3 * sigma)
+    return cp, cpk
+
+
+class FeatureStats:
+    """Per-specification statistics of raw and adjusted values.
+
+    Rows are grouped by ``FEATURE_KEY_COLUMNS``, so every group has exactly
+    one set of tolerance limits, which its capability indices use.
+
+    Args:
+        k: Values kept per quantile sketch level
+    """
+
+    def __init__(self, k=SKETCH_SIZE):
+        self.k = k
+        self.features = {}
+
+    def _feature(self, key):
+        feature = self.features.get(key)
+        if feature is None:
+            feature = {
+                "raw": RunningStats(self.k),
+                "adjusted": RunningStats(self.k),
+            }
+            self.features[key] = feature
+        return feature
+
+    def update(self, df):
+        """Folds a pandas chunk of evaluated measurements into the states.
+
+        Args:
+            df: Chunk evaluated by one of the Block 7 engines
+
+        Returns:
+            FeatureStats: ``self``, so calls can be chained
+        """
+        raw = df["measured_value"].to_numpy(dtype=np.float64)
+        adjusted = df["adjusted_value"].to_numpy(dtype=np.float64)
+        groups = df.groupby(
+            FEATURE_KEY_COLUMNS, sort=False, observed=True, dropna=False
+        ).indices
+        for key, rows in groups.items():
+            feature = self._feature(tuple(key))
+            feature["raw"].update(raw[rows])
+            feature["adjusted"].update(adjusted[rows])
+        return self
+
+    def merge(self, other):
+        """Folds another instance's partial states into this one.
+
+        Returns:
+            FeatureStats: ``self``, so calls can be chained
+        """
+        for key, theirs in other.features.items():
+            feature = self._feature(key)
+            feature["raw"].merge(theirs["raw"])
+            feature["adjusted"].merge(theirs["adjusted"])
+        return self
+
+    def to_frame(self):
+        """Returns one row of statistics per feature specification.
+
+        Returns:
+            DataFrame: For ``raw`` and ``adjusted`` values the count, mean,
+            std, min, max, p05/p50/p95, Cp and Cpk, plus the mean shift
+        """
+        rows = []
+        for key, feature in self.features.items():
+            row = dict(zip(FEATURE_KEY_COLUMNS, key))
+            for kind in ["raw", "adjusted"]:
+                stats = feature[kind]
+                cp, cpk = capability(
+                    stats, row["original_upper_tol"], row["original_lower_tol"]
+                )
+                row[f"{kind}_count"] = stats.count
+                row[f"{kind}_mean"] = stats.mean
+                row[f"{kind}_std"] = stats.std
+                row[f"{kind}_min"] = stats.min
+                row[f"{kind}_max"] = stats.max
+                for q in QUANTILES:
+                    row[f"{kind}_p{round(q * 100):02d}"] = stats.sketch.quantile(q)
+                row[f"{kind}_cp"] = cp
+                row[f"{kind}_cpk"] = cpk
+            row["mean_shift"] = feature["adjusted"].mean - feature["raw"].mean
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+
+def feature_statistics(chunks, k=SKETCH_SIZE):
+    """Computes per-feature statistics in one pass.
+
+    Args:
+        chunks: An evaluated pandas DataFrame, an iterable of them, or an
+            evaluated Spark DataFrame
+        k: Values kept per quantile sketch level
+
+    Returns:
+        DataFrame: The result of ``FeatureStats.to_frame``
+    """
+    if hasattr(chunks, "rdd"):
+        return feature_statistics_spark(chunks, k).to_frame()
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    stats = FeatureStats(k)
+    for chunk in chunks:
+        stats.update(chunk)
+    return stats.to_frame()
+
+
+def feature_statistics_spark(df, k=SKETCH_SIZE):
+    """Builds per-partition states in Spark and merges them on the driver.
+
+    Args:
+        df: Spark DataFrame evaluated by one of the Block 7 engines
+        k: Values kept per quantile sketch level
+
+    Returns:
+        FeatureStats: The merged states
+    """
+    columns = FEATURE_KEY_COLUMNS + ["measured_value", "adjusted_value"]
+
+    def partition_stats(rows):
+        stats = FeatureStats(k)
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, PARTITION_BATCH_ROWS))
+            if not batch:
+                break
+            stats.update(pd.DataFrame(batch, columns=columns))
+        yield stats
+
+    return (
+        df.select(*columns)
+        .rdd.mapPartitions(partition_stats)
+        .fold(FeatureStats(k), lambda left, right: left.merge(right))
+    )
@@ -12,7 +12,11 @@ def generate_data():
         'original_upper_tol': [0.5010, 1.2520, 3.0005, 0.1010, 0.7510, 0.2505, 1.5005],
         'original_lower_tol': [0.4990, 1.2480, 2.9995, 0.0990, 0.7490, 0.2495, 1.4995],
         'tolerance_type': ['BILATERAL', 'BILATERAL', 'BILATERAL', 'BILATERAL', 'BILATERAL', 'BILATERAL', 'BILATERAL'],
-        'criticality': ['Critical', 'Major', 'NotSpecified', 'NotSpecified', 'Minor', 'Critical', 'Minor']
+        'criticality': ['Critical', 'Major', 'NotSpecified', 'NotSpecified', 'Minor', 'Critical', 'Minor'],
+        'tool_id': ['BC1234567', 'BC1234567', 'BC1234567', 'BC1234567', 'BC1234567',
+                    'BC7654321', 'BC7654321'],
+        'measurement_date': ['2023-02-14', '2023-02-14', '2023-07-11', '2023-07-11',
+                             '2023-10-03', '2023-05-22', '2023-05-22']
     }
     df = pd.DataFrame(data)
     
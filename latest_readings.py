@@ -0,0 +1,210 @@
+"""CalibrationIQ: Latest-reading deduplication of re-inspected characteristics.
+
+Histories hold re-measurements of the same dimension on the same part and
+duplicate uploads of the same reading. Evaluating all of them inflates the
+failure counts, so ingestion keeps one authoritative reading per
+(job, serial, dimension): the latest by measurement timestamp, then by
+reading sequence when the store logs one, then the later upload. The other
+readings are returned alongside, labelled as duplicate uploads or superseded
+re-measurements, so they can be reported instead of silently dropped.
+"""
+
+import numpy as np
+import pandas as pd
+
+READING_KEY_COLUMNS = ["job_number", "sample_serial_number", "dimension_id"]
+# Compared in order; columns a store does not log are skipped.
+READING_ORDER_COLUMNS = ["measurement_date", "reading_sequence"]
+SUPERSEDED_REASON_COLUMN = "superseded_reason"
+# Source file of each Spark row, taken at the scan. A history cached before
+# deduplication must carry it, since a cached row has no input file.
+SOURCE_FILE_COLUMN = "_source"
+DUPLICATE_UPLOAD = "duplicate upload"
+REMEASURED = "re-measured"
+
+# Combined key codes stay below this bound, so they never overflow int64.
+MAX_KEY_SPACE = 2**62
+# Key codes are used directly as group ids while the key space is at most
+# this many times the row count; sparser spaces are renumbered densely.
+DENSE_KEY_SPACE_FACTOR = 4
+
+
+def _group_ids(df, columns):
+    """Returns a group id per row from the codes of the key ``columns``.
+
+    Text columns are hash-factorized (categoricals reuse their codes) and the
+    codes combined in mixed radix.
+
+    Returns:
+        tuple: (int64 group id array, size of the group id space)
+    """
+    ids = np.zeros(len(df), dtype=np.int64)
+    space = 1
+    for name in columns:
+        values = df[name]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy(np.int64)
+            size = len(values.cat.categories)
+        else:
+            codes, uniques = pd.factorize(values)
+            size = len(uniques)
+        if space * (size + 1) > MAX_KEY_SPACE:
+            ids, space = _compact(ids)
+        # Missing keys (code -1) form their own group.
+        ids = ids * (size + 1) + codes + 1
+        space *= size + 1
+    if space > len(df) * DENSE_KEY_SPACE_FACTOR:
+        ids, space = _compact(ids)
+    return ids, space
+
+
+def _compact(ids):
+    """Renumbers sparse group ids densely, returning (ids, number of ids)."""
+    ids = pd.factorize(ids)[0].astype(np.int64)
+    return ids, int(ids.max()) + 1 if len(ids) else 0
+
+
+def _order_keys(df, order_columns):
+    """Returns the int64 arrays ranking each reading, most significant first.
+
+    Missing timestamps and sequence numbers rank below every real value.
+    """
+    keys = []
+    for name in order_columns:
+        if name not in df:
+            continue
+        values = df[name]
+        if name == "measurement_date" or pd.api.types.is_datetime64_any_dtype(values):
+            # NaT is stored as the smallest int64.
+            stamps = pd.to_datetime(values).to_numpy("datetime64[ns]")
+            keys.append(stamps.view(np.int64))
+        else:
+            keys.append(
+                pd.to_numeric(values).fillna(np.iinfo(np.int64).min).to_numpy(np.int64)
+            )
+    return keys
+
+
+def latest_readings(df, order_columns=READING_ORDER_COLUMNS):
+    """Keeps the authoritative reading of each (job, serial, dimension).
+
+    pandas input is reduced without sorting: the keys are hash-factorized to
+    compact group ids and each order key is reduced with a scatter-max per
+    group, narrowing the candidates until one row per group remains.
+
+    Args:
+        df: pandas or Spark DataFrame of measurements
+        order_columns: Columns ranking a group's readings, latest last
+
+    Returns:
+        tuple: (latest readings, superseded readings). The superseded
+        readings carry a ``superseded_reason``: a duplicate upload repeats
+        the kept reading's order keys and value, anything else was re-measured
+    """
+    if hasattr(df, "rdd"):
+        return latest_readings_spark(df, order_columns)
+    latest, superseded = latest_mask(df, order_columns=order_columns)
+    return df[latest], superseded
+
+
+def latest_mask(df, rows=None, order_columns=READING_ORDER_COLUMNS):
+    """Marks the authoritative reading of each group of a pandas DataFrame.
+
+    Only the key, order and value columns of the candidate rows are read, so
+    a memory-mapped history is ranked without copying it.
+
+    Args:
+        df: pandas DataFrame of measurements
+        rows: Boolean mask of the rows to rank, e.g. the ticket's window;
+            all rows when None
+        order_columns: Columns ranking a group's readings, latest last
+
+    Returns:
+        tuple: (boolean mask over the rows of ``df`` of the latest readings,
+        superseded readings), see ``latest_readings``
+    """
+    if rows is None:
+        positions = np.arange(len(df), dtype=np.int64)
+        candidates_df = df
+    else:
+        positions = np.flatnonzero(rows)
+        columns = READING_KEY_COLUMNS + [
+            name for name in order_columns + ["measured_value"] if name in df
+        ]
+        candidates_df = df[columns].iloc[positions]
+
+    groups, group_count = _group_ids(candidates_df, READING_KEY_COLUMNS)
+    order_keys = _order_keys(candidates_df, order_columns)
+    # The later upload wins ties.
+    position = np.arange(len(candidates_df), dtype=np.int64)
+    candidates = np.ones(len(candidates_df), dtype=bool)
+    for key in order_keys + [position]:
+        best = np.full(group_count, np.iinfo(np.int64).min, dtype=np.int64)
+        np.maximum.at(best, groups[candidates], key[candidates])
+        candidates &= key == best[groups]
+
+    kept_row = np.empty(group_count, dtype=np.int64)
+    kept_row[groups[candidates]] = position[candidates]
+    dropped = position[~candidates]
+    kept = kept_row[groups[dropped]]
+    measured = candidates_df["measured_value"].to_numpy()
+    duplicate = measured[dropped] == measured[kept]
+    for key in order_keys:
+        duplicate &= key[dropped] == key[kept]
+
+    superseded = df.iloc[positions[dropped]].copy()
+    superseded[SUPERSEDED_REASON_COLUMN] = np.where(
+        duplicate, DUPLICATE_UPLOAD, REMEASURED
+    ).astype(object)
+    latest = np.zeros(len(df), dtype=bool)
+    latest[positions[candidates]] = True
+    return latest, superseded
+
+
+def latest_readings_spark(df, order_columns=READING_ORDER_COLUMNS):
+    """Keeps the authoritative reading of each group of a Spark DataFrame.
+
+    One window over the reading key ranks each group's readings, so the
+    history is shuffled once by key and never joined back to itself. Ties
+    on the order keys go to the later source file, then to a hash of the
+    whole row, so every run and every partitioning keeps the same reading.
+    The source file is read from ``SOURCE_FILE_COLUMN`` when ``df`` carries
+    it, e.g. because it was cached after the scan.
+
+    Returns:
+        tuple: (latest readings, superseded readings), see ``latest_readings``
+    """
+    from pyspark.sql import Window
+    from pyspark.sql import functions as F
+
+    order = []
+    for name in order_columns:
+        if name not in df.columns:
+            continue
+        if name == "measurement_date":
+            order.append(F.to_timestamp(F.col(name)))
+        else:
+            order.append(F.col(name))
+    # The file name is taken at the scan, before the window's shuffle.
+    columns = [name for name in df.columns if name != SOURCE_FILE_COLUMN]
+    sourced = df
+    if SOURCE_FILE_COLUMN not in df.columns:
+        sourced = df.withColumn(SOURCE_FILE_COLUMN, F.input_file_name())
+    tie_breakers = [F.col(SOURCE_FILE_COLUMN), F.xxhash64(*columns)]
+    window = Window.partitionBy(*READING_KEY_COLUMNS).orderBy(
+        *[key.desc_nulls_last() for key in order + tie_breakers]
+    )
+    # A duplicate upload repeats the kept reading's order keys and value.
+    duplicate = F.col("measured_value") == F.first("measured_value").over(window)
+    for key in order:
+        duplicate = duplicate & key.eqNullSafe(F.first(key).over(window))
+    ranked = sourced.withColumn("_rank", F.row_number().over(window)).withColumn(
+        SUPERSEDED_REASON_COLUMN,
+        F.when(duplicate, F.lit(DUPLICATE_UPLOAD)).otherwise(F.lit(REMEASURED)),
+    )
+    latest = ranked.filter(F.col("_rank") == 1).drop(SUPERSEDED_REASON_COLUMN)
+    superseded = ranked.filter(F.col("_rank") > 1)
+    return (
+        latest.drop("_rank", SOURCE_FILE_COLUMN),
+        superseded.drop("_rank", SOURCE_FILE_COLUMN),
+    )
@@ -0,0 +1,290 @@
+"""CalibrationIQ: Partitioned columnar measurement store.
+
+Measurements are stored as Parquet, partitioned by tool_id and measurement
+month, with the rows of each file sorted by measurement date. A ticket's
+``start_date``/``end_date`` window and tool filter are pushed down to
+partition pruning and then to row-group statistics, so a one-tool,
+one-month ticket reads only that tool's files for that month.
+
+The store can be read by the Spark engine or, through Arrow, by the local
+NumPy engine. Fleet-wide Spark jobs can also keep the history as a table
+bucketed by tool_id, so joins to tool tables bucketed the same way need no
+shuffle.
+"""
+
+import hashlib
+import os
+import uuid
+from collections import Counter
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+DATE_COLUMN = "measurement_date"
+TOOL_COLUMN = "tool_id"
+MONTH_COLUMN = "measurement_month"
+PARTITION_COLUMNS = [TOOL_COLUMN, MONTH_COLUMN]
+
+# Daily partitions would produce one small file per tool per day; months keep
+# files large while still pruning a ticket window to a few partitions.
+MONTH_FORMAT = "%Y-%m"
+ROW_GROUP_ROWS = 128 * 1024
+# Bucket count of tool-bucketed tables; tables joined without a shuffle must
+# use the same count.
+DEFAULT_BUCKETS = 64
+# Arrow and Spark skip files starting with "_" or ".", so the zone map can be
+# kept inside the store.
+ZONE_MAP_FILE = "_zone_map.json"
+
+PARTITIONING = ds.partitioning(
+    pa.schema([(TOOL_COLUMN, pa.string()), (MONTH_COLUMN, pa.string())]),
+    flavor="hive",
+)
+
+
+def zone_map_path(path):
+    """Returns the location of the store's zone map."""
+    return os.path.join(path, ZONE_MAP_FILE)
+
+
+def data_files(path):
+    """Lists the data files of the store, ignoring its metadata files.
+
+    Every write adds uniquely named files and never changes existing ones,
+    so the files missing from an earlier listing hold exactly the rows
+    ingested since.
+
+    Returns:
+        list: Sorted paths of the data files, relative to ``path``
+    """
+    return sorted(
+        os.path.relpath(os.path.join(root, name), path)
+        for root, _, names in os.walk(path)
+        for name in names
+        if not name.startswith(("_", "."))
+    )
+
+
+def data_snapshot(path):
+    """Identifies the data files of the store.
+
+    The id changes with each append or rewrite.
+
+    Returns:
+        str: SHA-256 hex digest of the relative paths of the data files
+    """
+    return hashlib.sha256("\n".join(data_files(path)).encode("utf-8")).hexdigest()
+
+
+def _fold_into_zone_map(zone_map, df, path):
+    """Folds a written batch into the store's zone map and saves it."""
+    zone_map.ingest(df)
+    zone_map.snapshot = data_snapshot(path)
+    zone_map.save(zone_map_path(path))
+
+
+def _check_zone_map(zone_map, path):
+    """Rejects a zone map that missed earlier writes to the store."""
+    if zone_map is not None and zone_map.snapshot != data_snapshot(path):
+        raise ValueError("The zone map does not cover the store's current files.")
+
+
+def write_measurements(df, path, zone_map=None):
+    """Appends a pandas DataFrame of measurements to the store.
+
+    Args:
+        df: pandas DataFrame with the historical measurement schema
+        path: Root directory of the store
+        zone_map: The store's ``ZoneMap`` (see ``open_store_zone_map``); the
+            batch is folded into it and it is saved with the store
+
+    Raises:
+        ValueError: If ``zone_map`` does not cover the store's current files
+    """
+    _check_zone_map(zone_map, path)
+    frame = df.copy()
+    dates = pd.to_datetime(frame[DATE_COLUMN])
+    frame[DATE_COLUMN] = dates.dt.date
+    frame[MONTH_COLUMN] = dates.dt.strftime(MONTH_FORMAT)
+    frame = frame.sort_values([TOOL_COLUMN, DATE_COLUMN], kind="stable")
+
+    ds.write_dataset(
+        pa.Table.from_pandas(frame, preserve_index=False),
+        path,
+        format="parquet",
+        partitioning=PARTITIONING,
+        existing_data_behavior="overwrite_or_ignore",
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        max_rows_per_group=ROW_GROUP_ROWS,
+        min_rows_per_group=min(ROW_GROUP_ROWS, len(frame)),
+    )
+    if zone_map is not None:
+        _fold_into_zone_map(zone_map, df, path)
+
+
+def write_measurements_spark(df, path, zone_map=None):
+    """Appends a Spark DataFrame of measurements to the store.
+
+    Args:
+        df: Spark DataFrame with the historical measurement schema
+        path: Root directory of the store
+        zone_map: The store's ``ZoneMap``, see ``write_measurements``
+
+    Raises:
+        ValueError: If ``zone_map`` does not cover the store's current files
+    """
+    from pyspark.sql.functions import col, date_format, to_date
+
+    _check_zone_map(zone_map, path)
+    (
+        df.withColumn(DATE_COLUMN, to_date(col(DATE_COLUMN)))
+        .withColumn(MONTH_COLUMN, date_format(col(DATE_COLUMN), "yyyy-MM"))
+        .repartition(*PARTITION_COLUMNS)
+        .sortWithinPartitions(DATE_COLUMN)
+        .write.partitionBy(*PARTITION_COLUMNS)
+        .mode("append")
+        .parquet(path)
+    )
+    if zone_map is not None:
+        _fold_into_zone_map(zone_map, df, path)
+
+
+def write_bucketed_table(df, table_name, num_buckets=DEFAULT_BUCKETS, sort_column=None):
+    """Saves a Spark DataFrame as a table bucketed by tool_id.
+
+    Measurement histories and OOT tool/deviation tables written with the
+    same bucket count are co-partitioned, so Spark joins them on tool_id
+    bucket by bucket without shuffling either side.
+
+    Args:
+        df: Spark DataFrame with a tool_id column
+        table_name: Metastore table to append to
+        num_buckets: Number of tool_id buckets
+        sort_column: Column to sort each bucket by, e.g. the measurement date
+    """
+    writer = df.write.bucketBy(num_buckets, TOOL_COLUMN)
+    if sort_column is not None:
+        writer = writer.sortBy(sort_column)
+    writer.mode("append").format("parquet").saveAsTable(table_name)
+
+
+def tool_row_counts(path):
+    """Returns the number of stored measurements per tool.
+
+    The counts come from the Parquet footers of each tool partition, so no
+    measurement data is read.
+
+    Returns:
+        dict: tool_id -> row count
+    """
+    counts = Counter()
+    for fragment in open_store(path).get_fragments():
+        keys = ds.get_partition_keys(fragment.partition_expression)
+        counts[keys[TOOL_COLUMN]] += fragment.metadata.num_rows
+    return dict(counts)
+
+
+def _window_filter(start, end, tool_id):
+    """Builds the Arrow filter for a ticket's window and tool."""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    expression = (
+        (ds.field(MONTH_COLUMN) >= start.strftime(MONTH_FORMAT))
+        & (ds.field(MONTH_COLUMN) <= end.strftime(MONTH_FORMAT))
+        & (ds.field(DATE_COLUMN) >= pa.scalar(start.date()))
+        & (ds.field(DATE_COLUMN) <= pa.scalar(end.date()))
+    )
+    if tool_id is not None:
+        expression = expression & (ds.field(TOOL_COLUMN) == tool_id)
+    return expression
+
+
+def open_store(path, files=None):
+    """Opens the store as an Arrow dataset.
+
+    Args:
+        path: Root directory of the store
+        files: Only open these data files (paths relative to ``path``), if
+            given
+    """
+    dataset = ds.dataset(path, format="parquet", partitioning=PARTITIONING)
+    if files is None:
+        return dataset
+    # The listed files keep the store's schema, even when there are none.
+    return ds.dataset(
+        [os.path.join(path, name) for name in files],
+        schema=dataset.schema,
+        format="parquet",
+        partitioning=PARTITIONING,
+        partition_base_dir=os.fspath(path),
+    )
+
+
+def files_for_window(path, start, end, tool_id=None, files=None):
+    """Returns the (matching, total) number of files for a ticket window."""
+    dataset = open_store(path, files)
+    matching = dataset.get_fragments(filter=_window_filter(start, end, tool_id))
+    return len(list(matching)), len(dataset.files)
+
+
+def read_measurements(path, start, end, tool_id=None, columns=None, files=None):
+    """Reads a ticket's measurements from the store for the NumPy engine.
+
+    Args:
+        path: Root directory of the store
+        start: First date of the ticket window
+        end: Last date of the ticket window
+        tool_id: Only read this tool's measurements, if given
+        columns: Columns to read (default: all measurement columns)
+        files: Only read these data files (see ``data_files``), e.g. the
+            ones ingested since a ticket's previous run
+
+    Returns:
+        DataFrame: pandas DataFrame of the matching measurements
+    """
+    dataset = open_store(path, files)
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name != MONTH_COLUMN]
+    table = dataset.to_table(
+        columns=columns, filter=_window_filter(start, end, tool_id)
+    )
+    return table.to_pandas()
+
+
+def read_measurements_spark(spark, path, start, end, tool_id=None, files=None):
+    """Reads a ticket's measurements from the store with Spark.
+
+    Filters on the partition columns prune directories; the date filter is
+    pushed down to the Parquet row-group statistics.
+
+    Args:
+        spark: The active SparkSession
+        path: Root directory of the store
+        start: First date of the ticket window
+        end: Last date of the ticket window
+        tool_id: Only read this tool's measurements, if given
+        files: Only read these data files (see ``data_files``)
+
+    Returns:
+        DataFrame: Spark DataFrame of the matching measurements
+    """
+    from pyspark.sql.functions import col, lit
+
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    reader = spark.read.option("basePath", os.fspath(path))
+    if files is None:
+        df = reader.parquet(path)
+    elif files:
+        df = reader.parquet(*[os.path.join(path, name) for name in files])
+    else:
+        # Nothing was ingested: the store's schema with no rows.
+        df = reader.parquet(path).limit(0)
+    df = df.filter(
+        (col(MONTH_COLUMN) >= start.strftime(MONTH_FORMAT))
+        & (col(MONTH_COLUMN) <= end.strftime(MONTH_FORMAT))
+        & (col(DATE_COLUMN) >= lit(start.date()))
+        & (col(DATE_COLUMN) <= lit(end.date()))
+    )
+    if tool_id is not None:
+        df = df.filter(col(TOOL_COLUMN) == tool_id)
+    return df.drop(MONTH_COLUMN)
@@ -0,0 +1,190 @@
+"""CalibrationIQ: Monte Carlo probability of nonconformance.
+
+Block 7 treats the tool deviation as exact, but the calibration certificate
+states it with a measurement uncertainty. This module draws the deviation
+(and optionally the gauge repeatability) from its uncertainty distribution
+and reports, per measurement, the probability that the part's true size is
+outside its expanded limits.
+
+Rows are split into fixed seed blocks, each with its own random stream, so
+results depend only on the seed and never on the worker count or memory
+budget. Draws are generated in batches sized to the memory budget and the
+blocks are spread across a process pool.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from oot_engine import row_deviation
+
+DEFAULT_DRAWS = 2000
+DEFAULT_MEMORY_BUDGET_BYTES = 256 * 1024**2
+
+# Rows per independently seeded random stream. Fixed, so that results are
+# reproducible regardless of how blocks are batched or distributed.
+SEED_BLOCK_ROWS = 4096
+
+# Working memory per simulated (draw, row) cell: the float64 noise draws, the
+# float64 true sizes and the three boolean masks of the limit checks.
+BYTES_PER_CELL = 8 + 8 + 3
+
+DISTRIBUTIONS = ["normal", "uniform"]
+
+
+def _draw_noise(rng, shape, standard_uncertainty, distribution):
+    """Draws zero-mean noise with the given standard uncertainty."""
+    if distribution == "uniform":
+        half_width = standard_uncertainty * np.sqrt(3.0)
+        return rng.uniform(-half_width, half_width, shape)
+    return rng.standard_normal(shape) * standard_uncertainty
+
+
+def _simulate_blocks(task):
+    """Simulates a contiguous run of seed blocks and returns their probabilities.
+
+    Runs in a worker process, so it takes one picklable tuple.
+    """
+    (
+        first_block,
+        measured,
+        lower,
+        upper,
+        deviation,
+        deviation_uncertainty,
+        repeatability,
+        draws,
+        seed,
+        budget_bytes,
+        distribution,
+    ) = task
+    probabilities = np.empty(measured.size, dtype=np.float64)
+
+    for start in range(0, measured.size, SEED_BLOCK_ROWS):
+        stop = min(start + SEED_BLOCK_ROWS, measured.size)
+        block = slice(start, stop)
+        rows = stop - start
+        block_index = first_block + start // SEED_BLOCK_ROWS
+        rng = np.random.default_rng(np.random.SeedSequence([seed, block_index]))
+        batch = max(1, min(draws, budget_bytes // (rows * BYTES_PER_CELL)))
+
+        out_count = np.zeros(rows, dtype=np.int64)
+        for done in range(0, draws, batch):
+            size = (min(batch, draws - done), rows)
+            true_size = measured[block] - deviation[block]
+            true_size = true_size - _draw_noise(
+                rng, size, deviation_uncertainty, distribution
+            )
+            if repeatability:
+                true_size -= _draw_noise(rng, size, repeatability, distribution)
+            out_count += ((true_size < lower[block]) | (true_size > upper[block])).sum(
+                axis=0
+            )
+        probabilities[block] = out_count / draws
+
+    return probabilities
+
+
+def probability_of_nonconformance(
+    measured,
+    expanded_lower,
+    expanded_upper,
+    deviation,
+    deviation_uncertainty,
+    repeatability=0.0,
+    draws=DEFAULT_DRAWS,
+    seed=0,
+    memory_budget_bytes=DEFAULT_MEMORY_BUDGET_BYTES,
+    workers=None,
+    distribution="normal",
+):
+    """Estimates the probability that each part is outside its expanded limits.
+
+    The true size of a part is ``measured - deviation - e_dev - e_rep``, where
+    ``e_dev`` is drawn from the deviation's uncertainty and ``e_rep`` from the
+    gauge repeatability.
+
+    Args:
+        measured: Array of measured values
+        expanded_lower: Array of expanded lower limits from Block 7
+        expanded_upper: Array of expanded upper limits from Block 7
+        deviation: The tool deviation, a scalar or one value per measurement
+        deviation_uncertainty: Standard uncertainty (1 sigma) of the deviation
+        repeatability: Standard deviation of the gauge repeatability, or 0
+        draws: Number of Monte Carlo draws per measurement
+        seed: Seed for reproducible results
+        memory_budget_bytes: Working memory shared by all workers
+        workers: Number of worker processes (default: CPU count)
+        distribution: "normal" or "uniform" (rectangular) uncertainty
+
+    Returns:
+        ndarray: Probability of nonconformance for each measurement
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution '{distribution}'.")
+    measured = np.asarray(measured, dtype=np.float64)
+    lower = np.asarray(expanded_lower, dtype=np.float64)
+    upper = np.asarray(expanded_upper, dtype=np.float64)
+    deviation = np.broadcast_to(np.asarray(deviation, dtype=np.float64), measured.shape)
+
+    block_count = -(-measured.size // SEED_BLOCK_ROWS)
+    workers = max(1, min(workers or os.cpu_count() or 1, block_count))
+    budget_bytes = memory_budget_bytes // workers
+    blocks_per_task = -(-block_count // workers)
+
+    tasks = []
+    for first_block in range(0, block_count, blocks_per_task):
+        rows = slice(
+            first_block * SEED_BLOCK_ROWS,
+            (first_block + blocks_per_task) * SEED_BLOCK_ROWS,
+        )
+        tasks.append(
+            (
+                first_block,
+                measured[rows],
+                lower[rows],
+                upper[rows],
+                deviation[rows],
+                deviation_uncertainty,
+                repeatability,
+                draws,
+                seed,
+                budget_bytes,
+                distribution,
+            )
+        )
+
+    if len(tasks) <= 1:
+        results = [_simulate_blocks(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_simulate_blocks, tasks))
+    if not results:
+        return np.empty(0, dtype=np.float64)
+    return np.concatenate(results)
+
+
+def simulate_nonconformance(df, deviation, deviation_uncertainty, **kwargs):
+    """Adds a ``prob_nonconformance`` column to an evaluated pandas DataFrame.
+
+    Args:
+        df: pandas DataFrame already evaluated by the Block 7 engine
+        deviation: The tool deviation, a scalar or a per-row deviation such
+            as an ``ErrorCurve``
+        deviation_uncertainty: Standard uncertainty (1 sigma) of the deviation
+        **kwargs: Passed through to ``probability_of_nonconformance``
+
+    Returns:
+        DataFrame: A copy of ``df`` with the probability column added
+    """
+    result = df.copy()
+    result["prob_nonconformance"] = probability_of_nonconformance(
+        result["measured_value"],
+        result["expanded_lower_tol"],
+        result["expanded_upper_tol"],
+        row_deviation(deviation, result),
+        deviation_uncertainty,
+        **kwargs,
+    )
+    return result
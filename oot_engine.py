@@ -0,0 +1,538 @@
+"""CalibrationIQ: Block 7 evaluation engines.
+
+The notebook applies the tool deviation with PySpark when a SparkSession is
+available and falls back to the NumPy engine for local runs. Both engines
+implement the same business rules so their results are interchangeable.
+"""
+
+from decimal import ROUND_HALF_EVEN, Decimal
+
+import numpy as np
+import pandas as pd
+
+from allowance_rules import AllowanceRules
+
+# --- Business Rules ---
+# Key characteristics (KC) get no tolerance allowance; every other feature
+# gets its tolerance band expanded by 20% on each side. Programs with other
+# allowance tables pass their own ``AllowanceRules`` to the engines.
+NO_ALLOWANCE_CRITICALITIES = ["Critical", "Major"]
+ALLOWANCE_FRACTION = 0.20
+DEFAULT_ALLOWANCE_RULES = AllowanceRules(
+    [
+        {"criticality": NO_ALLOWANCE_CRITICALITIES, "allowance": 0},
+        {"allowance": ALLOWANCE_FRACTION},
+    ]
+)
+
+# Bump when the evaluation rules change, so memoized results are not reused.
+RULES_VERSION = 4
+
+# --- Compact Result Columns ---
+# The engines store the allowance decision as a boolean and the final status
+# as an int8 code; the labels below are only rendered for reports.
+STATUS_PASS = 0
+STATUS_FAIL = 1
+PASS_LABEL = "✅ PASS"
+FAIL_LABEL = "❌ FAIL"
+STATUS_LABELS = [PASS_LABEL, FAIL_LABEL]
+ELIGIBLE_LABEL = "YES"
+NOT_ELIGIBLE_LABEL = "NO - KC"
+
+# Low-cardinality text columns that the NumPy engine holds as dictionary-
+# encoded pandas categoricals.
+CATEGORY_COLUMNS = [
+    "job_number",
+    "dimension_id",
+    "feature_name",
+    "tolerance_type",
+    "criticality",
+    "tool_id",
+]
+
+# --- Fixed-Point Evaluation ---
+# In fixed-point mode every value is scaled to an int64 count of this
+# resolution, so the adjustment, allowance and limit checks are exact.
+DEFAULT_RESOLUTION = "0.0000001"
+FIXED_POINT_COLUMNS = [
+    "measured_value",
+    "nominal_value",
+    "original_upper_tol",
+    "original_lower_tol",
+]
+
+
+class ErrorCurve:
+    """Size-dependent tool error from a multi-point calibration certificate.
+
+    Certificates list the as-found error at several check points. Between
+    check points the error is linearly interpolated; beyond the first and
+    last check point it is held at the end values.
+    """
+
+    def __init__(self, nominals, errors):
+        nominals = np.asarray(nominals, dtype=np.float64)
+        errors = np.asarray(errors, dtype=np.float64)
+        if nominals.size == 0 or nominals.shape != errors.shape:
+            raise ValueError("Error curve needs one error per check point.")
+        order = np.argsort(nominals)
+        self.nominals = nominals[order]
+        self.errors = errors[order]
+        if np.any(np.diff(self.nominals) == 0):
+            raise ValueError("Error curve check points must be unique.")
+
+    def at(self, sizes):
+        """Returns the interpolated deviation for an array of sizes."""
+        return np.interp(
+            np.asarray(sizes, dtype=np.float64), self.nominals, self.errors
+        )
+
+    def bounds(self, low, high):
+        """Returns the (min, max) deviation anywhere in ``[low, high]``."""
+        inside = self.errors[(self.nominals > low) & (self.nominals < high)]
+        values = np.concatenate([self.at([low, high]), inside])
+        return float(values.min()), float(values.max())
+
+    def row_values(self, df):
+        """Returns the deviation for each row of a pandas DataFrame."""
+        return self.at(df["measured_value"])
+
+    def row_column(self):
+        """Returns the deviation for each row as a Spark Column."""
+        from pyspark.sql.functions import col
+
+        return self.spark_column(col("measured_value"))
+
+    def spark_column(self, size):
+        """Builds the interpolation as one Spark CASE expression.
+
+        Args:
+            size: Spark Column holding the measured size of each row
+
+        Returns:
+            Column: The interpolated deviation for each row
+        """
+        from pyspark.sql.functions import lit, when
+
+        x = [float(value) for value in self.nominals]
+        y = [float(value) for value in self.errors]
+        expr = when(size <= x[0], lit(y[0]))
+        for i in range(len(x) - 1):
+            slope = (y[i + 1] - y[i]) / (x[i + 1] - x[i])
+            expr = expr.when(size <= x[i + 1], lit(y[i]) + (size - x[i]) * slope)
+        return expr.otherwise(lit(y[-1]))
+
+
+def row_deviation(deviation, df):
+    """Returns the deviation to remove from each row of a pandas DataFrame.
+
+    Scalars apply to every row. Per-row deviations (``ErrorCurve`` and the
+    drift model's ``DriftingDeviation``) provide ``row_values``.
+    """
+    if hasattr(deviation, "row_values"):
+        return np.asarray(deviation.row_values(df), dtype=np.float64)
+    return deviation
+
+
+def row_deviation_column(deviation):
+    """Returns the deviation to remove from each row as a Spark Column."""
+    from pyspark.sql.functions import lit
+
+    if hasattr(deviation, "row_column"):
+        return deviation.row_column()
+    return lit(deviation)
+
+
+def rule_config_version(rules=None):
+    """Returns a version string identifying the evaluation rules.
+
+    Args:
+        rules: The ``AllowanceRules`` in use, defaulting to the KC rule
+    """
+    rules = rules or DEFAULT_ALLOWANCE_RULES
+    return f"{RULES_VERSION}:{rules.version()}"
+
+
+def encode_categories(df, columns=CATEGORY_COLUMNS):
+    """Dictionary-encodes repeated text columns of a pandas DataFrame.
+
+    Args:
+        df: pandas DataFrame of measurements
+        columns: Columns to encode; missing or already encoded ones are skipped
+
+    Returns:
+        DataFrame: A shallow copy of ``df`` with the columns as categoricals,
+        or ``df`` itself when there is nothing to encode
+    """
+    pending = [
+        name
+        for name in columns
+        if name in df and not isinstance(df[name].dtype, pd.CategoricalDtype)
+    ]
+    if not pending:
+        return df
+    result = df.copy(deep=False)
+    for name in pending:
+        result[name] = result[name].astype("category")
+    return result
+
+
+def memory_footprint(df):
+    """Returns the bytes held by a pandas DataFrame, including its strings."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def render_labels(df):
+    """Renders the compact Block 7 result columns as report labels.
+
+    Args:
+        df: pandas or Spark DataFrame evaluated by one of the engines
+
+    Returns:
+        DataFrame: ``df`` with ``allowance_eligible`` as "YES"/"NO - KC" and
+        ``final_status`` as the pass/fail labels
+    """
+    if hasattr(df, "rdd"):
+        from pyspark.sql.functions import col, lit, when
+
+        return df.withColumn(
+            "allowance_eligible",
+            when(col("allowance_eligible"), lit(ELIGIBLE_LABEL)).otherwise(
+                lit(NOT_ELIGIBLE_LABEL)
+            ),
+        ).withColumn(
+            "final_status",
+            when(col("final_status") == STATUS_FAIL, lit(FAIL_LABEL)).otherwise(
+                lit(PASS_LABEL)
+            ),
+        )
+
+    result = df.copy(deep=False)
+    result["allowance_eligible"] = np.where(
+        result["allowance_eligible"], ELIGIBLE_LABEL, NOT_ELIGIBLE_LABEL
+    ).astype(object)
+    result["final_status"] = np.asarray(STATUS_LABELS, dtype=object)[
+        result["final_status"].to_numpy()
+    ]
+    return result
+
+
+def status_codes(adjusted, expanded_lower, expanded_upper):
+    """Returns the int8 final status of each adjusted value."""
+    inside = (adjusted >= expanded_lower) & (adjusted <= expanded_upper)
+    return np.where(inside, STATUS_PASS, STATUS_FAIL).astype(np.int8)
+
+
+def expand_limits(nominal, upper, lower, allowance):
+    """Applies the tolerance allowances to arrays of limits.
+
+    Args:
+        nominal: Nominal values for each measurement
+        upper: Original upper tolerance limits
+        lower: Original lower tolerance limits
+        allowance: Allowance fraction of each measurement, from
+            ``AllowanceRules.fractions``
+
+    Returns:
+        tuple: (allowance_eligible mask, expanded_upper, expanded_lower)
+    """
+    nominal = np.asarray(nominal, dtype=np.float64)
+    upper = np.asarray(upper, dtype=np.float64)
+    lower = np.asarray(lower, dtype=np.float64)
+    eligible = allowance > 0
+
+    expanded_upper = np.where(eligible, upper + ((upper - nominal) * allowance), upper)
+    expanded_lower = np.where(eligible, lower - ((nominal - lower) * allowance), lower)
+    return eligible, expanded_upper, expanded_lower
+
+
+def fixed_point_scale(resolution=DEFAULT_RESOLUTION):
+    """Returns the integer number of resolution steps per unit.
+
+    Args:
+        resolution: The fixed-point resolution, e.g. "0.0000001" for 1e-7 in
+
+    Returns:
+        int: The scale factor (1 / resolution)
+    """
+    scale = Decimal(1) / Decimal(str(resolution))
+    if scale != scale.to_integral_value() or scale < 1:
+        raise ValueError(f"Resolution {resolution} must divide one unit evenly.")
+    return int(scale)
+
+
+def to_fixed_point(values, resolution=DEFAULT_RESOLUTION):
+    """Scales an array of values to int64 counts of ``resolution``.
+
+    Values are rounded to the nearest resolution step, which is exact for any
+    value recorded with no more decimal places than the resolution.
+
+    Args:
+        values: Array-like of values in measurement units
+        resolution: The fixed-point resolution
+
+    Returns:
+        ndarray: int64 array of resolution steps
+    """
+    scaled = np.rint(
+        np.asarray(values, dtype=np.float64) * fixed_point_scale(resolution)
+    )
+    if scaled.size and np.abs(scaled).max() > 2**53:
+        raise ValueError("Values are too large for the fixed-point resolution.")
+    return scaled.astype(np.int64)
+
+
+def spark_fixed_point(column, scale):
+    """Scales a Spark Column to LongType counts of ``1 / scale``.
+
+    Ties round half to even (``bround``), like ``np.rint`` in
+    ``to_fixed_point``, so both engines give the same steps.
+    """
+    from pyspark.sql.functions import bround
+
+    return bround(column * scale).cast("long")
+
+
+def _allowance_steps(span, numerators, denominators):
+    """Returns the allowance in resolution steps, truncated toward zero.
+
+    Truncation matches Spark's integral ``div`` and never moves an expanded
+    limit further out than the exact allowance would.
+    """
+    product = span * numerators
+    return np.sign(product) * (np.abs(product) // denominators)
+
+
+def _fixed_point_scalar(value, scale):
+    """Scales one value to resolution steps through Decimal."""
+    steps = Decimal(str(value)) * scale
+    return int(steps.to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def evaluate_fixed_point(df, deviation, resolution=DEFAULT_RESOLUTION, rules=None):
+    """Evaluates a pandas DataFrame in fixed-point integer arithmetic.
+
+    Measurements, limits and the deviation are scaled to int64 at ingest.
+    The allowance expansion is rounded toward the original limit, so a band
+    is never widened by rounding, and the limit checks compare integers.
+    Boundary decisions are therefore exact and reproducible.
+
+    Args:
+        df: pandas DataFrame with the historical measurement schema
+        deviation: The tool deviation (measured - nominal) to remove, either
+            a scalar or a per-row deviation such as an ``ErrorCurve``
+        resolution: The fixed-point resolution, e.g. "0.0000001" for 1e-7 in
+        rules: The ``AllowanceRules``, defaulting to the KC rule
+
+    Returns:
+        DataFrame: A copy of ``df`` with the Block 7 columns added
+    """
+    rules = rules or DEFAULT_ALLOWANCE_RULES
+    scale = fixed_point_scale(resolution)
+    # A shallow copy keeps memory-mapped input columns shared, not copied.
+    result = df.copy(deep=False)
+    measured, nominal, upper, lower = (
+        to_fixed_point(result[name], resolution) for name in FIXED_POINT_COLUMNS
+    )
+    if hasattr(deviation, "row_values"):
+        deviation = to_fixed_point(row_deviation(deviation, result), resolution)
+    else:
+        deviation = _fixed_point_scalar(deviation, scale)
+
+    numerators, denominators = rules.exact_fractions(result)
+    eligible = numerators > 0
+    expanded_upper = np.where(
+        eligible,
+        upper + _allowance_steps(upper - nominal, numerators, denominators),
+        upper,
+    )
+    expanded_lower = np.where(
+        eligible,
+        lower - _allowance_steps(nominal - lower, numerators, denominators),
+        lower,
+    )
+    adjusted = measured - deviation
+
+    result["adjusted_value"] = adjusted / scale
+    result["allowance_eligible"] = eligible
+    result["expanded_upper_tol"] = expanded_upper / scale
+    result["expanded_lower_tol"] = expanded_lower / scale
+    result["final_status"] = status_codes(adjusted, expanded_lower, expanded_upper)
+    return result
+
+
+def evaluate_numpy(df, deviation, rules=None):
+    """Evaluates a pandas DataFrame of measurements with the NumPy engine.
+
+    Args:
+        df: pandas DataFrame with the historical measurement schema
+        deviation: The tool deviation (measured - nominal) to remove, either
+            a scalar or a per-row deviation such as an ``ErrorCurve``
+        rules: The ``AllowanceRules``, defaulting to the KC rule
+
+    Returns:
+        DataFrame: A copy of ``df`` with the Block 7 columns added
+    """
+    rules = rules or DEFAULT_ALLOWANCE_RULES
+    # A shallow copy keeps memory-mapped input columns shared, not copied.
+    result = df.copy(deep=False)
+    measured = result["measured_value"].to_numpy(dtype=np.float64)
+    deviation = row_deviation(deviation, result)
+    eligible, expanded_upper, expanded_lower = expand_limits(
+        result["nominal_value"],
+        result["original_upper_tol"],
+        result["original_lower_tol"],
+        rules.fractions(result),
+    )
+    adjusted = measured - deviation
+
+    result["adjusted_value"] = adjusted
+    result["allowance_eligible"] = eligible
+    result["expanded_upper_tol"] = expanded_upper
+    result["expanded_lower_tol"] = expanded_lower
+    result["final_status"] = status_codes(adjusted, expanded_lower, expanded_upper)
+    return result
+
+
+def evaluate_spark(df, deviation, rules=None):
+    """Evaluates a Spark DataFrame of measurements with the Spark engine.
+
+    Args:
+        df: Spark DataFrame with the historical measurement schema
+        deviation: The tool deviation (measured - nominal) to remove, either
+            a scalar or a per-row deviation such as an ``ErrorCurve``
+        rules: The ``AllowanceRules``, defaulting to the KC rule
+
+    Returns:
+        DataFrame: ``df`` with the Block 7 columns added
+    """
+    from pyspark.sql.functions import col, lit, when
+
+    rules = rules or DEFAULT_ALLOWANCE_RULES
+    deviation = row_deviation_column(deviation)
+
+    df = df.withColumn("adjusted_value", col("measured_value") - deviation)
+
+    df = df.withColumn("_allowance", rules.spark_fractions(df))
+    df = df.withColumn("allowance_eligible", col("_allowance") > 0)
+
+    df = df.withColumn(
+        "expanded_upper_tol",
+        when(
+            col("allowance_eligible"),
+            col("original_upper_tol")
+            + ((col("original_upper_tol") - col("nominal_value")) * col("_allowance")),
+        ).otherwise(col("original_upper_tol")),
+    )
+
+    df = df.withColumn(
+        "expanded_lower_tol",
+        when(
+            col("allowance_eligible"),
+            col("original_lower_tol")
+            - ((col("nominal_value") - col("original_lower_tol")) * col("_allowance")),
+        ).otherwise(col("original_lower_tol")),
+    )
+
+    df = df.withColumn(
+        "final_status",
+        when(
+            (col("adjusted_value") >= col("expanded_lower_tol"))
+            & (col("adjusted_value") <= col("expanded_upper_tol")),
+            lit(STATUS_PASS),
+        )
+        .otherwise(lit(STATUS_FAIL))
+        .cast("tinyint"),
+    )
+    return df.drop("_allowance")
+
+
+def evaluate_fixed_point_spark(
+    df, deviation, resolution=DEFAULT_RESOLUTION, rules=None
+):
+    """Evaluates a Spark DataFrame in fixed-point integer arithmetic.
+
+    Mirrors ``evaluate_fixed_point``: values become LongType resolution
+    steps, the allowance is truncated toward the original limit and the limit
+    checks compare longs.
+
+    Args:
+        df: Spark DataFrame with the historical measurement schema
+        deviation: The tool deviation (measured - nominal) to remove, either
+            a scalar or a per-row deviation such as an ``ErrorCurve``
+        resolution: The fixed-point resolution, e.g. "0.0000001" for 1e-7 in
+        rules: The ``AllowanceRules``, defaulting to the KC rule
+
+    Returns:
+        DataFrame: ``df`` with the Block 7 columns added
+    """
+    from pyspark.sql.functions import col, expr, lit, when
+
+    rules = rules or DEFAULT_ALLOWANCE_RULES
+    scale = fixed_point_scale(resolution)
+
+    def steps(column):
+        return spark_fixed_point(column, scale)
+
+    if hasattr(deviation, "row_column"):
+        deviation = steps(deviation.row_column())
+    else:
+        deviation = lit(_fixed_point_scalar(deviation, scale)).cast("long")
+
+    for name in FIXED_POINT_COLUMNS:
+        df = df.withColumn(f"_{name}_fp", steps(col(name)))
+
+    # The first-match CASE runs once; both lookups read its allowance id.
+    df = df.withColumn("_allowance_id", rules.spark_allowance_ids(df))
+    numerator, denominator = rules.spark_exact_fractions(col("_allowance_id"))
+    df = df.withColumn("_allowance_num", numerator).withColumn(
+        "_allowance_den", denominator
+    )
+    df = df.withColumn("allowance_eligible", col("_allowance_num") > 0)
+    df = df.withColumn("_adjusted_fp", col("_measured_value_fp") - deviation)
+    df = df.withColumn(
+        "_expanded_upper_fp",
+        when(
+            col("allowance_eligible"),
+            col("_original_upper_tol_fp")
+            + expr(
+                "((_original_upper_tol_fp - _nominal_value_fp) "
+                "* _allowance_num) div _allowance_den"
+            ),
+        ).otherwise(col("_original_upper_tol_fp")),
+    )
+    df = df.withColumn(
+        "_expanded_lower_fp",
+        when(
+            col("allowance_eligible"),
+            col("_original_lower_tol_fp")
+            - expr(
+                "((_nominal_value_fp - _original_lower_tol_fp) "
+                "* _allowance_num) div _allowance_den"
+            ),
+        ).otherwise(col("_original_lower_tol_fp")),
+    )
+    df = df.withColumn(
+        "final_status",
+        when(
+            (col("_adjusted_fp") >= col("_expanded_lower_fp"))
+            & (col("_adjusted_fp") <= col("_expanded_upper_fp")),
+            lit(STATUS_PASS),
+        )
+        .otherwise(lit(STATUS_FAIL))
+        .cast("tinyint"),
+    )
+    df = (
+        df.withColumn("adjusted_value", col("_adjusted_fp") / scale)
+        .withColumn("expanded_upper_tol", col("_expanded_upper_fp") / scale)
+        .withColumn("expanded_lower_tol", col("_expanded_lower_fp") / scale)
+    )
+    return df.drop(
+        *[f"_{name}_fp" for name in FIXED_POINT_COLUMNS],
+        "_allowance_id",
+        "_allowance_num",
+        "_allowance_den",
+        "_adjusted_fp",
+        "_expanded_upper_fp",
+        "_expanded_lower_fp",
+    )
@@ -0,0 +1,190 @@
+"""CalibrationIQ: Part-level disposition rollup.
+
+Block 8 lists failing characteristics; non-conformance (NC) creation needs the
+per-part answer. The rollup groups the evaluated measurements by job and
+serial number in a single aggregation and reports, per part, the number of
+failing dimensions, how many of them are key characteristics (KC, by
+criticality), the highest failing criticality and the characteristic with
+the worst exceedance.
+
+Block 7 only evaluates the zones that can fail, but every failing reading is
+in those zones, and a failing part's worst characteristic is always one of
+its failures. The NC rollup is therefore built from the failures alone; only
+the number of readings per part comes from the unpruned window (or the
+ticket's stored readings), counted without evaluating it again.
+
+All per-row inputs are derived from the Block 7 columns. In Spark every
+aggregate is a partial (map-side) aggregate, so only one small record per
+part is shuffled.
+"""
+
+import numpy as np
+import pandas as pd
+
+from oot_engine import NO_ALLOWANCE_CRITICALITIES, STATUS_FAIL
+
+PART_KEY_COLUMNS = ["job_number", "sample_serial_number"]
+
+# Key characteristics are identified by criticality, not by whether a
+# program's allowance rules happened to give them an allowance.
+KC_CRITICALITIES = NO_ALLOWANCE_CRITICALITIES
+
+# Lowest to highest; a part's highest failing criticality is the largest rank.
+CRITICALITY_ORDER = ["NotSpecified", "Minor", "Major", "Critical"]
+
+ROLLUP_COLUMNS = PART_KEY_COLUMNS + [
+    "evaluated_dimensions",
+    "failing_dimensions",
+    "kc_failing_dimensions",
+    "highest_failing_criticality",
+    "worst_dimension",
+    "worst_exceedance",
+]
+
+
+def _criticality_rank(criticality):
+    """Returns the rank of each criticality label, -1 when unknown."""
+    ranks = pd.Series(criticality).map(
+        {label: rank for rank, label in enumerate(CRITICALITY_ORDER)}
+    )
+    return ranks.astype(np.float64).fillna(-1).to_numpy(dtype=np.int64)
+
+
+def _rollup_pandas(df):
+    adjusted = df["adjusted_value"].to_numpy(dtype=np.float64)
+    failing = df["final_status"].to_numpy() == STATUS_FAIL
+    kc = pd.Series(df["criticality"]).isin(KC_CRITICALITIES).to_numpy()
+
+    # Positional arrays give the frame a RangeIndex, so ``idxmax`` returns
+    # row positions into ``df``.
+    frame = pd.DataFrame(
+        {
+            "exceedance": np.maximum(
+                adjusted - df["expanded_upper_tol"].to_numpy(dtype=np.float64),
+                df["expanded_lower_tol"].to_numpy(dtype=np.float64) - adjusted,
+            ),
+            "failing": failing.astype(np.int64),
+            "kc_failing": (failing & kc).astype(np.int64),
+            "failing_rank": np.where(failing, _criticality_rank(df["criticality"]), -1),
+        }
+    )
+    for name in PART_KEY_COLUMNS:
+        frame[name] = df[name].array
+
+    parts = frame.groupby(PART_KEY_COLUMNS, sort=False, observed=True).agg(
+        evaluated_dimensions=("exceedance", "size"),
+        failing_dimensions=("failing", "sum"),
+        kc_failing_dimensions=("kc_failing", "sum"),
+        failing_rank=("failing_rank", "max"),
+        worst_row=("exceedance", "idxmax"),
+        worst_exceedance=("exceedance", "max"),
+    )
+    parts = parts.reset_index()
+
+    # Rank -1 (no failing or unknown criticality) picks up the trailing None.
+    labels = np.asarray(CRITICALITY_ORDER + [None], dtype=object)
+    parts["highest_failing_criticality"] = labels[parts["failing_rank"].to_numpy()]
+    parts["worst_dimension"] = df["dimension_id"].to_numpy()[
+        parts["worst_row"].to_numpy()
+    ]
+    return parts[ROLLUP_COLUMNS]
+
+
+def _rollup_spark(df):
+    from pyspark.sql import functions as F
+
+    failing = F.col("final_status") == STATUS_FAIL
+    rank = F.lit(-1)
+    for position, label in enumerate(CRITICALITY_ORDER):
+        rank = F.when(F.col("criticality") == label, F.lit(position)).otherwise(rank)
+    exceedance = F.greatest(
+        F.col("adjusted_value") - F.col("expanded_upper_tol"),
+        F.col("expanded_lower_tol") - F.col("adjusted_value"),
+    )
+
+    parts = df.groupBy(*PART_KEY_COLUMNS).agg(
+        F.count(F.lit(1)).alias("evaluated_dimensions"),
+        F.sum(failing.cast("int")).alias("failing_dimensions"),
+        F.sum(
+            (failing & F.col("criticality").isin(KC_CRITICALITIES)).cast("int")
+        ).alias("kc_failing_dimensions"),
+        F.max(F.when(failing, rank).otherwise(F.lit(-1))).alias("failing_rank"),
+        F.max(F.struct(exceedance.alias("exceedance"), F.col("dimension_id"))).alias(
+            "worst"
+        ),
+    )
+
+    labels = F.array(*[F.lit(label) for label in CRITICALITY_ORDER])
+    return parts.select(
+        *PART_KEY_COLUMNS,
+        "evaluated_dimensions",
+        "failing_dimensions",
+        "kc_failing_dimensions",
+        F.when(F.col("failing_rank") >= 0, labels[F.col("failing_rank")]).alias(
+            "highest_failing_criticality"
+        ),
+        F.col("worst.dimension_id").alias("worst_dimension"),
+        F.col("worst.exceedance").alias("worst_exceedance"),
+    )
+
+
+def part_reading_counts(df):
+    """Counts the readings of each part.
+
+    Args:
+        df: pandas or Spark DataFrame of measurements with the
+            ``PART_KEY_COLUMNS``, e.g. the unpruned window or a ticket's
+            stored readings
+
+    Returns:
+        DataFrame: One row per (job, serial) with ``evaluated_dimensions``
+    """
+    if hasattr(df, "rdd"):
+        from pyspark.sql import functions as F
+
+        return df.groupBy(*PART_KEY_COLUMNS).agg(
+            F.count(F.lit(1)).alias("evaluated_dimensions")
+        )
+    counts = df.groupby(PART_KEY_COLUMNS, sort=False, observed=True).size()
+    return counts.rename("evaluated_dimensions").reset_index()
+
+
+def _with_reading_counts(parts, reading_counts):
+    if hasattr(parts, "rdd"):
+        return (
+            parts.drop("evaluated_dimensions")
+            .join(reading_counts, PART_KEY_COLUMNS, "left")
+            .select(*ROLLUP_COLUMNS)
+        )
+    text_keys = {name: str for name in PART_KEY_COLUMNS}
+    parts = parts.astype(text_keys)
+    counts = reading_counts.astype(text_keys).set_index(PART_KEY_COLUMNS)
+    parts["evaluated_dimensions"] = (
+        counts["evaluated_dimensions"]
+        .reindex(pd.MultiIndex.from_frame(parts[PART_KEY_COLUMNS]), fill_value=0)
+        .to_numpy()
+    )
+    return parts
+
+
+def rollup_parts(df, reading_counts=None):
+    """Rolls evaluated measurements up to one disposition record per part.
+
+    ``worst_exceedance`` is the distance of the worst characteristic beyond
+    its expanded limit; a negative value is the margin left on a part where
+    every characteristic passes.
+
+    Args:
+        df: pandas or Spark DataFrame evaluated by one of the Block 7
+            engines, e.g. just the failures
+        reading_counts: DataFrame of the same kind from
+            ``part_reading_counts``; when given, ``evaluated_dimensions`` is
+            taken from it rather than counted in ``df``
+
+    Returns:
+        DataFrame: One row per (job, serial) with the ``ROLLUP_COLUMNS``
+    """
+    parts = _rollup_spark(df) if hasattr(df, "rdd") else _rollup_pandas(df)
+    if reading_counts is None:
+        return parts
+    return _with_reading_counts(parts, reading_counts)
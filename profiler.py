@@ -0,0 +1,230 @@
+"""CalibrationIQ: Opt-in profiling of a pipeline run.
+
+When a ticket is unexpectedly slow, the run can be wrapped in a profiler to
+see where the Python side spends its time (extraction parsing, pandas
+conversion, report rendering, driver-side collection). The default sampling
+profiler reads the main thread's stack from a background thread at a fixed
+interval, so the run itself is not instrumented; cProfile is the fallback
+where stack sampling is unavailable. Each run writes a collapsed-stack file
+(one ``frame;frame;frame count`` line per stack, the input format of
+flamegraph tools) and a top-N hotspot table. Nothing is started when
+profiling is disabled.
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+
+import pandas as pd
+
+DEFAULT_INTERVAL = 0.005
+DEFAULT_TOP_N = 25
+COLLAPSED_SUFFIX = ".collapsed"
+HOTSPOTS_SUFFIX = "-hotspots.txt"
+HOTSPOT_COLUMNS = ["function", "self_samples", "total_samples", "self_pct", "total_pct"]
+
+
+def _frame_label(code):
+    """Labels a frame by function, file and first line, as flame graphs do."""
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+def _hotspot_table(self_counts, total_counts, samples, top_n):
+    rows = [
+        (
+            label,
+            self_counts.get(label, 0),
+            total,
+            100.0 * self_counts.get(label, 0) / samples,
+            100.0 * total / samples,
+        )
+        for label, total in total_counts.items()
+    ]
+    table = pd.DataFrame(rows, columns=HOTSPOT_COLUMNS)
+    table = table.sort_values(["self_samples", "total_samples"], ascending=False)
+    return table.head(top_n).reset_index(drop=True)
+
+
+class SamplingProfiler:
+    """Samples one thread's call stack at a fixed interval.
+
+    Args:
+        interval: Seconds between samples
+        thread_id: Thread to sample, defaulting to the thread calling start
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts sampling in a daemon thread."""
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="calibrationiq-profiler", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops sampling and waits for the sampler thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    @property
+    def samples(self):
+        """Number of stacks sampled."""
+        return sum(self.stacks.values())
+
+    def collapsed(self):
+        """Returns the samples as collapsed-stack lines, root frame first."""
+        return [
+            f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common()
+        ]
+
+    def hotspots(self, top_n=DEFAULT_TOP_N):
+        """Returns the functions with the most samples.
+
+        Returns:
+            DataFrame: ``function``, ``self_samples`` (the function was
+            running), ``total_samples`` (it was on the stack) and both as a
+            percentage of all samples
+        """
+        self_counts, total_counts = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] += count
+            for label in set(stack):
+                total_counts[label] += count
+        return _hotspot_table(self_counts, total_counts, max(self.samples, 1), top_n)
+
+
+class CProfileProfiler:
+    """cProfile-based fallback with the same outputs as ``SamplingProfiler``.
+
+    cProfile records caller/callee pairs rather than whole stacks, so the
+    collapsed output has two frames per line and the counts are
+    microseconds of self time instead of samples.
+    """
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        """Starts deterministic profiling of the calling thread."""
+        self.profile.enable()
+        return self
+
+    def stop(self):
+        """Stops profiling."""
+        self.profile.disable()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _stats(self):
+        return pstats.Stats(self.profile).stats
+
+    @staticmethod
+    def _label(function):
+        filename, line, name = function
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    @property
+    def samples(self):
+        """Total self time in microseconds."""
+        return sum(
+            round(tottime * 1e6) for _, _, tottime, _, _ in self._stats().values()
+        )
+
+    def collapsed(self):
+        """Returns caller;callee lines weighted by microseconds of self time."""
+        lines = []
+        for function, (_, _, _, _, callers) in self._stats().items():
+            for caller, (_, _, tottime, _) in callers.items():
+                weight = round(tottime * 1e6)
+                if weight:
+                    lines.append(
+                        f"{self._label(caller)};{self._label(function)} {weight}"
+                    )
+        return lines
+
+    def hotspots(self, top_n=DEFAULT_TOP_N):
+        """Returns the functions with the most self time, in microseconds."""
+        self_counts, total_counts = Counter(), Counter()
+        for function, (_, _, tottime, cumtime, _) in self._stats().items():
+            self_counts[self._label(function)] = round(tottime * 1e6)
+            total_counts[self._label(function)] = round(cumtime * 1e6)
+        return _hotspot_table(self_counts, total_counts, max(self.samples, 1), top_n)
+
+
+def run_profiler(mode="sampling", interval=DEFAULT_INTERVAL):
+    """Creates a profiler for a pipeline run.
+
+    Args:
+        mode: "sampling", or "cprofile" for the deterministic fallback.
+            Sampling falls back to cProfile on interpreters without
+            ``sys._current_frames``
+        interval: Seconds between samples in sampling mode
+
+    Returns:
+        SamplingProfiler or CProfileProfiler: The (not yet started) profiler
+    """
+    if mode == "sampling" and hasattr(sys, "_current_frames"):
+        return SamplingProfiler(interval)
+    return CProfileProfiler()
+
+
+def write_profile(profiler, path_prefix, top_n=DEFAULT_TOP_N):
+    """Writes a stopped profiler's collapsed stacks and hotspot table.
+
+    Args:
+        profiler: ``SamplingProfiler`` or ``CProfileProfiler``
+        path_prefix: Output path without suffix, e.g. ``<dir>/<ticket>-<time>``
+        top_n: Number of hotspot rows
+
+    Returns:
+        tuple: (collapsed-stack path, hotspot table path)
+    """
+    directory = os.path.dirname(path_prefix)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    collapsed_path = path_prefix + COLLAPSED_SUFFIX
+    with open(collapsed_path, "w") as f:
+        f.write("\n".join(profiler.collapsed()) + "\n")
+    hotspots_path = path_prefix + HOTSPOTS_SUFFIX
+    with open(hotspots_path, "w") as f:
+        f.write(profiler.hotspots(top_n).to_string(index=False) + "\n")
+    return collapsed_path, hotspots_path
@@ -0,0 +1,222 @@
+"""CalibrationIQ: Memoized end-to-end ticket results.
+
+A ticket rerun with unchanged inputs returns the stored result instead of
+querying and evaluating the history again. Results are keyed by everything
+that decides them: the certificate PDF hash, the deviation, the tool, the
+date window, the rule configuration version and a snapshot id of the
+measurement data. Each entry holds the failure summary, the failing rows and
+the report artifacts; the least recently used entries are evicted once the
+cache exceeds its size budget.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+
+from ticket_state import analysis_signature
+
+DEFAULT_MAX_BYTES = 512 * 1024**2
+ENTRY_FILE = "entry.json"
+FAILURES_FILE = "failures.parquet"
+ARTIFACTS_DIR = "artifacts"
+
+
+def content_hash(data):
+    """Returns the SHA-256 hex digest of bytes (e.g. the certificate PDF)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def snapshot_id(path):
+    """Identifies the current contents of a data file or directory.
+
+    The id changes whenever a file under ``path`` is added, removed or
+    rewritten, which is how appends to the measurement store or a new
+    export invalidate cached results.
+
+    Args:
+        path: A file (e.g. a CSV export) or directory (e.g. a Parquet store)
+
+    Returns:
+        str: Hash of every file's relative path, size and modification time
+    """
+    if os.path.isfile(path):
+        files = [path]
+    else:
+        files = sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(path)
+            for name in names
+        )
+    listing = []
+    for name in files:
+        stat = os.stat(name)
+        listing.append([os.path.relpath(name, path), stat.st_size, stat.st_mtime_ns])
+    return analysis_signature(listing)
+
+
+def result_key(
+    pdf_hash, deviation, tool_id, window, rule_version, data_snapshot, **extra
+):
+    """Builds the cache key of a ticket's result.
+
+    Args:
+        pdf_hash: ``content_hash`` of the calibration certificate
+        deviation: JSON-serializable description of the tool deviation
+        tool_id: The OOT tool
+        window: (start, end) of the impact window
+        rule_version: Version of the evaluation rule configuration
+        data_snapshot: ``snapshot_id`` of the measurement data
+        **extra: Any further inputs that change the result
+
+    Returns:
+        str: The cache key
+    """
+    return analysis_signature(
+        {
+            "pdf_hash": pdf_hash,
+            "deviation": deviation,
+            "tool_id": tool_id,
+            "window": [str(value) for value in window],
+            "rule_version": rule_version,
+            "data_snapshot": data_snapshot,
+            **extra,
+        }
+    )
+
+
+def _directory_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+class ResultCache:
+    """Size-bounded directory of memoized ticket results.
+
+    Args:
+        cache_dir: Directory holding one subdirectory per entry
+        max_bytes: Total size the entries may occupy on disk
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _read_entry(self, key):
+        with open(os.path.join(self._entry_path(key), ENTRY_FILE)) as f:
+            return json.load(f)
+
+    def _write_entry(self, key, entry):
+        path = os.path.join(self._entry_path(key), ENTRY_FILE)
+        with open(path, "w") as f:
+            json.dump(entry, f, indent=2)
+
+    def keys(self):
+        """Returns the keys of the complete entries in the cache."""
+        return [
+            name
+            for name in os.listdir(self.cache_dir)
+            if not name.startswith(".")
+            and os.path.exists(os.path.join(self.cache_dir, name, ENTRY_FILE))
+        ]
+
+    def get(self, key):
+        """Returns a cached result, or None on a miss.
+
+        Returns:
+            dict: ``key``, ``created``, ``summary``, ``failures`` (pandas
+            DataFrame or None), ``artifacts`` (name -> text) and the
+            ``served_from_cache`` marker for the audit trail
+        """
+        if key not in self.keys():
+            return None
+        entry = self._read_entry(key)
+        entry["last_used"] = datetime.now().isoformat()
+        self._write_entry(key, entry)
+
+        path = self._entry_path(key)
+        failures = None
+        if os.path.exists(os.path.join(path, FAILURES_FILE)):
+            failures = pd.read_parquet(os.path.join(path, FAILURES_FILE))
+        artifacts = {}
+        for name in entry["artifacts"]:
+            with open(os.path.join(path, ARTIFACTS_DIR, name)) as f:
+                artifacts[name] = f.read()
+        return {
+            "key": key,
+            "created": entry["created"],
+            "summary": entry["summary"],
+            "failures": failures,
+            "artifacts": artifacts,
+            "served_from_cache": True,
+        }
+
+    def put(self, key, summary, failures=None, artifacts=None):
+        """Stores a ticket's result and evicts old entries over the budget.
+
+        The entry is written to a temporary directory and moved into place,
+        so readers never see a partial entry.
+
+        Args:
+            key: ``result_key`` of the ticket's inputs
+            summary: JSON-serializable failure summary
+            failures: pandas DataFrame of the failing rows, if any
+            artifacts: Mapping of report file name -> text
+        """
+        artifacts = artifacts or {}
+        staging = tempfile.mkdtemp(dir=self.cache_dir, prefix=".staging-")
+        os.makedirs(os.path.join(staging, ARTIFACTS_DIR))
+        if failures is not None:
+            failures.to_parquet(os.path.join(staging, FAILURES_FILE), index=False)
+        for name, text in artifacts.items():
+            with open(os.path.join(staging, ARTIFACTS_DIR, name), "w") as f:
+                f.write(text)
+        now = datetime.now().isoformat()
+        entry = {
+            "created": now,
+            "last_used": now,
+            "summary": summary,
+            "artifacts": sorted(artifacts),
+        }
+        with open(os.path.join(staging, ENTRY_FILE), "w") as f:
+            json.dump(entry, f, indent=2)
+
+        shutil.rmtree(self._entry_path(key), ignore_errors=True)
+        os.replace(staging, self._entry_path(key))
+        self.evict()
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits its budget.
+
+        Returns:
+            list: Keys of the evicted entries
+        """
+        entries = []
+        for key in self.keys():
+            entries.append(
+                (
+                    self._read_entry(key)["last_used"],
+                    key,
+                    _directory_size(self._entry_path(key)),
+                )
+            )
+        total = sum(size for _, _, size in entries)
+        evicted = []
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self._entry_path(key))
+            total -= size
+            evicted.append(key)
+        return evicted
@@ -0,0 +1,161 @@
+"""CalibrationIQ: Skew-aware joins of measurements to OOT tool tables.
+
+Fleet-wide OOT runs join the measurement history to a table of out-of-
+tolerance tools and their deviations on tool_id. Gauge usage is very uneven:
+a few shop-floor calipers hold most of the measurements, and a plain join
+sends each of them to a single task that runs long after the rest finish.
+
+The join plan is computed up front from per-tool row counts (the measurement
+store's Parquet footers or a grouped count). A tool is hot when its rows
+alone exceed an even task's share. Hot tools are salted into several join
+keys whose deviation rows are replicated once per salt. The other tools are
+joined on tool_id directly, which needs no shuffle when both tables are
+bucketed by tool_id (``measurement_store.write_bucketed_table``). The per-task
+row counts of the result show whether stragglers remain.
+"""
+
+import math
+import statistics
+import zlib
+
+from latest_readings import READING_KEY_COLUMNS
+from measurement_store import DATE_COLUMN, TOOL_COLUMN
+
+SALT_COLUMN = "_salt"
+# Upper bound on the join keys one hot tool is split into.
+DEFAULT_MAX_SPLITS = 64
+
+
+def plan_tool_join(tool_counts, num_tasks, max_splits=DEFAULT_MAX_SPLITS):
+    """Decides which tools to salt and into how many keys.
+
+    Args:
+        tool_counts: Mapping of tool_id -> number of measurements
+        num_tasks: Number of tasks the join runs in
+        max_splits: Upper bound on the keys of one tool
+
+    Returns:
+        dict: tool_id -> number of salt keys, for the hot tools only
+    """
+    total = sum(tool_counts.values())
+    if not total:
+        return {}
+    share = math.ceil(total / num_tasks)
+    return {
+        tool: min(max_splits, math.ceil(count / share))
+        for tool, count in sorted(tool_counts.items())
+        if count > share
+    }
+
+
+def estimate_task_rows(tool_counts, plan, num_tasks):
+    """Estimates the rows each task of the join receives.
+
+    Join keys are hashed to tasks (CRC-32 here, standing in for Spark's
+    hash) and a salted tool's rows are spread evenly over its keys.
+
+    Returns:
+        list: Rows per task
+    """
+    rows = [0] * num_tasks
+    for tool, count in tool_counts.items():
+        splits = plan.get(tool, 1)
+        for salt in range(splits):
+            task = zlib.crc32(f"{tool}:{salt}".encode()) % num_tasks
+            rows[task] += count // splits + (salt < count % splits)
+    return rows
+
+
+def skew_summary(task_rows):
+    """Summarizes per-task row counts.
+
+    Returns:
+        dict: ``tasks``, ``max_rows``, ``median_rows`` of the non-empty
+        tasks and ``skew``, the ratio of the two (1.0 is perfectly even)
+    """
+    busy = [rows for rows in task_rows if rows]
+    if not busy:
+        return {"tasks": len(task_rows), "max_rows": 0, "median_rows": 0, "skew": 1.0}
+    median = statistics.median(busy)
+    return {
+        "tasks": len(task_rows),
+        "max_rows": max(busy),
+        "median_rows": median,
+        "skew": max(busy) / median,
+    }
+
+
+def tool_counts_spark(df):
+    """Returns the measurements per tool of a Spark DataFrame.
+
+    Returns:
+        dict: tool_id -> row count
+    """
+    return {
+        row[0]: row[1]
+        for row in df.groupBy(TOOL_COLUMN).count().collect()
+        if row[0] is not None
+    }
+
+
+def join_tool_deviations(measurements, deviations, plan, num_tasks):
+    """Joins measurements to OOT tool deviations, salting the hot tools.
+
+    Args:
+        measurements: Spark DataFrame of measurements, ideally bucketed by
+            tool_id
+        deviations: Spark DataFrame with one or more rows per OOT tool,
+            bucketed the same way
+        plan: ``plan_tool_join`` result
+        num_tasks: Number of tasks of the salted join
+
+    Returns:
+        DataFrame: The inner join on tool_id
+    """
+    from pyspark.sql import functions as F
+
+    if not plan:
+        return measurements.join(deviations, TOOL_COLUMN)
+
+    hot = F.col(TOOL_COLUMN).isin(sorted(plan))
+    cold = measurements.filter(~hot).join(deviations.filter(~hot), TOOL_COLUMN)
+
+    pairs = []
+    for tool, splits in sorted(plan.items()):
+        pairs += [F.lit(tool), F.lit(splits)]
+    splits = F.create_map(*pairs)[F.col(TOOL_COLUMN)]
+    # The salt hashes each reading's key, so retried tasks salt identically.
+    salt_columns = [
+        name
+        for name in READING_KEY_COLUMNS + [DATE_COLUMN]
+        if name in measurements.columns
+    ] or measurements.columns
+    salted = measurements.filter(hot).withColumn(
+        SALT_COLUMN, F.pmod(F.xxhash64(*salt_columns), splits)
+    )
+    replicated = deviations.filter(hot).withColumn(
+        SALT_COLUMN, F.explode(F.sequence(F.lit(0), splits - 1))
+    )
+    hot_joined = (
+        salted.repartition(num_tasks, TOOL_COLUMN, SALT_COLUMN)
+        .join(
+            replicated.repartition(num_tasks, TOOL_COLUMN, SALT_COLUMN),
+            [TOOL_COLUMN, SALT_COLUMN],
+        )
+        .drop(SALT_COLUMN)
+    )
+    return cold.unionByName(hot_joined)
+
+
+def task_row_counts(df):
+    """Returns the rows held by each task (partition) of a Spark DataFrame.
+
+    Returns:
+        list: Rows per partition, in partition order
+    """
+    from pyspark.sql.functions import spark_partition_id
+
+    counts = {
+        row[0]: row[1] for row in df.groupBy(spark_partition_id()).count().collect()
+    }
+    return [counts.get(task, 0) for task in range(df.rdd.getNumPartitions())]
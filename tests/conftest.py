@@ -0,0 +1,57 @@
+"""Shared fixtures for the CalibrationIQ test suite."""
+
+import pandas as pd
+import pytest
+from oot_engine import evaluate_numpy
+
+# Columns a test history does not set: one critical 0.5 in hole diameter of
+# part SN-1, measured with tool BC1.
+MEASUREMENT_DEFAULTS = {
+    "tool_id": "BC1",
+    "job_number": "WO-1",
+    "sample_serial_number": "SN-1",
+    "dimension_id": "Char 1",
+    "feature_name": "Hole Diameter",
+    "measured_value": 0.5005,
+    "nominal_value": 0.5,
+    "original_upper_tol": 0.501,
+    "original_lower_tol": 0.499,
+    "tolerance_type": "BILATERAL",
+    "criticality": "Critical",
+    "measurement_date": "2023-03-01",
+}
+
+
+def build_history(**columns):
+    """Builds a measurement history from per-row lists or scalars.
+
+    Scalars are repeated on every row and missing columns take the
+    ``MEASUREMENT_DEFAULTS``; a history needs at least one per-row column.
+    """
+    rows = max(
+        len(values) for values in columns.values() if pd.api.types.is_list_like(values)
+    )
+    history = pd.DataFrame(index=range(rows))
+    for name, value in {**MEASUREMENT_DEFAULTS, **columns}.items():
+        history[name] = value
+    return history
+
+
+@pytest.fixture
+def make_history():
+    """Returns ``build_history``, the builder of measurement histories."""
+    return build_history
+
+
+@pytest.fixture
+def make_evaluated():
+    """Returns a builder of histories evaluated by the NumPy engine.
+
+    The builder takes the tool deviation and allowance rules, then the
+    history columns of ``build_history``.
+    """
+
+    def evaluate(deviation=0.0, rules=None, **columns):
+        return evaluate_numpy(build_history(**columns), deviation, rules)
+
+    return evaluate
@@ -0,0 +1,217 @@
+"""Unit tests for the compiled tolerance-allowance rules."""
+
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+import pytest
+from allowance_rules import RULE_KEY_COLUMNS, AllowanceRules
+from oot_engine import (
+    DEFAULT_ALLOWANCE_RULES,
+    evaluate_fixed_point,
+    evaluate_numpy,
+    rule_config_version,
+)
+
+
+def make_rows():
+    """Builds rows covering several criticalities and tolerance types."""
+    return pd.DataFrame(
+        {
+            "criticality": ["Critical", "Major", "Minor", "Minor", "NotSpecified"],
+            "feature_name": ["Bore", "Bore", "Slot Width", "Bore", "Bore"],
+            "tolerance_type": [
+                "BILATERAL",
+                "BILATERAL",
+                "UNILATERAL",
+                "BILATERAL",
+                "BILATERAL",
+            ],
+        }
+    )
+
+
+def naive_fractions(rules, df):
+    """Evaluates the rules row by row, first match wins."""
+    fractions = []
+    for _, row in df.iterrows():
+        allowance = 0.0
+        for rule in rules:
+            if all(
+                column not in rule
+                or (
+                    column in row
+                    and str(row[column])
+                    in (
+                        [rule[column]]
+                        if isinstance(rule[column], str)
+                        else rule[column]
+                    )
+                )
+                for column in RULE_KEY_COLUMNS
+            ):
+                allowance = float(Fraction(str(rule["allowance"])))
+                break
+        fractions.append(allowance)
+    return np.array(fractions)
+
+
+class TestAllowanceRules:
+    """Test suite for compiling and evaluating allowance rule sets."""
+
+    def test_default_rules_exclude_key_characteristics(self):
+        """Tests that the default rule set reproduces the KC rule."""
+        fractions = DEFAULT_ALLOWANCE_RULES.fractions(make_rows())
+        assert fractions.tolist() == [0.0, 0.0, 0.2, 0.2, 0.2]
+
+    def test_first_matching_rule_wins(self):
+        """Tests that earlier rules take precedence over later ones."""
+        rules = AllowanceRules(
+            [
+                {"criticality": "Critical", "allowance": 0},
+                {"tolerance_type": "UNILATERAL", "allowance": 0.1},
+                {"feature_name": "Bore", "allowance": 0.3},
+                {"allowance": 0.2},
+            ]
+        )
+        assert rules.fractions(make_rows()).tolist() == [0.0, 0.3, 0.1, 0.3, 0.3]
+
+    def test_unmatched_rows_get_no_allowance(self):
+        """Tests that rows no rule covers keep their original limits."""
+        rules = AllowanceRules([{"criticality": "Minor", "allowance": 0.25}])
+        assert rules.fractions(make_rows()).tolist() == [0.0, 0.0, 0.25, 0.25, 0.0]
+
+    def test_missing_column_only_matches_wildcards(self):
+        """Tests rules keyed on a column the data does not carry."""
+        rules = AllowanceRules(
+            [{"part_family": "Housings", "allowance": 0.5}, {"allowance": 0.2}]
+        )
+        assert rules.fractions(make_rows()).tolist() == [0.2] * 5
+
+        rows = make_rows().assign(part_family=["Housings"] + ["Shafts"] * 4)
+        assert rules.fractions(rows).tolist() == [0.5, 0.2, 0.2, 0.2, 0.2]
+
+    def test_categorical_columns_match_plain_columns(self):
+        """Tests that dictionary-encoded columns give the same fractions."""
+        rows = make_rows()
+        encoded = rows.astype("category")
+        encoded.loc[0, "criticality"] = np.nan
+        rows.loc[0, "criticality"] = np.nan
+        np.testing.assert_array_equal(
+            DEFAULT_ALLOWANCE_RULES.fractions(encoded),
+            DEFAULT_ALLOWANCE_RULES.fractions(rows),
+        )
+
+    def test_large_table_matches_row_by_row_evaluation(self):
+        """Tests a table of hundreds of overlapping rules against a naive loop."""
+        rng = np.random.default_rng(7)
+        criticalities = ["Critical", "Major", "Minor", "NotSpecified"]
+        features = [f"Feature {i}" for i in range(60)]
+        types = ["BILATERAL", "UNILATERAL", "LIMIT"]
+        rules = []
+        for _ in range(300):
+            rule = {"allowance": f"0.{rng.integers(0, 30):02d}"}
+            if rng.random() < 0.5:
+                rule["criticality"] = list(rng.choice(criticalities, 2, replace=False))
+            if rng.random() < 0.7:
+                rule["feature_name"] = str(rng.choice(features))
+            if rng.random() < 0.3:
+                rule["tolerance_type"] = str(rng.choice(types))
+            rules.append(rule)
+        rows = pd.DataFrame(
+            {
+                "criticality": rng.choice(criticalities, 500),
+                "feature_name": rng.choice(features + ["Unlisted"], 500),
+                "tolerance_type": rng.choice(types, 500),
+            }
+        )
+
+        compiled = AllowanceRules(rules)
+        np.testing.assert_array_equal(
+            compiled.fractions(rows), naive_fractions(rules, rows)
+        )
+
+    def test_compiled_form_is_linear_in_rules(self):
+        """Tests that compiling does not enumerate every key combination."""
+        rules = [
+            {
+                "criticality": f"C{i}",
+                "feature_name": f"Feature {i}",
+                "tolerance_type": f"T{i}",
+                "part_family": f"Family {i}",
+                "allowance": 0.1,
+            }
+            for i in range(100)
+        ]
+        compiled = AllowanceRules(rules)
+        # A dense table would hold 101**4 (about 10**8) cells.
+        cells = sum(mask.size for masks in compiled.masks for mask in masks.values())
+        assert cells == 100 * 4 * 101
+        assert compiled.size == 2
+        rows = pd.DataFrame(
+            {
+                "criticality": ["C1", "C1"],
+                "feature_name": ["Feature 1", "Feature 1"],
+                "tolerance_type": ["T1", "T1"],
+                "part_family": ["Family 1", "Family 2"],
+            }
+        )
+        assert compiled.fractions(rows).tolist() == [0.1, 0.0]
+
+    def test_exact_fractions(self):
+        """Tests that allowances are kept as exact integer ratios."""
+        rules = AllowanceRules([{"criticality": "Minor", "allowance": "0.15"}])
+        numerators, denominators = rules.exact_fractions(make_rows())
+        assert numerators.tolist() == [0, 0, 3, 3, 0]
+        assert denominators.tolist() == [1, 1, 20, 20, 1]
+
+    def test_invalid_rules_are_rejected(self):
+        """Tests that unknown keys and missing or negative allowances raise."""
+        with pytest.raises(ValueError):
+            AllowanceRules([{"customer": "ACME", "allowance": 0.2}])
+        with pytest.raises(ValueError):
+            AllowanceRules([{"criticality": "Minor"}])
+        with pytest.raises(ValueError):
+            AllowanceRules([{"allowance": -0.1}])
+
+    def test_version_tracks_rule_contents(self):
+        """Tests that a changed rule table changes the rule config version."""
+        tighter = AllowanceRules([{"allowance": 0.1}])
+        assert rule_config_version() == rule_config_version(DEFAULT_ALLOWANCE_RULES)
+        assert rule_config_version(tighter) != rule_config_version()
+
+
+class TestEnginesWithRules:
+    """Test suite for evaluating with a custom rule set."""
+
+    def make_measurements(self):
+        """Builds measurements whose outcome depends on the allowance."""
+        return make_rows().assign(
+            measured_value=[0.5011] * 5,
+            nominal_value=[0.5000] * 5,
+            original_upper_tol=[0.5010] * 5,
+            original_lower_tol=[0.4990] * 5,
+        )
+
+    def test_engines_apply_custom_allowances(self):
+        """Tests that both local engines expand limits by each row's rule."""
+        rules = AllowanceRules(
+            [
+                {"criticality": ["Critical", "Major"], "allowance": 0},
+                {"tolerance_type": "UNILATERAL", "allowance": 0.05},
+                {"allowance": 0.2},
+            ]
+        )
+        for evaluate in [evaluate_numpy, evaluate_fixed_point]:
+            result = evaluate(self.make_measurements(), 0.0, rules=rules)
+            assert result["allowance_eligible"].tolist() == [
+                False,
+                False,
+                True,
+                True,
+                True,
+            ]
+            np.testing.assert_allclose(
+                result["expanded_upper_tol"], [0.5010, 0.5010, 0.50105, 0.5012, 0.5012]
+            )
+            assert result["final_status"].tolist() == [1, 1, 1, 0, 0]
@@ -0,0 +1,58 @@
+"""Speed benchmarks, skipped unless CALIBRATIONIQ_BENCHMARKS is set.
+
+Wall-clock assertions depend on the machine, so they are kept out of the
+unit suite. Run them with ``CALIBRATIONIQ_BENCHMARKS=1 pytest
+tests/test_benchmarks.py``.
+"""
+
+import os
+import time
+
+import numpy as np
+import pytest
+from calibrationiq_notebook import calculate_deviation, calculate_deviation_batch
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get("CALIBRATIONIQ_BENCHMARKS"),
+    reason="set CALIBRATIONIQ_BENCHMARKS=1 to run the speed benchmarks",
+)
+
+
+class TestDeviationBatchSpeed:
+    """Regression benchmarks of the batch calculation against the scalar loop."""
+
+    PAIRS = 1_000_000
+    SAMPLE = 50_000
+
+    @staticmethod
+    def best_time(function, repeat=3):
+        """Returns the fastest of several runs, in seconds."""
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    def speedup(self, measured, nominal):
+        """Returns how much faster the batch is than the scalar loop."""
+        sample = list(zip(measured[: self.SAMPLE], nominal[: self.SAMPLE]))
+        loop = self.best_time(
+            lambda: [calculate_deviation(m, n) for m, n in sample], repeat=1
+        )
+        batch = self.best_time(lambda: calculate_deviation_batch(measured, nominal))
+        return loop * (self.PAIRS / self.SAMPLE) / batch
+
+    def test_arrays_are_100x_faster(self):
+        """Tests the 100x target for a million NumPy pairs."""
+        rng = np.random.default_rng(8)
+        measured = np.round(rng.uniform(0, 10, self.PAIRS), 4)
+        nominal = np.round(measured + rng.normal(0, 0.001, self.PAIRS), 4)
+        assert self.speedup(measured, nominal) >= 100
+
+    def test_numeric_strings_beat_the_loop(self):
+        """Tests that text is parsed in bulk rather than per value."""
+        rng = np.random.default_rng(9)
+        measured = [f"{value:.4f}" for value in rng.uniform(0, 10, self.PAIRS)]
+        nominal = ["5.0000"] * self.PAIRS
+        assert self.speedup(measured, nominal) >= 4
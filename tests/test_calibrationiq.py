@@ -1,8 +1,9 @@
 """Unit tests for CalibrationIQ core logic."""
 
+import numpy as np
 import pytest
 from decimal import Decimal
-from calibrationiq_notebook import calculate_deviation
+from calibrationiq_notebook import calculate_deviation, calculate_deviation_batch
 
 
 class TestDeviationCalculation:
@@ -163,3 +164,80 @@ class TestRealWorldScenarios:
         nominal = 25.00
         deviation = calculate_deviation(measured, nominal)
         assert deviation == pytest.approx(-0.04, abs=1e-6)
+
+
+class TestDeviationBatch:
+    """Test suite for the array-level deviation calculation."""
+
+    def assert_matches_scalar(self, measured, nominal):
+        """Asserts bit-identical results to the scalar function."""
+        deviations, reads_high = calculate_deviation_batch(measured, nominal)
+        expected = np.array(
+            [calculate_deviation(m, n) for m, n in zip(measured, nominal)]
+        )
+        np.testing.assert_array_equal(deviations, expected)
+        np.testing.assert_array_equal(reads_high, expected > 0)
+
+    def test_certificate_values(self):
+        """Tests typical certificate readings, high, low and zero."""
+        self.assert_matches_scalar(
+            [0.9985, 1.0012, 1.0, 24.96, 0.123456789, 1000.0015],
+            [1.0, 1.0, 1.0, 25.0, 0.12345678, 1000.0],
+        )
+
+    def test_flags_high_and_low(self):
+        """Tests the HIGH/LOW direction flags."""
+        _, reads_high = calculate_deviation_batch([1.0012, 0.9985, 1.0], [1.0] * 3)
+        assert reads_high.tolist() == [True, False, False]
+
+    def test_string_inputs(self):
+        """Tests numeric strings, including ones Decimal keeps exactly."""
+        self.assert_matches_scalar(
+            ["0.9985", "1.0012", "+.5", "1.", "1.00000000000000000001", "1e-3"],
+            ["1.0000", "1", "0.25", "0", "1", "0.0005"],
+        )
+
+    def test_values_beyond_fixed_point_range(self):
+        """Tests that long decimals and large values fall back exactly."""
+        rng = np.random.default_rng(11)
+        measured = rng.uniform(-1e7, 1e7, 2000)
+        nominal = np.round(rng.uniform(-10, 10, 2000), 4)
+        self.assert_matches_scalar(measured, nominal)
+        self.assert_matches_scalar(np.arange(-5, 5), np.arange(10))
+
+    def test_random_four_place_readings(self):
+        """Tests many readings recorded to four decimal places."""
+        rng = np.random.default_rng(5)
+        measured = np.round(rng.uniform(0, 10, 5000), 4)
+        nominal = np.round(measured + rng.normal(0, 0.001, 5000), 4)
+        self.assert_matches_scalar(measured, nominal)
+
+    def test_non_finite_values_match_scalar(self):
+        """Tests that NaN deviations propagate like the scalar function."""
+        deviations, reads_high = calculate_deviation_batch([float("nan")], [1.0])
+        assert np.isnan(deviations[0])
+        assert not reads_high[0]
+
+    def test_text_outside_the_fast_path(self):
+        """Tests exponents, padding and mixed input against the scalar path."""
+        self.assert_matches_scalar(
+            ["1.5e-12", " 0.25", "2.5E3", "0.1234567891", 0.5, "-.000000001"],
+            ["0", "0.5", "2500", "0.1", "0.25", "0"],
+        )
+
+    def test_spark_column_with_python_scalar(self):
+        """Tests that a scalar nominal is subtracted from a Spark Column."""
+        pytest.importorskip("pyspark")
+        from pyspark.sql import SparkSession
+        from pyspark.sql.functions import col
+
+        spark = SparkSession.builder.master("local[1]").getOrCreate()
+        df = spark.createDataFrame([(0.9985,), (1.0012,)], ["measured"])
+        deviation, reads_high = calculate_deviation_batch(col("measured"), 1.0)
+        rows = df.select(deviation, reads_high).collect()
+        assert [tuple(row) for row in rows] == [
+            (calculate_deviation(0.9985, 1.0), False),
+            (calculate_deviation(1.0012, 1.0), True),
+        ]
+        with pytest.raises(TypeError):
+            calculate_deviation_batch(col("measured"), [1.0, 1.0])
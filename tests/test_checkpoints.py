@@ -0,0 +1,70 @@
+"""Unit tests for block-level checkpoints."""
+
+import os
+
+import pandas as pd
+from checkpoints import MANIFEST_FILE, CheckpointStore
+
+
+def make_frame():
+    """Builds a small evaluated frame."""
+    return pd.DataFrame(
+        {
+            "sample_serial_number": ["SN-1", "SN-2"],
+            "adjusted_value": [1.0005, 0.9985],
+            "final_status": pd.Series([0, 1], dtype="int8"),
+        }
+    )
+
+
+class TestCheckpointStore:
+    """Test suite for saving and resuming checkpoints."""
+
+    def test_round_trip(self, tmp_path):
+        """Tests that data and frames load back under the same fingerprint."""
+        store = CheckpointStore(str(tmp_path), "QUALITY-1")
+        store.save(
+            "evaluation", "fp-1", {"cleared": False}, {"evaluated": make_frame()}
+        )
+
+        loaded = store.load("evaluation", "fp-1")
+        assert loaded["data"] == {"cleared": False}
+        pd.testing.assert_frame_equal(loaded["frames"]["evaluated"], make_frame())
+        assert loaded["created"]
+
+    def test_stale_fingerprint_is_not_reused(self, tmp_path):
+        """Tests that a checkpoint built from other inputs is ignored."""
+        store = CheckpointStore(str(tmp_path), "QUALITY-1")
+        store.save("extraction", "fp-1", {"units": "in"})
+        assert store.load("extraction", "fp-2") is None
+
+    def test_missing_and_incomplete_checkpoints(self, tmp_path):
+        """Tests that a block without a manifest counts as not completed."""
+        store = CheckpointStore(str(tmp_path), "QUALITY-1")
+        assert store.load("history", "fp-1") is None
+
+        store.save("history", "fp-1", {}, {"history": make_frame()})
+        os.remove(os.path.join(store.path, "history", MANIFEST_FILE))
+        assert store.load("history", "fp-1") is None
+
+    def test_save_replaces_previous_checkpoint(self, tmp_path):
+        """Tests that a block's new checkpoint drops the old frames."""
+        store = CheckpointStore(str(tmp_path), "QUALITY-1")
+        store.save("failures", "fp-1", {"failure_count": 2}, {"failures": make_frame()})
+        store.save("failures", "fp-2", {"failure_count": 0}, {"failures": None})
+
+        assert store.load("failures", "fp-1") is None
+        loaded = store.load("failures", "fp-2")
+        assert loaded["data"] == {"failure_count": 0}
+        assert loaded["frames"] == {}
+
+    def test_runs_are_separate_and_cleared(self, tmp_path):
+        """Tests that each ticket has its own checkpoints and clear removes them."""
+        first = CheckpointStore(str(tmp_path), "QUALITY-1")
+        second = CheckpointStore(str(tmp_path), "QUALITY-2")
+        first.save("extraction", "fp-1", {"units": "in"})
+        second.save("extraction", "fp-1", {"units": "mm"})
+
+        first.clear()
+        assert first.load("extraction", "fp-1") is None
+        assert second.load("extraction", "fp-1")["data"] == {"units": "mm"}
@@ -0,0 +1,80 @@
+"""Unit tests for the memory-mapped column cache."""
+
+import numpy as np
+import pandas as pd
+from column_cache import (
+    build_column_cache,
+    is_cache_current,
+    load_column_cache,
+    open_column_cache,
+)
+from oot_engine import evaluate_numpy
+
+
+def write_export(path):
+    """Writes a small CSV measurement export."""
+    pd.DataFrame(
+        {
+            "job_number": ["WO-001", "WO-002", "WO-002"],
+            "measured_value": [0.5005, 3.0001, 0.1008],
+            "nominal_value": [0.5000, 3.0000, 0.1000],
+            "original_upper_tol": [0.5010, 3.0005, 0.1010],
+            "original_lower_tol": [0.4990, 2.9995, 0.0990],
+            "criticality": ["Critical", "NotSpecified", "NotSpecified"],
+            "measurement_date": ["2023-02-14", "2023-07-11", "2023-07-11"],
+        }
+    ).to_csv(path, index=False)
+
+
+class TestColumnCache:
+    """Test suite for converting and memory-mapping local exports."""
+
+    def test_round_trip_matches_csv(self, tmp_path):
+        """Tests that cached columns hold the same values as the CSV."""
+        csv_path = tmp_path / "export.csv"
+        write_export(csv_path)
+        df = open_column_cache(csv_path)
+        expected = pd.read_csv(csv_path)
+        assert df["measured_value"].tolist() == expected["measured_value"].tolist()
+        assert df["criticality"].astype(str).tolist() == (
+            expected["criticality"].tolist()
+        )
+        assert df["measurement_date"].iloc[0] == pd.Timestamp("2023-02-14")
+
+    def test_text_columns_are_dictionary_encoded(self, tmp_path):
+        """Tests that text columns are stored as small integer codes."""
+        csv_path = tmp_path / "export.csv"
+        write_export(csv_path)
+        manifest = build_column_cache(csv_path, tmp_path / "cache")
+        assert manifest["columns"]["criticality"]["kind"] == "dictionary"
+        codes = np.load(tmp_path / "cache" / "criticality.npy")
+        assert codes.dtype == np.int8
+
+    def test_columns_are_memory_mapped_without_copy(self, tmp_path):
+        """Tests that loaded columns are views of the mapped files."""
+        csv_path = tmp_path / "export.csv"
+        write_export(csv_path)
+        build_column_cache(csv_path, tmp_path / "cache")
+        df = load_column_cache(tmp_path / "cache")
+        values = df["measured_value"].to_numpy()
+        assert isinstance(values.base, np.memmap) or isinstance(values, np.memmap)
+
+    def test_cache_is_rebuilt_when_csv_changes(self, tmp_path):
+        """Tests that a modified export invalidates the cache."""
+        csv_path = tmp_path / "export.csv"
+        write_export(csv_path)
+        open_column_cache(csv_path)
+        assert is_cache_current(csv_path, f"{csv_path}.columns")
+        with open(csv_path, "a") as f:
+            f.write("WO-003,0.75,0.75,0.751,0.749,Minor,2023-08-01\n")
+        assert not is_cache_current(csv_path, f"{csv_path}.columns")
+        assert len(open_column_cache(csv_path)) == 4
+
+    def test_engine_evaluates_mapped_columns(self, tmp_path):
+        """Tests that the NumPy engine runs directly on the cached frame."""
+        csv_path = tmp_path / "export.csv"
+        write_export(csv_path)
+        cached = evaluate_numpy(open_column_cache(csv_path), -0.0015)
+        parsed = evaluate_numpy(pd.read_csv(csv_path), -0.0015)
+        assert cached["final_status"].tolist() == parsed["final_status"].tolist()
+        assert cached["allowance_eligible"].tolist() == [False, True, True]
@@ -41,6 +41,8 @@ class TestDataGeneration:
                 "original_lower_tol",
                 "tolerance_type",
                 "criticality",
+                "tool_id",
+                "measurement_date",
             ]
 
             assert list(df.columns) == expected_columns
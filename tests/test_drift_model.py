@@ -0,0 +1,172 @@
+"""Unit tests for drift-model narrowing of the impact window."""
+
+import pandas as pd
+import pytest
+from drift_model import (
+    DriftingDeviation,
+    DriftModel,
+    filter_to_window,
+    window_mask,
+)
+from oot_engine import STATUS_FAIL, STATUS_PASS, ErrorCurve, evaluate_numpy
+
+CALIBRATION_DATES = ["2022-01-01", "2022-04-11", "2022-07-20"]
+
+
+def make_model():
+    """Fits a model that drifts 0.0010 in every 100 days."""
+    return DriftModel.fit(CALIBRATION_DATES, [0.0, -0.0010, -0.0020])
+
+
+class TestDriftModel:
+    """Test suite for fitting and projecting tool drift."""
+
+    def test_fit_recovers_linear_drift(self):
+        """Tests that a straight-line history is fitted exactly."""
+        model = make_model()
+        assert model.error_at(["2022-01-01"])[0] == pytest.approx(0.0, abs=1e-9)
+        assert model.error_at(["2022-07-20"])[0] == pytest.approx(-0.0020)
+
+    def test_fit_needs_two_dates(self):
+        """Tests that a single calibration cannot define a drift."""
+        with pytest.raises(ValueError):
+            DriftModel.fit(["2023-01-01"], [-0.0010])
+
+    def test_crossing_date_for_drifting_low(self):
+        """Tests that a tool drifting low crosses its lower limit."""
+        crossing = make_model().crossing_date(-0.0010, 0.0010)
+        assert pd.Timestamp("2022-04-10") <= crossing <= pd.Timestamp("2022-04-11")
+
+    def test_no_drift_has_no_crossing(self):
+        """Tests that a flat model never crosses."""
+        model = DriftModel("2022-01-01", -0.0002, 0.0)
+        assert model.crossing_date(-0.0010, 0.0010) is None
+
+    def test_window_is_narrowed_to_at_risk_period(self):
+        """Tests that the window starts at the estimated crossing."""
+        start, end = make_model().at_risk_window(
+            "2022-01-01", "2022-07-20", -0.0010, 0.0010
+        )
+        assert pd.Timestamp("2022-04-10") <= start <= pd.Timestamp("2022-04-11")
+        assert end == pd.Timestamp("2022-07-20")
+
+    def test_safety_days_move_crossing_earlier(self):
+        """Tests that the safety margin widens the window."""
+        plain, _ = make_model().at_risk_window(
+            "2022-01-01", "2022-07-20", -0.0010, 0.0010
+        )
+        safe, _ = make_model().at_risk_window(
+            "2022-01-01", "2022-07-20", -0.0010, 0.0010, safety_days=30
+        )
+        assert plain - safe == pd.Timedelta(days=30)
+
+    def test_unexplained_oot_keeps_full_window(self):
+        """Tests that a model crossing after the OOT date keeps the window."""
+        model = DriftModel("2022-01-01", 0.0, -0.000001)
+        window = model.at_risk_window("2022-01-01", "2023-01-01", -0.0010, 0.0010)
+        assert window == (pd.Timestamp("2022-01-01"), pd.Timestamp("2023-01-01"))
+
+    def test_flat_history_has_no_crossing(self):
+        """Tests that a rounding-level slope does not overflow the date."""
+        model = DriftModel.fit(CALIBRATION_DATES, [-0.0002, -0.0002, -0.0002])
+        assert model.crossing_date(-0.0010, 0.0010) is None
+        window = model.at_risk_window("2022-01-01", "2023-01-01", -0.0010, 0.0010)
+        assert window == (pd.Timestamp("2022-01-01"), pd.Timestamp("2023-01-01"))
+
+    def test_tiny_slope_crossing_out_of_range(self):
+        """Tests that a crossing centuries away is treated as no crossing."""
+        model = DriftModel("2022-01-01", 0.0, 3e-22)
+        assert model.crossing_date(-0.0010, 0.0010) is None
+
+    def test_sudden_failure_keeps_full_window(self):
+        """Tests that a history that is not steady drift does not narrow."""
+        dates = ["2020-01-01", "2021-01-01", "2022-01-01", "2023-01-01"]
+        model = DriftModel.fit(dates, [0.0002, -0.0002, 0.0002, -0.0015])
+        assert not model.is_linear
+        window = model.at_risk_window("2022-01-01", "2023-01-01", -0.0010, 0.0010)
+        assert window == (pd.Timestamp("2022-01-01"), pd.Timestamp("2023-01-01"))
+
+    def test_accelerating_history_keeps_full_window(self):
+        """Tests that a poor linear fit (R² below the minimum) keeps the window."""
+        dates = ["2021-01-05", "2022-01-04", "2023-01-01", "2023-12-31"]
+        model = DriftModel.fit(dates, [0.0, -0.0003, -0.0006, -0.0015])
+        assert model.monotonic and not model.is_linear
+        window = model.at_risk_window("2023-01-01", "2023-12-31", -0.0010, 0.0010)
+        assert window == (pd.Timestamp("2023-01-01"), pd.Timestamp("2023-12-31"))
+
+    def test_linear_history_is_trusted(self):
+        """Tests that a steady drift passes the goodness-of-fit check."""
+        model = make_model()
+        assert model.is_linear
+        assert model.r_squared == pytest.approx(1.0)
+
+
+# The same reading early in the window and on the date the tool was found.
+MEASUREMENTS = {
+    "measured_value": 0.4995,
+    "measurement_date": ["2022-04-11", "2022-07-20"],
+}
+
+
+class TestDriftingDeviation:
+    """Test suite for the time-varying deviation."""
+
+    def test_deviation_scales_with_drift(self, make_history):
+        """Tests that earlier rows get a proportionally smaller correction."""
+        deviation = DriftingDeviation(-0.0020, make_model(), "2022-07-20")
+        values = deviation.row_values(make_history(**MEASUREMENTS))
+        assert values == pytest.approx([-0.0010, -0.0020], abs=1e-6)
+
+    def test_engine_applies_time_varying_deviation(self, make_history):
+        """Tests that the drift reduces false failures early in the window."""
+        deviation = DriftingDeviation(-0.0020, make_model(), "2022-07-20")
+        result = evaluate_numpy(make_history(**MEASUREMENTS), deviation)
+        assert result["final_status"].tolist() == [STATUS_PASS, STATUS_FAIL]
+
+    def test_drift_combines_with_error_curve(self, make_history):
+        """Tests that an error curve is scaled by the drift fraction."""
+        curve = ErrorCurve([0.0, 1.0], [0.0, -0.0040])
+        deviation = DriftingDeviation(curve, make_model(), "2022-07-20")
+        values = deviation.row_values(make_history(**MEASUREMENTS))
+        as_found = curve.at([0.4995])[0]
+        assert values == pytest.approx([0.5 * as_found, as_found], abs=1e-6)
+
+    def test_bounds_span_zero_to_as_found(self):
+        """Tests that zone-map bounds cover every drift fraction."""
+        deviation = DriftingDeviation(-0.0020, make_model(), "2022-07-20")
+        assert deviation.bounds(0.4, 0.6) == (-0.0020, 0.0)
+
+
+class TestFilterToWindow:
+    """Test suite for restricting the history to a date window."""
+
+    def test_filters_pandas_history(self):
+        """Tests that only rows inside the window are kept."""
+        df = pd.DataFrame(
+            {"measurement_date": ["2022-12-31", "2023-01-01", "2023-06-30"]}
+        )
+        kept = filter_to_window(df, "2023-01-01", "2023-03-31")
+        assert kept["measurement_date"].tolist() == ["2023-01-01"]
+
+    def test_window_mask_marks_rows_inside_the_window(self):
+        """Tests that the mask marks the rows ``filter_to_window`` keeps."""
+        df = pd.DataFrame(
+            {"measurement_date": ["2022-12-31", "2023-01-01", "2023-06-30"]}
+        )
+        mask = window_mask(df, "2023-01-01", "2023-03-31")
+        assert mask.tolist() == [False, True, False]
+
+    def test_readings_during_the_end_date_are_kept(self):
+        """Tests that the window compares calendar dates, not midnight."""
+        df = pd.DataFrame(
+            {
+                "measurement_date": [
+                    "2023-01-01 07:15",
+                    "2023-03-31 14:30",
+                    "2023-04-01 00:10",
+                ]
+            }
+        )
+        mask = window_mask(df, "2023-01-01 12:00", "2023-03-31")
+        assert mask.tolist() == [True, True, False]
+        assert len(filter_to_window(df, "2023-01-01", "2023-03-31")) == 2
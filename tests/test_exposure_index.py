@@ -0,0 +1,90 @@
+"""Unit tests for the serial/job exposure index."""
+
+import pytest
+from exposure_index import ExposureIndex
+from oot_engine import STATUS_FAIL, STATUS_PASS
+
+# Three parts measured with two tools.
+HISTORY = {
+    "job_number": ["WO-001", "WO-001", "WO-002", "WO-003"],
+    "sample_serial_number": ["SN-101", "SN-101", "SN-201", "SN-301"],
+    "tool_id": ["BC1", "BC2", "BC1", "BC2"],
+}
+
+
+@pytest.fixture
+def index(make_history):
+    """Records one OOT ticket for BC1 in which SN-201 failed."""
+    history = make_history(**HISTORY)
+    touched = history[history["tool_id"] == "BC1"]
+    failures = touched[touched["sample_serial_number"] == "SN-201"]
+    return ExposureIndex().ingest(history).record_event("Q-1", "BC1", touched, failures)
+
+
+class TestExposureLookups:
+    """Test suite for serial and job lookups."""
+
+    def test_ingest_maps_parts_to_jobs_and_tools(self, make_history):
+        """Tests that each part records the jobs and tools it was measured with."""
+        index = ExposureIndex().ingest(make_history(**HISTORY))
+        assert index.parts["SN-101"] == {"jobs": {"WO-001"}, "tools": {"BC1", "BC2"}}
+        assert index.jobs["WO-001"] == {"SN-101"}
+
+    def test_lookup_serial_returns_event_status(self, index):
+        """Tests that a touched part reports the event and its status."""
+        assert index.lookup_serial("SN-101")["Q-1"]["status"] == STATUS_PASS
+        assert index.lookup_serial("SN-201")["Q-1"]["status"] == STATUS_FAIL
+        assert index.lookup_serial("SN-301") == {}
+
+    def test_lookup_job_returns_exposed_parts(self, index):
+        """Tests that a job lookup lists only its exposed parts."""
+        assert list(index.lookup_job("WO-002")) == ["SN-201"]
+        assert index.lookup_job("WO-003") == {}
+
+    def test_closed_events_no_longer_expose(self, index):
+        """Tests that a dispositioned ticket drops out of the open lookups."""
+        index.close_event("Q-1")
+        assert index.lookup_serial("SN-201") == {}
+        assert (
+            index.lookup_serial("SN-201", include_closed=True)["Q-1"]["open"] is False
+        )
+
+    def test_bulk_check(self, index):
+        """Tests checking many serials at once, including unknown ones."""
+        result = index.check_serials(["SN-101", "SN-201", "SN-999"])
+        assert result["exposed"].tolist() == [True, True, False]
+        assert result["failed"].tolist() == [False, True, False]
+        assert result["events"].tolist() == ["Q-1", "Q-1", ""]
+
+
+class TestExposureMaintenance:
+    """Test suite for incremental updates and persistence."""
+
+    def test_rerun_replaces_event_exposure(self, index, make_history):
+        """Tests that recording a ticket again replaces its previous result."""
+        touched = make_history(**HISTORY).iloc[[2]]
+        index.record_event("Q-1", "BC1", touched)
+        assert index.lookup_serial("SN-101") == {}
+        assert index.lookup_serial("SN-201")["Q-1"]["status"] == STATUS_PASS
+
+    def test_incremental_run_adds_to_event(self, index, make_history):
+        """Tests that an incremental run keeps the parts recorded before."""
+        new_rows = make_history(**HISTORY).iloc[[2]]
+        index.record_event("Q-1", "BC1", new_rows, new_rows, replace=False)
+        assert index.lookup_serial("SN-101")["Q-1"]["status"] == STATUS_PASS
+        assert index.lookup_serial("SN-201")["Q-1"]["status"] == STATUS_FAIL
+
+    def test_incremental_run_clears_remeasured_failure(self, index, make_history):
+        """Tests that a part whose failure was re-measured and passed clears."""
+        new_rows = make_history(**HISTORY).iloc[[2]]
+        index.record_event("Q-1", "BC1", new_rows, None, replace=False)
+        assert index.lookup_serial("SN-201")["Q-1"]["status"] == STATUS_PASS
+        assert index.events["Q-1"]["serials"] == ["SN-101", "SN-201"]
+
+    def test_save_and_load_round_trip(self, index, tmp_path):
+        """Tests that a saved index answers the same lookups."""
+        path = tmp_path / "exposure.json"
+        index.save(path)
+        loaded = ExposureIndex.load(path)
+        assert loaded.lookup_serial("SN-201")["Q-1"]["status"] == STATUS_FAIL
+        assert loaded.parts["SN-101"]["tools"] == {"BC1", "BC2"}
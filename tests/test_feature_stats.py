@@ -0,0 +1,162 @@
+"""Unit tests for streaming per-feature statistics."""
+
+import math
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+from feature_stats import (
+    FeatureStats,
+    QuantileSketch,
+    RunningStats,
+    capability,
+    feature_statistics,
+)
+
+
+@pytest.fixture
+def evaluated(make_evaluated):
+    """Evaluates a random history of two features on one tool."""
+    rows = 1000
+    rng = np.random.default_rng(3)
+    return make_evaluated(
+        -0.0005,
+        feature_name=rng.choice(["Bore", "Step"], rows),
+        measured_value=np.round(0.5 + rng.normal(0.0, 0.0003, rows), 4),
+    )
+
+
+class TestRunningStats:
+    """Test suite for the mergeable Welford state."""
+
+    def test_matches_numpy_in_one_pass(self):
+        """Tests mean, variance and extremes against NumPy."""
+        values = np.random.default_rng(0).normal(1.0, 0.01, 5000)
+        stats = RunningStats()
+        for chunk in np.array_split(values, 7):
+            stats.update(chunk)
+        assert stats.count == 5000
+        assert stats.mean == pytest.approx(values.mean(), abs=1e-12)
+        assert stats.std == pytest.approx(values.std(ddof=1), rel=1e-9)
+        assert (stats.min, stats.max) == (values.min(), values.max())
+
+    def test_merge_equals_single_state(self):
+        """Tests that merged partial states equal one state over all values."""
+        values = np.random.default_rng(1).normal(0.5, 0.001, 999)
+        left, right, whole = RunningStats(), RunningStats(), RunningStats()
+        left.update(values[:400])
+        right.update(values[400:])
+        whole.update(values)
+        left.merge(right)
+        assert left.mean == pytest.approx(whole.mean, abs=1e-15)
+        assert left.std == pytest.approx(whole.std, rel=1e-9)
+
+    def test_single_value_has_no_spread(self):
+        """Tests that the standard deviation needs two values."""
+        stats = RunningStats()
+        stats.update([0.5])
+        assert math.isnan(stats.std)
+        assert all(math.isnan(value) for value in capability(stats, 0.51, 0.49))
+
+
+class TestQuantileSketch:
+    """Test suite for the KLL-style quantile sketch."""
+
+    @staticmethod
+    def rank_error(values, estimate, q):
+        """Returns how far the estimate's rank is from the ``q`` rank."""
+        return abs(np.searchsorted(np.sort(values), estimate) / len(values) - q)
+
+    def test_quantiles_within_rank_error(self):
+        """Tests that quantiles are accurate to a small share of the ranks."""
+        values = np.random.default_rng(2).normal(0.5, 0.001, 100000)
+        sketch = QuantileSketch()
+        for chunk in np.array_split(values, 37):
+            sketch.update(chunk)
+        for q in [0.05, 0.5, 0.95]:
+            assert self.rank_error(values, sketch.quantile(q), q) < 0.01
+
+    def test_small_streams_are_exact(self):
+        """Tests that a stream within one level keeps every value."""
+        values = np.random.default_rng(6).normal(0.5, 0.001, 300)
+        sketch = QuantileSketch()
+        sketch.update(values)
+        assert sketch.quantile(0.5) == np.quantile(values, 0.5, method="lower")
+
+    def test_memory_is_bounded(self):
+        """Tests that distinct values do not grow the sketch linearly."""
+        sketch = QuantileSketch(k=128)
+        rng = np.random.default_rng(7)
+        for _ in range(100):
+            sketch.update(rng.normal(0.5, 0.01, 10000))
+        assert sketch.retained < 128 * 16
+
+    def test_merge_keeps_weight_and_accuracy(self):
+        """Tests that merged sketches count every value once."""
+        values = np.random.default_rng(4).normal(0.5, 0.001, 20000)
+        left, right = QuantileSketch(), QuantileSketch()
+        left.update(values[:7000])
+        right.update(values[7000:])
+        left.merge(right)
+        weight = sum(level.size * 2**h for h, level in enumerate(left.levels))
+        assert weight == len(values)
+        assert self.rank_error(values, left.quantile(0.5), 0.5) < 0.01
+
+    def test_empty_sketch(self):
+        """Tests that an empty sketch has no quantiles."""
+        assert math.isnan(QuantileSketch().quantile(0.5))
+
+
+class TestFeatureStats:
+    """Test suite for per-feature raw and adjusted statistics."""
+
+    def test_capability_indices(self):
+        """Tests Cp and Cpk against the textbook formulas."""
+        values = np.random.default_rng(5).normal(0.5004, 0.0002, 500)
+        stats = RunningStats()
+        stats.update(values)
+        cp, cpk = capability(stats, 0.501, 0.499)
+        sigma = values.std(ddof=1)
+        assert cp == pytest.approx(0.002 / (6 * sigma))
+        assert cpk == pytest.approx((0.501 - values.mean()) / (3 * sigma))
+
+    def test_one_row_per_feature_with_shift(self, evaluated):
+        """Tests that the adjustment shifts each feature's mean."""
+        result = feature_statistics(evaluated).set_index("feature_name")
+        assert sorted(result.index) == ["Bore", "Step"]
+        assert result["mean_shift"].tolist() == pytest.approx([0.0005, 0.0005])
+        assert (result["adjusted_cpk"] < result["raw_cpk"]).all()
+        assert (result["raw_count"] == result["adjusted_count"]).all()
+
+    def test_chunked_and_merged_match_single_pass(self, evaluated):
+        """Tests that chunking and merging partitions give the same result."""
+        single = feature_statistics(evaluated)
+        blocks = np.arange(len(evaluated)) // 123
+        chunked = feature_statistics([chunk for _, chunk in evaluated.groupby(blocks)])
+        merged = (
+            FeatureStats()
+            .update(evaluated.iloc[:500])
+            .merge(FeatureStats().update(evaluated.iloc[500:]))
+            .to_frame()
+        )
+        exact = [name for name in single if not re.search(r"_p\d\d$", name)]
+        for other in [chunked, merged]:
+            pd.testing.assert_frame_equal(
+                single.sort_values("feature_name").reset_index(drop=True)[exact],
+                other.sort_values("feature_name").reset_index(drop=True)[exact],
+            )
+
+    def test_parts_with_different_limits_stay_apart(self, evaluated):
+        """Tests that one feature name with two specifications is not mixed."""
+        wide = evaluated.assign(
+            nominal_value=0.75,
+            original_upper_tol=0.76,
+            original_lower_tol=0.74,
+            measured_value=evaluated["measured_value"] + 0.25,
+            adjusted_value=evaluated["adjusted_value"] + 0.25,
+        )
+        result = feature_statistics(pd.concat([evaluated, wide]))
+        assert len(result) == 4
+        assert (result["original_upper_tol"] > result["original_lower_tol"]).all()
+        assert (result["raw_cp"] > 0).all()
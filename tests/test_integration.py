@@ -1,7 +1,12 @@
 """Integration tests for the CalibrationIQ pipeline."""
 
+import pandas as pd
 import pytest
+import calibrationiq_notebook as nb
 from calibrationiq_notebook import calculate_deviation
+from conftest import build_history
+from measurement_store import write_measurements
+from zone_maps import open_store_zone_map
 
 
 class TestPipelineIntegration:
@@ -134,3 +139,236 @@ class TestPipelineIntegration:
 
         # Fails because no allowance for critical features
         assert adjusted_value > expanded_upper
+
+
+def flat_certificate(as_found):
+    """Returns the sample certificate with a calibration history of ``as_found``."""
+    history = [
+        {"date": date, "nominal": 1.0, "as_found": value}
+        for date, value in zip(
+            ["2021-01-05", "2022-01-04", "2023-01-01", "2023-12-31"], as_found
+        )
+    ]
+    return {**nb.SIMULATED_AI_RESPONSE, "calibration_history": history}
+
+
+class TestNotebookOrchestration:
+    """Runs the notebook pipeline on small exports of tool BC1234567.
+
+    The certificate's error curve is about -0.00075 in at 0.5 in, so a
+    critical 0.5 +/- 0.001 in feature measured at 0.5005 fails and one
+    measured at 0.5000 passes.
+    """
+
+    @pytest.fixture(autouse=True)
+    def configure(self, monkeypatch, tmp_path):
+        for name in [
+            "MEASUREMENT_STORE_PATH",
+            "EXPOSURE_INDEX_PATH",
+            "TICKET_STATE_DIR",
+            "RESULT_CACHE_DIR",
+            "CHECKPOINT_DIR",
+            "PROFILE_DIR",
+        ]:
+            monkeypatch.setattr(nb, name, None)
+        monkeypatch.setattr(nb, "MEASUREMENT_EXPORT_PATH", str(tmp_path / "m.csv"))
+        monkeypatch.setattr(nb, "USE_DRIFT_MODEL", False)
+        monkeypatch.setattr(nb, "RUN_MONTE_CARLO", False)
+
+    def export(self, history):
+        history.to_csv(nb.MEASUREMENT_EXPORT_PATH, index=False)
+
+    def failing_serials(self, result):
+        return sorted(result["failures"]["sample_serial_number"].astype(str))
+
+    def test_superseded_readings_are_not_reported(self):
+        # SN-1 was re-measured in tolerance; SN-2's failure was uploaded twice.
+        self.export(
+            build_history(
+                tool_id=nb.bc_number,
+                sample_serial_number=["SN-1", "SN-1", "SN-2", "SN-2"],
+                measured_value=[0.5005, 0.5000, 0.5005, 0.5005],
+                measurement_date=[
+                    "2023-03-01",
+                    "2023-03-02",
+                    "2023-03-01",
+                    "2023-03-01",
+                ],
+            )
+        )
+        result = nb.main()
+        assert result["failure_count"] == 1
+        assert self.failing_serials(result) == ["SN-2"]
+
+    def test_late_record_is_picked_up_by_a_rerun(
+        self, monkeypatch, tmp_path, capsys
+    ):
+        monkeypatch.setattr(nb, "TICKET_STATE_DIR", str(tmp_path / "tickets"))
+        history = build_history(
+            tool_id=nb.bc_number,
+            sample_serial_number=["SN-1", "SN-2"],
+            measured_value=[0.5005, 0.5000],
+            measurement_date=["2023-06-01", "2023-06-01"],
+        )
+        self.export(history)
+        assert nb.main()["failure_count"] == 1
+
+        # A failing record dated before everything analyzed arrives late.
+        late = build_history(
+            tool_id=nb.bc_number,
+            sample_serial_number=["SN-3"],
+            measurement_date=["2023-02-01"],
+        )
+        self.export(pd.concat([history, late], ignore_index=True))
+        capsys.readouterr()
+        result = nb.main()
+        assert len(result["evaluated"]) == 1
+        assert result["failure_count"] == 2
+        assert self.failing_serials(result) == ["SN-1", "SN-3"]
+        # The part rollup covers the ticket's merged failures.
+        assert "🧾 2 parts require an NC" in capsys.readouterr().out
+
+    def test_rerun_without_new_readings_reports_stored_failures(
+        self, monkeypatch, tmp_path
+    ):
+        monkeypatch.setattr(nb, "TICKET_STATE_DIR", str(tmp_path / "tickets"))
+        self.export(
+            build_history(
+                tool_id=nb.bc_number,
+                sample_serial_number=["SN-1", "SN-2"],
+                measured_value=[0.5005, 0.5000],
+            )
+        )
+        nb.main()
+        result = nb.main()
+        assert len(result["evaluated"]) == 0
+        assert not result["cleared_by_zone_map"]
+        assert result["failure_count"] == 1
+        assert self.failing_serials(result) == ["SN-1"]
+
+    def test_store_rerun_reads_only_new_files(self, monkeypatch, tmp_path):
+        store = str(tmp_path / "store")
+        monkeypatch.setattr(nb, "MEASUREMENT_STORE_PATH", store)
+        monkeypatch.setattr(nb, "TICKET_STATE_DIR", str(tmp_path / "tickets"))
+        write_measurements(
+            build_history(
+                tool_id=nb.bc_number,
+                sample_serial_number=["SN-1", "SN-2"],
+                measured_value=[0.5005, 0.5000],
+            ),
+            store,
+        )
+        assert nb.main()["failure_count"] == 1
+        assert nb.main()["failure_count"] == 1
+
+        # A failing record dated before everything analyzed is ingested late.
+        write_measurements(
+            build_history(
+                tool_id=nb.bc_number,
+                sample_serial_number=["SN-3"],
+                measurement_date=["2023-01-15"],
+            ),
+            store,
+        )
+        result = nb.main()
+        assert result["evaluated"]["sample_serial_number"].tolist() == ["SN-3"]
+        assert result["failure_count"] == 2
+        assert self.failing_serials(result) == ["SN-1", "SN-3"]
+
+    @pytest.mark.parametrize(
+        "as_found",
+        [
+            [0.9985, 0.9985, 0.9985, 0.9985],
+            [0.9985, 0.99849999, 0.99849998, 0.99849997],
+        ],
+        ids=["flat", "nearly flat"],
+    )
+    def test_flat_drift_history_keeps_the_full_window(self, monkeypatch, as_found):
+        monkeypatch.setattr(nb, "SIMULATED_AI_RESPONSE", flat_certificate(as_found))
+        self.export(
+            build_history(
+                tool_id=nb.bc_number,
+                sample_serial_number=["SN-1", "SN-2", "SN-3"],
+                measured_value=[0.5005, 0.5000, 0.5005],
+                measurement_date=["2023-01-15", "2023-06-01", "2023-11-01"],
+            )
+        )
+        without_drift = nb.main()
+        monkeypatch.setattr(nb, "USE_DRIFT_MODEL", True)
+        with_drift = nb.main()
+        assert self.failing_serials(with_drift) == ["SN-1", "SN-3"]
+        assert self.failing_serials(with_drift) == self.failing_serials(without_drift)
+
+    def test_monte_carlo_evaluates_cleared_zones(self, monkeypatch):
+        monkeypatch.setattr(nb, "RUN_MONTE_CARLO", True)
+        monkeypatch.setattr(nb, "MONTE_CARLO_DRAWS", 200)
+        # Every reading passes, so the zone map alone would clear the tool.
+        self.export(
+            build_history(
+                tool_id=nb.bc_number,
+                sample_serial_number=["SN-1", "SN-2", "SN-3"],
+                measured_value=[0.4995, 0.5000, 0.4998],
+            )
+        )
+        result = nb.main()
+        assert not result["cleared_by_zone_map"]
+        assert result["failure_count"] == 0
+        probabilities = result["evaluated"]["prob_nonconformance"]
+        assert len(probabilities) == 3
+        assert probabilities.between(0.0, 1.0).all()
+
+    def test_without_a_store_zone_map_the_window_is_evaluated(self):
+        # The passing Step Height zone would be pruned by a zone map.
+        self.export(
+            build_history(
+                tool_id=nb.bc_number,
+                sample_serial_number=["SN-1", "SN-2"],
+                feature_name=["Hole Diameter", "Step Height"],
+                measured_value=[0.5005, 0.5000],
+            )
+        )
+        result = nb.main()
+        assert len(result["evaluated"]) == 2
+        assert result["failure_count"] == 1
+
+    def test_store_zone_map_prunes_the_window(self, monkeypatch, tmp_path):
+        store = str(tmp_path / "store")
+        zone_map = open_store_zone_map(store, nb.DEFAULT_ALLOWANCE_RULES, "in")
+        write_measurements(
+            build_history(
+                tool_id=nb.bc_number,
+                sample_serial_number=["SN-1", "SN-2"],
+                feature_name=["Hole Diameter", "Step Height"],
+                measured_value=[0.5005, 0.5000],
+            ),
+            store,
+            zone_map,
+        )
+        monkeypatch.setattr(nb, "MEASUREMENT_STORE_PATH", store)
+        result = nb.main()
+        assert result["evaluated"]["sample_serial_number"].tolist() == ["SN-1"]
+        assert result["failure_count"] == 1
+
+    def test_store_zone_map_clears_the_tool_without_a_query(
+        self, monkeypatch, tmp_path
+    ):
+        store = str(tmp_path / "store")
+        zone_map = open_store_zone_map(store, nb.DEFAULT_ALLOWANCE_RULES, "in")
+        write_measurements(
+            build_history(
+                tool_id=nb.bc_number,
+                sample_serial_number=["SN-1", "SN-2"],
+                measured_value=[0.4995, 0.5000],
+            ),
+            store,
+            zone_map,
+        )
+        monkeypatch.setattr(nb, "MEASUREMENT_STORE_PATH", store)
+
+        def read_measurements(*args):
+            raise AssertionError("the history was queried")
+
+        monkeypatch.setattr(nb, "read_measurements", read_measurements)
+        result = nb.main()
+        assert result["cleared_by_zone_map"]
+        assert result["failure_count"] == 0
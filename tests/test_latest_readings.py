@@ -0,0 +1,101 @@
+"""Unit tests for latest-reading deduplication."""
+
+import numpy as np
+import pandas as pd
+from latest_readings import (
+    DUPLICATE_UPLOAD,
+    REMEASURED,
+    SUPERSEDED_REASON_COLUMN,
+    latest_mask,
+    latest_readings,
+)
+
+# A re-measurement of WO-1 Char 1 and a duplicate upload of WO-1 Char 2.
+HISTORY = {
+    "job_number": ["WO-1", "WO-1", "WO-1", "WO-1", "WO-2"],
+    "sample_serial_number": "SN-1",
+    "dimension_id": ["Char 1", "Char 1", "Char 2", "Char 2", "Char 1"],
+    "measured_value": [0.5011, 0.5004, 1.2510, 1.2510, 0.5005],
+    "measurement_date": [
+        "2023-02-14",
+        "2023-02-15",
+        "2023-02-14",
+        "2023-02-14",
+        "2023-02-14",
+    ],
+}
+
+
+class TestLatestReadings:
+    """Test suite for keeping the authoritative reading per characteristic."""
+
+    def test_keeps_latest_reading_per_characteristic(self, make_history):
+        """Tests that the latest reading wins and later uploads break ties."""
+        latest, superseded = latest_readings(make_history(**HISTORY))
+        assert latest.index.tolist() == [1, 3, 4]
+        assert superseded.index.tolist() == [0, 2]
+
+    def test_superseded_readings_are_labelled(self, make_history):
+        """Tests that dropped readings are surfaced with their reason."""
+        _, superseded = latest_readings(make_history(**HISTORY))
+        assert superseded[SUPERSEDED_REASON_COLUMN].tolist() == [
+            REMEASURED,
+            DUPLICATE_UPLOAD,
+        ]
+
+    def test_sequence_breaks_timestamp_ties(self, make_history):
+        """Tests that a reading sequence outranks the upload order."""
+        history = make_history(**HISTORY).assign(reading_sequence=[1, 2, 5, 4, 1])
+        latest, superseded = latest_readings(history)
+        assert latest.index.tolist() == [1, 2, 4]
+        assert superseded.loc[3, SUPERSEDED_REASON_COLUMN] == REMEASURED
+
+    def test_categorical_and_missing_keys(self, make_history):
+        """Tests dictionary-encoded keys and rows with a missing key."""
+        history = make_history(**HISTORY)
+        history.loc[4, "job_number"] = None
+        encoded = history.astype({"job_number": "category", "dimension_id": "category"})
+        for frame in [history, encoded]:
+            latest, superseded = latest_readings(frame)
+            assert latest.index.tolist() == [1, 3, 4]
+            assert len(superseded) == 2
+
+    def test_clean_history_is_unchanged(self, make_history):
+        """Tests that a history without repeats passes through untouched."""
+        history = make_history(**HISTORY).iloc[[1, 2, 4]]
+        latest, superseded = latest_readings(history)
+        pd.testing.assert_frame_equal(latest, history)
+        assert superseded.empty
+
+    def test_matches_sort_based_deduplication(self):
+        """Tests the hash-based reduction against a sort and drop_duplicates."""
+        rng = np.random.default_rng(3)
+        size = 5000
+        history = pd.DataFrame(
+            {
+                "job_number": rng.choice(["WO-1", "WO-2", "WO-3"], size),
+                "sample_serial_number": rng.integers(0, 200, size).astype(str),
+                "dimension_id": rng.integers(0, 5, size).astype(str),
+                "measured_value": rng.random(size),
+                "measurement_date": pd.Timestamp("2023-01-01")
+                + pd.to_timedelta(rng.integers(0, 30, size), "D"),
+            }
+        )
+        keys = ["job_number", "sample_serial_number", "dimension_id"]
+        expected = history.sort_values(
+            "measurement_date", kind="stable"
+        ).drop_duplicates(keys, keep="last")
+
+        latest, superseded = latest_readings(history)
+        assert sorted(latest.index) == sorted(expected.index)
+        assert len(latest) + len(superseded) == size
+
+    def test_mask_ranks_only_the_selected_rows(self, make_history):
+        """Tests that rows outside the mask neither win nor get reported."""
+        history = make_history(**HISTORY)
+        rows = np.array([True, False, True, True, True])
+        latest, superseded = latest_mask(history, rows)
+        assert latest.tolist() == [True, False, False, True, True]
+        assert superseded.index.tolist() == [2]
+        expected, _ = latest_readings(history[rows])
+        assert history[latest].index.tolist() == expected.index.tolist()
@@ -0,0 +1,78 @@
+"""Unit tests for the partitioned Parquet measurement store."""
+
+from measurement_store import (
+    data_files,
+    files_for_window,
+    read_measurements,
+    tool_row_counts,
+    write_measurements,
+)
+
+# Two tools over three months.
+HISTORY = {
+    "job_number": ["WO-001", "WO-002", "WO-003", "WO-004"],
+    "measured_value": [0.5005, 1.2510, 3.0001, 0.7511],
+    "tool_id": ["BC1", "BC1", "BC1", "BC2"],
+    "measurement_date": ["2023-01-15", "2023-02-10", "2023-03-05", "2023-02-10"],
+}
+
+
+class TestMeasurementStore:
+    """Test suite for writing and pruned reading of the store."""
+
+    def test_write_creates_tool_and_month_partitions(self, make_history, tmp_path):
+        """Tests that files are laid out by tool and measurement month."""
+        write_measurements(make_history(**HISTORY), tmp_path)
+        assert (tmp_path / "tool_id=BC1" / "measurement_month=2023-02").is_dir()
+        assert (tmp_path / "tool_id=BC2" / "measurement_month=2023-02").is_dir()
+
+    def test_read_filters_window_and_tool(self, make_history, tmp_path):
+        """Tests that only the tool's rows inside the window are returned."""
+        write_measurements(make_history(**HISTORY), tmp_path)
+        df = read_measurements(tmp_path, "2023-02-01", "2023-03-31", "BC1")
+        assert sorted(df["job_number"]) == ["WO-002", "WO-003"]
+
+    def test_window_boundaries_are_inclusive(self, make_history, tmp_path):
+        """Tests that measurements on the start and end dates are kept."""
+        write_measurements(make_history(**HISTORY), tmp_path)
+        df = read_measurements(tmp_path, "2023-01-15", "2023-02-10", "BC1")
+        assert sorted(df["job_number"]) == ["WO-001", "WO-002"]
+
+    def test_one_tool_one_month_prunes_other_files(self, make_history, tmp_path):
+        """Tests that a one-month, one-tool ticket touches one partition."""
+        write_measurements(make_history(**HISTORY), tmp_path)
+        assert files_for_window(tmp_path, "2023-02-01", "2023-02-28", "BC1") == (
+            1,
+            4,
+        )
+
+    def test_appends_accumulate(self, make_history, tmp_path):
+        """Tests that a second write appends rather than overwrites."""
+        write_measurements(make_history(**HISTORY), tmp_path)
+        write_measurements(make_history(**HISTORY), tmp_path)
+        df = read_measurements(tmp_path, "2023-01-01", "2023-12-31")
+        assert len(df) == 8
+
+    def test_read_round_trips_values(self, make_history, tmp_path):
+        """Tests that measured values come back unchanged."""
+        write_measurements(make_history(**HISTORY), tmp_path)
+        df = read_measurements(tmp_path, "2023-01-01", "2023-01-31", "BC1")
+        assert df["measured_value"].tolist() == [0.5005]
+        assert str(df["measurement_date"].iloc[0]) == "2023-01-15"
+
+    def test_tool_row_counts_from_footers(self, make_history, tmp_path):
+        """Tests that per-tool counts add up across month partitions."""
+        write_measurements(make_history(**HISTORY), tmp_path)
+        assert tool_row_counts(tmp_path) == {"BC1": 3, "BC2": 1}
+
+    def test_read_only_the_given_files(self, make_history, tmp_path):
+        """Tests that a file list restricts the read to rows added since."""
+        write_measurements(make_history(**HISTORY), tmp_path)
+        before = data_files(tmp_path)
+        write_measurements(make_history(**HISTORY).iloc[[1]], tmp_path)
+        added = [name for name in data_files(tmp_path) if name not in before]
+        assert len(added) == 1
+        df = read_measurements(tmp_path, "2023-01-01", "2023-12-31", files=added)
+        assert df["job_number"].tolist() == ["WO-002"]
+        df = read_measurements(tmp_path, "2023-01-01", "2023-12-31", files=[])
+        assert len(df) == 0 and "measured_value" in df.columns
@@ -0,0 +1,80 @@
+"""Unit tests for the Monte Carlo probability of nonconformance."""
+
+import math
+
+import numpy as np
+import pytest
+from monte_carlo import (
+    SEED_BLOCK_ROWS,
+    probability_of_nonconformance,
+)
+
+
+def normal_tail(z):
+    """Returns P(Z > z) for a standard normal variable."""
+    return 0.5 * math.erfc(z / math.sqrt(2.0))
+
+
+class TestProbabilityOfNonconformance:
+    """Test suite for the vectorized Monte Carlo simulation."""
+
+    def test_zero_uncertainty_matches_exact_decision(self):
+        """Tests that an exact deviation gives probabilities of 0 or 1."""
+        probabilities = probability_of_nonconformance(
+            [0.5005, 0.5008], [0.4990, 0.4990], [0.5010, 0.5010], -0.0004, 0.0
+        )
+        assert probabilities.tolist() == [0.0, 1.0]
+
+    def test_matches_normal_tail_probability(self):
+        """Tests the simulated probability against the analytic normal tail."""
+        probabilities = probability_of_nonconformance(
+            [0.5005], [0.4990], [0.5010], -0.0003, 0.0002, draws=200_000, seed=7
+        )
+        expected = normal_tail(0.0002 / 0.0002)
+        assert probabilities[0] == pytest.approx(expected, abs=0.005)
+
+    def test_repeatability_adds_spread(self):
+        """Tests that gauge repeatability raises a marginal part's risk."""
+        kwargs = dict(draws=20_000, seed=3)
+        without = probability_of_nonconformance(
+            [0.5005], [0.4990], [0.5010], -0.0003, 0.0001, **kwargs
+        )
+        with_rep = probability_of_nonconformance(
+            [0.5005],
+            [0.4990],
+            [0.5010],
+            -0.0003,
+            0.0001,
+            repeatability=0.0002,
+            **kwargs,
+        )
+        assert with_rep[0] > without[0]
+
+    def test_seeded_results_are_reproducible(self):
+        """Tests that results ignore the worker count and memory budget."""
+        rows = 2 * SEED_BLOCK_ROWS + 10
+        measured = np.linspace(0.4985, 0.5015, rows)
+        lower = np.full(rows, 0.4990)
+        upper = np.full(rows, 0.5010)
+        single = probability_of_nonconformance(
+            measured, lower, upper, -0.0002, 0.0002, draws=64, seed=11, workers=1
+        )
+        pooled = probability_of_nonconformance(
+            measured,
+            lower,
+            upper,
+            -0.0002,
+            0.0002,
+            draws=64,
+            seed=11,
+            workers=2,
+            memory_budget_bytes=1024**2,
+        )
+        assert np.array_equal(single, pooled)
+
+    def test_unknown_distribution_is_rejected(self):
+        """Tests that an unsupported distribution raises ValueError."""
+        with pytest.raises(ValueError):
+            probability_of_nonconformance(
+                [0.5], [0.49], [0.51], 0.0, 0.0001, distribution="triangular"
+            )
@@ -0,0 +1,226 @@
+"""Unit tests for the Block 7 evaluation engines."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from oot_engine import (
+    FAIL_LABEL,
+    PASS_LABEL,
+    STATUS_FAIL,
+    STATUS_PASS,
+    ErrorCurve,
+    encode_categories,
+    evaluate_fixed_point,
+    evaluate_numpy,
+    fixed_point_scale,
+    memory_footprint,
+    render_labels,
+    spark_fixed_point,
+    to_fixed_point,
+)
+
+# A KC, a feature without a criticality and a minor feature.
+MEASUREMENTS = {
+    "measured_value": [0.5005, 3.0001, 0.7511],
+    "nominal_value": [0.5000, 3.0000, 0.7500],
+    "original_upper_tol": [0.5010, 3.0005, 0.7510],
+    "original_lower_tol": [0.4990, 2.9995, 0.7490],
+    "criticality": ["Critical", "NotSpecified", "Minor"],
+}
+
+# Values exactly half a step of 0.5 apart, with the half-to-even step both
+# fixed-point engines must give.
+TIE_RESOLUTION = "0.5"
+HALF_STEP_TIES = [(0.25, 0), (0.75, 2), (1.25, 2), (-0.25, 0), (-0.75, -2)]
+
+
+class TestNumpyEngine:
+    """Test suite for the NumPy evaluation engine."""
+
+    def test_scalar_deviation_adjusts_every_row(self, make_history):
+        """Tests that a scalar deviation is subtracted from every row."""
+        result = evaluate_numpy(make_history(**MEASUREMENTS), -0.0015)
+        expected = [0.5020, 3.0016, 0.7526]
+        assert result["adjusted_value"].tolist() == pytest.approx(expected)
+
+    def test_allowance_only_for_non_kc_features(self, make_history):
+        """Tests that only non-KC features get the 20% allowance."""
+        result = evaluate_numpy(make_history(**MEASUREMENTS), 0.0)
+        assert result["allowance_eligible"].tolist() == [False, True, True]
+        assert result["expanded_upper_tol"].tolist() == pytest.approx(
+            [0.5010, 3.0006, 0.7512]
+        )
+
+    def test_final_status_uses_expanded_limits(self, make_history):
+        """Tests that a part inside its expanded band passes."""
+        result = evaluate_numpy(make_history(**MEASUREMENTS), 0.0)
+        assert result["final_status"].tolist() == [
+            STATUS_PASS,
+            STATUS_PASS,
+            STATUS_PASS,
+        ]
+        result = evaluate_numpy(make_history(**MEASUREMENTS), -0.0015)
+        assert (result["final_status"] == STATUS_FAIL).all()
+
+
+class TestCompactColumns:
+    """Test suite for flag result columns and dictionary-encoded text."""
+
+    def test_result_flags_are_compact(self, make_history):
+        """Tests that status and allowance are stored as int8 and bool."""
+        for evaluate in [evaluate_numpy, evaluate_fixed_point]:
+            result = evaluate(make_history(**MEASUREMENTS), -0.0015)
+            assert result["final_status"].dtype == np.int8
+            assert result["allowance_eligible"].dtype == bool
+
+    def test_render_labels_for_reports(self, make_history):
+        """Tests that flags are rendered back to the report labels."""
+        result = evaluate_numpy(make_history(**MEASUREMENTS), 0.0)
+        result.loc[2, "final_status"] = STATUS_FAIL
+        labels = render_labels(result)
+        assert labels["allowance_eligible"].tolist() == ["NO - KC", "YES", "YES"]
+        assert labels["final_status"].tolist() == [PASS_LABEL, PASS_LABEL, FAIL_LABEL]
+
+    def test_encoded_text_evaluates_identically(self, make_history):
+        """Tests that categorical criticality gives the same results."""
+        df = pd.concat([make_history(**MEASUREMENTS)] * 50, ignore_index=True)
+        df["job_number"] = "WO-001"
+        encoded = encode_categories(df)
+        assert isinstance(encoded["criticality"].dtype, pd.CategoricalDtype)
+        assert memory_footprint(encoded) < memory_footprint(df)
+        assert encode_categories(encoded) is encoded
+        expected = evaluate_numpy(df, -0.0015)
+        result = evaluate_numpy(encoded, -0.0015)
+        assert result["final_status"].tolist() == expected["final_status"].tolist()
+        assert (
+            result["allowance_eligible"].tolist()
+            == expected["allowance_eligible"].tolist()
+        )
+
+
+class TestErrorCurve:
+    """Test suite for size-dependent deviation correction."""
+
+    def test_interpolates_between_check_points(self):
+        """Tests linear interpolation between certificate check points."""
+        curve = ErrorCurve([0.0, 1.0, 2.0], [0.0, -0.0010, -0.0020])
+        assert curve.at([0.5, 1.5]) == pytest.approx([-0.0005, -0.0015])
+
+    def test_holds_end_values_outside_curve(self):
+        """Tests that sizes beyond the check points use the end errors."""
+        curve = ErrorCurve([1.0, 2.0], [-0.0010, -0.0020])
+        assert curve.at([0.1, 6.0]) == pytest.approx([-0.0010, -0.0020])
+
+    def test_unsorted_check_points_are_sorted(self):
+        """Tests that check points may be listed in any order."""
+        curve = ErrorCurve([2.0, 0.0, 1.0], [-0.0020, 0.0, -0.0010])
+        assert curve.nominals.tolist() == [0.0, 1.0, 2.0]
+        assert curve.at([1.5]) == pytest.approx([-0.0015])
+
+    def test_duplicate_check_points_are_rejected(self):
+        """Tests that an ambiguous curve raises ValueError."""
+        with pytest.raises(ValueError):
+            ErrorCurve([1.0, 1.0], [-0.0010, -0.0020])
+
+    def test_bounds_include_interior_check_points(self):
+        """Tests that bounds cover a peak between the interval ends."""
+        curve = ErrorCurve([0.0, 1.0, 2.0], [0.0, -0.0015, 0.0])
+        assert curve.bounds(0.5, 1.5) == pytest.approx((-0.0015, -0.00075))
+
+    def test_engine_applies_size_dependent_deviation(self, make_history):
+        """Tests that each row is corrected by the error at its own size."""
+        curve = ErrorCurve([0.0, 1.0, 4.0], [0.0, -0.0010, -0.0040])
+        result = evaluate_numpy(make_history(**MEASUREMENTS), curve)
+        measured = make_history(**MEASUREMENTS)["measured_value"].to_numpy()
+        expected = measured - np.interp(measured, [0.0, 1.0, 4.0], [0, -0.001, -0.004])
+        assert result["adjusted_value"].to_numpy() == pytest.approx(expected)
+
+
+class TestFixedPointEngine:
+    """Test suite for fixed-point integer evaluation."""
+
+    def test_scale_from_resolution(self):
+        """Tests that the resolution converts to an integer scale."""
+        assert fixed_point_scale("0.0000001") == 10_000_000
+        assert fixed_point_scale("0.0001") == 10_000
+
+    def test_scale_rejects_uneven_resolution(self):
+        """Tests that a resolution that does not divide one unit is rejected."""
+        with pytest.raises(ValueError):
+            fixed_point_scale("0.3")
+
+    def test_to_fixed_point_is_exact_for_recorded_decimals(self):
+        """Tests that recorded decimal values scale to exact integers."""
+        steps = to_fixed_point([0.5005, 0.1001, 1.2345678])
+        assert steps.dtype == np.int64
+        assert steps.tolist() == [5_005_000, 1_001_000, 12_345_678]
+
+    def test_ties_round_half_to_even(self):
+        """Tests that values half a step apart round to the even step."""
+        values, expected = zip(*HALF_STEP_TIES)
+        steps = to_fixed_point(values, TIE_RESOLUTION)
+        assert steps.tolist() == list(expected)
+
+    def test_spark_ties_match_numpy(self):
+        """Tests that the Spark engine rounds the same tie cases."""
+        pytest.importorskip("pyspark")
+        from pyspark.sql import SparkSession
+        from pyspark.sql.functions import col
+
+        spark = SparkSession.builder.master("local[1]").getOrCreate()
+        values, expected = zip(*HALF_STEP_TIES)
+        df = spark.createDataFrame([(float(v),) for v in values], ["value"])
+        scale = fixed_point_scale(TIE_RESOLUTION)
+        steps = df.select(spark_fixed_point(col("value"), scale)).collect()
+        assert [row[0] for row in steps] == list(expected)
+
+    def test_part_exactly_on_limit_passes(self):
+        """Tests that a part adjusted exactly onto its limit passes.
+
+        In binary floating point 0.1000 + 0.0001 lands just above 0.1001,
+        so the float engine fails a part the fixed-point engine passes.
+        """
+        df = pd.DataFrame(
+            {
+                "measured_value": [0.1000],
+                "nominal_value": [0.1000],
+                "original_upper_tol": [0.1001],
+                "original_lower_tol": [0.0999],
+                "criticality": ["Critical"],
+            }
+        )
+        assert evaluate_numpy(df, -0.0001)["final_status"].iloc[0] == STATUS_FAIL
+        result = evaluate_fixed_point(df, -0.0001)
+        assert result["final_status"].iloc[0] == STATUS_PASS
+        assert result["adjusted_value"].iloc[0] == 0.1001
+
+    def test_matches_float_engine_away_from_limits(self, make_history):
+        """Tests that both modes agree when no part sits on a limit."""
+        for deviation in [-0.0015, -0.0003, 0.0, 0.0004]:
+            float_result = evaluate_numpy(make_history(**MEASUREMENTS), deviation)
+            fixed_result = evaluate_fixed_point(make_history(**MEASUREMENTS), deviation)
+            assert (
+                float_result["final_status"].tolist()
+                == fixed_result["final_status"].tolist()
+            )
+
+    def test_allowance_is_never_widened_by_rounding(self):
+        """Tests that an uneven allowance is truncated toward the limit."""
+        df = pd.DataFrame(
+            {
+                "measured_value": [1.0],
+                "nominal_value": [1.0],
+                "original_upper_tol": [1.0000003],
+                "original_lower_tol": [0.9999997],
+                "criticality": ["Minor"],
+            }
+        )
+        result = evaluate_fixed_point(df, 0.0)
+        assert result["expanded_upper_tol"].iloc[0] == 1.0000003
+        assert result["expanded_lower_tol"].iloc[0] == 0.9999997
+
+    def test_error_curve_in_fixed_point(self, make_history):
+        """Tests that a size-dependent deviation is applied in steps."""
+        curve = ErrorCurve([0.0, 1.0], [0.0, -0.0010])
+        result = evaluate_fixed_point(make_history(**MEASUREMENTS).iloc[:1], curve)
+        assert result["adjusted_value"].iloc[0] == pytest.approx(0.5010005)
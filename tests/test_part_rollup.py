@@ -0,0 +1,78 @@
+"""Unit tests for the part-level disposition rollup."""
+
+import pytest
+from allowance_rules import AllowanceRules
+from oot_engine import STATUS_FAIL, encode_categories
+from part_rollup import ROLLUP_COLUMNS, part_reading_counts, rollup_parts
+
+# Two parts: SN-1 fails on a KC and a minor feature.
+PARTS = {
+    "sample_serial_number": ["SN-1", "SN-1", "SN-1", "SN-2"],
+    "job_number": ["WO-1", "WO-1", "WO-1", "WO-2"],
+    "dimension_id": ["Char 1", "Char 2", "Char 3", "Char 1"],
+    "measured_value": [0.5012, 0.7515, 1.0000, 0.5001],
+    "nominal_value": [0.5000, 0.7500, 1.0000, 0.5000],
+    "original_upper_tol": [0.5010, 0.7510, 1.0010, 0.5010],
+    "original_lower_tol": [0.4990, 0.7490, 0.9990, 0.4990],
+    "criticality": ["Critical", "Minor", "Major", "Critical"],
+}
+
+
+class TestPartRollup:
+    """Test suite for rolling characteristics up to parts."""
+
+    def test_one_row_per_part(self, make_evaluated):
+        """Tests that the rollup has one record per (job, serial)."""
+        parts = rollup_parts(make_evaluated(**PARTS))
+        assert list(parts.columns) == ROLLUP_COLUMNS
+        assert parts["sample_serial_number"].tolist() == ["SN-1", "SN-2"]
+        assert parts["evaluated_dimensions"].tolist() == [3, 1]
+
+    def test_counts_failing_and_kc_dimensions(self, make_evaluated):
+        """Tests the failing and KC failing dimension counts."""
+        parts = rollup_parts(make_evaluated(**PARTS)).set_index("sample_serial_number")
+        assert parts.loc["SN-1", "failing_dimensions"] == 2
+        assert parts.loc["SN-1", "kc_failing_dimensions"] == 1
+        assert parts.loc["SN-2", "failing_dimensions"] == 0
+
+    def test_highest_failing_criticality(self, make_evaluated):
+        """Tests that only failing characteristics set the criticality."""
+        parts = rollup_parts(make_evaluated(**PARTS)).set_index("sample_serial_number")
+        assert parts.loc["SN-1", "highest_failing_criticality"] == "Critical"
+        assert parts.loc["SN-2", "highest_failing_criticality"] is None
+
+    def test_worst_exceedance_characteristic(self, make_evaluated):
+        """Tests that the worst characteristic and its exceedance are reported."""
+        parts = rollup_parts(make_evaluated(**PARTS)).set_index("sample_serial_number")
+        assert parts.loc["SN-1", "worst_dimension"] == "Char 2"
+        assert parts.loc["SN-1", "worst_exceedance"] == pytest.approx(0.0003)
+        assert parts.loc["SN-2", "worst_exceedance"] == pytest.approx(-0.0009)
+
+    def test_categorical_keys_and_filtered_index(self, make_evaluated):
+        """Tests categorical inputs and a non-default index (e.g. after pruning)."""
+        evaluated = encode_categories(make_evaluated(**PARTS)).iloc[[1, 3]]
+        parts = rollup_parts(evaluated)
+        assert parts["worst_dimension"].tolist() == ["Char 2", "Char 1"]
+        assert parts["failing_dimensions"].tolist() == [1, 0]
+
+    def test_kc_count_follows_criticality_not_allowance(self, make_evaluated):
+        """Tests that a minor feature without an allowance is not counted as KC."""
+        rules = AllowanceRules([{"allowance": 0}])
+        parts = rollup_parts(make_evaluated(0.0, rules, **PARTS))
+        parts = parts.set_index("sample_serial_number")
+        assert parts.loc["SN-1", "failing_dimensions"] == 2
+        assert parts.loc["SN-1", "kc_failing_dimensions"] == 1
+
+    def test_failures_with_reading_counts_match_the_full_rollup(
+        self, make_history, make_evaluated
+    ):
+        """Tests that rolling up only the failures loses nothing for NC parts."""
+        evaluated = make_evaluated(**PARTS)
+        failures = encode_categories(evaluated)
+        failures = failures[failures["final_status"] == STATUS_FAIL]
+        counts = part_reading_counts(encode_categories(make_history(**PARTS)))
+        parts = rollup_parts(failures, counts)
+        full = rollup_parts(evaluated)
+        full = full[full["failing_dimensions"] > 0].reset_index(drop=True)
+        assert list(parts.columns) == ROLLUP_COLUMNS
+        assert parts.astype(object).equals(full.astype(object))
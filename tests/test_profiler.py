@@ -0,0 +1,83 @@
+"""Unit tests for the opt-in run profiler."""
+
+import os
+import time
+
+from profiler import (
+    COLLAPSED_SUFFIX,
+    HOTSPOT_COLUMNS,
+    HOTSPOTS_SUFFIX,
+    CProfileProfiler,
+    SamplingProfiler,
+    run_profiler,
+    write_profile,
+)
+
+
+def busy_loop(seconds):
+    """Burns CPU for a while so it shows up in the samples."""
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(100))
+    return total
+
+
+class TestSamplingProfiler:
+    """Test suite for the stack-sampling profiler."""
+
+    def test_samples_running_function(self):
+        """Tests that the function on the stack dominates the samples."""
+        with SamplingProfiler(interval=0.001) as profiler:
+            busy_loop(0.2)
+        assert profiler.samples > 0
+        assert any("busy_loop" in line for line in profiler.collapsed())
+
+        hotspots = profiler.hotspots()
+        assert list(hotspots.columns) == HOTSPOT_COLUMNS
+        busy = hotspots[hotspots["function"].str.startswith("busy_loop")]
+        assert busy["total_pct"].iloc[0] > 50
+
+    def test_collapsed_format(self):
+        """Tests that lines are root-first stacks followed by a count."""
+        with SamplingProfiler(interval=0.001) as profiler:
+            busy_loop(0.05)
+        for line in profiler.collapsed():
+            stack, count = line.rsplit(" ", 1)
+            assert int(count) > 0
+            assert stack.split(";")[-1]
+
+    def test_stop_ends_sampling(self):
+        """Tests that no samples are taken after stop."""
+        profiler = SamplingProfiler(interval=0.001).start()
+        busy_loop(0.02)
+        profiler.stop()
+        samples = profiler.samples
+        busy_loop(0.02)
+        assert profiler.samples == samples
+
+
+class TestCProfileFallback:
+    """Test suite for the cProfile fallback and output files."""
+
+    def test_cprofile_outputs(self):
+        """Tests that the fallback produces caller;callee lines and hotspots."""
+        profiler = run_profiler("cprofile")
+        assert isinstance(profiler, CProfileProfiler)
+        with profiler:
+            busy_loop(0.05)
+        assert any("busy_loop" in line for line in profiler.collapsed())
+        assert profiler.hotspots(5)["function"].str.contains("busy_loop").any()
+
+    def test_write_profile(self, tmp_path):
+        """Tests that both files are written next to each other."""
+        with run_profiler(interval=0.001) as profiler:
+            busy_loop(0.05)
+        prefix = os.path.join(str(tmp_path), "runs", "QUALITY-1-20240101-000000")
+        collapsed_path, hotspots_path = write_profile(profiler, prefix, top_n=3)
+        assert collapsed_path == prefix + COLLAPSED_SUFFIX
+        assert hotspots_path == prefix + HOTSPOTS_SUFFIX
+        with open(hotspots_path) as f:
+            assert "self_samples" in f.read()
+        with open(collapsed_path) as f:
+            assert "busy_loop" in f.read()
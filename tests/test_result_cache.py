@@ -0,0 +1,100 @@
+"""Unit tests for memoized ticket results."""
+
+import os
+import time
+
+import pandas as pd
+from result_cache import ResultCache, content_hash, result_key, snapshot_id
+
+
+def make_key(**overrides):
+    """Builds a result key with default ticket inputs."""
+    inputs = {
+        "pdf_hash": content_hash(b"%PDF-1.4 certificate"),
+        "deviation": -0.0015,
+        "tool_id": "BC1",
+        "window": ("2023-01-01", "2023-12-31"),
+        "rule_version": "1",
+        "data_snapshot": "snap-1",
+    }
+    inputs.update(overrides)
+    return result_key(**inputs)
+
+
+def make_failures():
+    """Builds a small failure list."""
+    return pd.DataFrame({"sample_serial_number": ["SN-1"], "final_status": [1]})
+
+
+class TestResultKey:
+    """Test suite for cache keys and data snapshots."""
+
+    def test_key_changes_with_any_input(self):
+        """Tests that every keyed input produces a different key."""
+        base = make_key()
+        assert make_key() == base
+        for name, value in [
+            ("pdf_hash", content_hash(b"other")),
+            ("deviation", -0.0010),
+            ("tool_id", "BC2"),
+            ("window", ("2023-02-01", "2023-12-31")),
+            ("rule_version", "2"),
+            ("data_snapshot", "snap-2"),
+        ]:
+            assert make_key(**{name: value}) != base
+
+    def test_snapshot_changes_when_data_is_appended(self, tmp_path):
+        """Tests that adding a file to a store changes its snapshot id."""
+        (tmp_path / "part-0.parquet").write_bytes(b"rows")
+        before = snapshot_id(tmp_path)
+        assert snapshot_id(tmp_path) == before
+        (tmp_path / "part-1.parquet").write_bytes(b"more rows")
+        assert snapshot_id(tmp_path) != before
+
+
+class TestResultCache:
+    """Test suite for storing, serving and evicting results."""
+
+    def test_miss_then_hit(self, tmp_path):
+        """Tests that a stored result is served with the cache marker."""
+        cache = ResultCache(tmp_path)
+        key = make_key()
+        assert cache.get(key) is None
+        cache.put(key, {"failure_count": 1}, make_failures(), {"report.txt": "SN-1"})
+        result = cache.get(key)
+        assert result["served_from_cache"] is True
+        assert result["summary"] == {"failure_count": 1}
+        assert result["failures"]["sample_serial_number"].tolist() == ["SN-1"]
+        assert result["artifacts"] == {"report.txt": "SN-1"}
+
+    def test_result_without_failures(self, tmp_path):
+        """Tests that an all-clear result is cached too."""
+        cache = ResultCache(tmp_path)
+        cache.put(make_key(), {"failure_count": 0})
+        result = cache.get(make_key())
+        assert result["failures"] is None
+        assert result["artifacts"] == {}
+
+    def test_evicts_least_recently_used_over_budget(self, tmp_path):
+        """Tests size-based eviction of the least recently used entries."""
+        cache = ResultCache(tmp_path, max_bytes=10**9)
+        keys = [make_key(tool_id=f"BC{i}") for i in range(3)]
+        for key in keys:
+            cache.put(key, {"failure_count": 0}, artifacts={"r.txt": "x" * 1000})
+            time.sleep(0.01)
+        cache.get(keys[0])
+        entry_size = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(tmp_path / keys[0])
+            for name in names
+        )
+        cache.max_bytes = 2 * entry_size + entry_size // 2
+        assert cache.evict() == [keys[1]]
+        assert sorted(cache.keys()) == sorted([keys[0], keys[2]])
+
+    def test_no_partial_entries_are_visible(self, tmp_path):
+        """Tests that staging directories are not listed as entries."""
+        cache = ResultCache(tmp_path)
+        (tmp_path / ".staging-abc").mkdir()
+        (tmp_path / ".staging-abc" / "entry.json").write_text("{}")
+        assert cache.keys() == []
@@ -0,0 +1,62 @@
+"""Unit tests for skew-aware join planning."""
+
+from skew_join import estimate_task_rows, plan_tool_join, skew_summary
+
+
+def make_counts():
+    """Builds a fleet where two calipers hold most of the measurements."""
+    counts = {f"GAUGE-{i:03d}": 1_000 for i in range(200)}
+    counts["CAL-1"] = 400_000
+    counts["CAL-2"] = 150_000
+    return counts
+
+
+class TestPlanToolJoin:
+    """Test suite for detecting and splitting hot tools."""
+
+    def test_only_hot_tools_are_salted(self):
+        """Tests that tools above an even task's share are split."""
+        plan = plan_tool_join(make_counts(), num_tasks=32)
+        assert sorted(plan) == ["CAL-1", "CAL-2"]
+        # 750,000 rows over 32 tasks is a share of 23,438 rows.
+        assert plan == {"CAL-1": 18, "CAL-2": 7}
+
+    def test_even_fleet_needs_no_salt(self):
+        """Tests that evenly used tools are joined directly."""
+        counts = {f"GAUGE-{i}": 1_000 for i in range(100)}
+        assert plan_tool_join(counts, num_tasks=32) == {}
+        assert plan_tool_join({}, num_tasks=32) == {}
+
+    def test_splits_are_capped(self):
+        """Tests that a tool is never split into more than max_splits keys."""
+        plan = plan_tool_join(make_counts(), num_tasks=400, max_splits=8)
+        assert plan["CAL-1"] == 8
+
+    def test_salting_removes_stragglers(self):
+        """Tests that the largest task shrinks once the hot tools are salted."""
+        counts = make_counts()
+        plain = skew_summary(estimate_task_rows(counts, {}, 32))
+        plan = plan_tool_join(counts, num_tasks=32)
+        salted = skew_summary(estimate_task_rows(counts, plan, 32))
+        assert plain["max_rows"] >= 400_000
+        assert salted["max_rows"] < plain["max_rows"] / 4
+        assert salted["skew"] < plain["skew"]
+
+    def test_estimate_keeps_every_row(self):
+        """Tests that salting redistributes rows without losing any."""
+        counts = make_counts()
+        plan = plan_tool_join(counts, num_tasks=32)
+        assert sum(estimate_task_rows(counts, plan, 32)) == sum(counts.values())
+
+
+class TestSkewSummary:
+    """Test suite for the per-task row count summary."""
+
+    def test_summary(self):
+        """Tests max, median and skew of the non-empty tasks."""
+        summary = skew_summary([10, 0, 30, 20])
+        assert summary == {"tasks": 4, "max_rows": 30, "median_rows": 20, "skew": 1.5}
+
+    def test_empty(self):
+        """Tests that a join without rows is reported as even."""
+        assert skew_summary([0, 0])["skew"] == 1.0
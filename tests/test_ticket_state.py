@@ -0,0 +1,157 @@
+"""Unit tests for incremental re-analysis of open tickets."""
+
+import numpy as np
+import pandas as pd
+from oot_engine import STATUS_FAIL, evaluate_numpy
+from ticket_state import TicketState, analysis_signature
+
+# One tool's readings logged over three days.
+HISTORY = {
+    "job_number": ["WO-1", "WO-1", "WO-2", "WO-3"],
+    "sample_serial_number": ["SN-1", "SN-1", "SN-2", "SN-3"],
+    "dimension_id": ["Char 1", "Char 2", "Char 1", "Char 1"],
+    "measured_value": [0.5012, 0.5001, 0.5002, 0.5013],
+    "measurement_date": ["2023-03-01", "2023-03-01", "2023-03-02", "2023-03-03"],
+}
+
+
+def run(state, history):
+    """Evaluates the new rows of one run and folds them into the state."""
+    evaluated = evaluate_numpy(state.new_rows(history), 0.0)
+    failures = evaluated[evaluated["final_status"] == STATUS_FAIL]
+    state.add_failures(failures if len(failures) else None, evaluated)
+    state.advance(evaluated)
+    return evaluated
+
+
+class TestTicketState:
+    """Test suite for watermarks and merged results."""
+
+    def test_first_run_evaluates_everything(self, make_history):
+        """Tests that a new ticket has no watermark."""
+        state = TicketState("Q-1", "sig")
+        assert len(state.new_rows(make_history(**HISTORY))) == 4
+
+    def test_rerun_only_evaluates_new_rows(self, make_history):
+        """Tests that a rerun skips rows evaluated before."""
+        history = make_history(**HISTORY)
+        state = TicketState("Q-1", "sig")
+        run(state, history.iloc[:3])
+        assert state.evaluated_rows == 3
+        evaluated = run(state, history)
+        assert evaluated["sample_serial_number"].tolist() == ["SN-3"]
+        assert state.evaluated_rows == 4
+
+    def test_late_rows_on_the_same_date_are_picked_up(self, make_history):
+        """Tests that a row logged later on an evaluated date is evaluated."""
+        history = make_history(**HISTORY)
+        state = TicketState("Q-1", "sig")
+        run(state, history.iloc[[0, 2]])
+        evaluated = run(state, history.iloc[[0, 2]])
+        assert evaluated["dimension_id"].tolist() == []
+        late = history.iloc[[2]].assign(dimension_id="Char 7")
+        evaluated = run(state, pd.concat([history.iloc[[0, 2]], late]))
+        assert evaluated["dimension_id"].tolist() == ["Char 7"]
+
+    def test_failures_merge_across_runs(self, make_history):
+        """Tests that the failure list and count accumulate."""
+        history = make_history(**HISTORY)
+        state = TicketState("Q-1", "sig")
+        run(state, history.iloc[:2])
+        run(state, history)
+        assert state.failure_count == 2
+        assert state.failures["sample_serial_number"].tolist() == ["SN-1", "SN-3"]
+
+    def test_late_record_dated_before_evaluated_rows(self, make_history):
+        """Tests that a record arriving late with an old date is evaluated."""
+        history = make_history(**HISTORY)
+        state = TicketState("Q-1", "sig")
+        run(state, history)
+        late = history.iloc[[0]].assign(
+            job_number="WO-9",
+            sample_serial_number="SN-9",
+            measurement_date="2023-01-15",
+        )
+        evaluated = run(state, pd.concat([history, late], ignore_index=True))
+        assert evaluated["sample_serial_number"].tolist() == ["SN-9"]
+        assert state.failure_count == 3
+        assert state.evaluated_rows == 5
+
+    def test_passing_remeasurement_replaces_failure(self, make_history):
+        """Tests that a re-measured reading replaces its stored failure."""
+        history = make_history(**HISTORY)
+        state = TicketState("Q-1", "sig")
+        run(state, history.iloc[[0]])
+        assert state.failure_count == 1
+        remeasured = history.iloc[[0]].assign(
+            measured_value=0.5004, measurement_date="2023-03-04"
+        )
+        run(state, remeasured)
+        assert state.failure_count == 0
+        assert state.evaluated_rows == 1
+
+    def test_failing_remeasurement_is_one_failure(self, make_history):
+        """Tests that a failure re-measured as failing is stored once."""
+        history = make_history(**HISTORY)
+        state = TicketState("Q-1", "sig")
+        run(state, history.iloc[[0]])
+        run(state, history.iloc[[0]].assign(measurement_date="2023-03-04"))
+        assert state.failure_count == 1
+        assert state.failures["measurement_date"].tolist() == ["2023-03-04"]
+
+    def test_save_and_load_round_trip(self, make_history, tmp_path):
+        """Tests that a saved state resumes from its watermark."""
+        history = make_history(**HISTORY)
+        state = TicketState("Q-1", "sig")
+        run(state, history.iloc[:3])
+        state.save(tmp_path)
+        loaded = TicketState.load(tmp_path, "Q-1", "sig")
+        assert loaded.failure_count == 1
+        assert loaded.evaluated_rows == 3
+        assert len(loaded.new_rows(history)) == 1
+
+    def test_changed_inputs_discard_state(self, tmp_path):
+        """Tests that a different analysis signature forces a full run."""
+        TicketState("Q-1", analysis_signature({"deviation": -0.0015})).save(tmp_path)
+        signature = analysis_signature({"deviation": -0.0010})
+        assert TicketState.load(tmp_path, "Q-1", signature) is None
+        assert TicketState.load(tmp_path, "Q-2", signature) is None
+
+    def test_new_row_mask_matches_new_rows(self, make_history):
+        """Tests that the mask marks the same rows and respects ``rows``."""
+        history = make_history(**HISTORY)
+        state = TicketState("Q-1", "sig")
+        run(state, history.iloc[:2])
+        new = state.new_row_mask(history)
+        assert history[new].index.tolist() == state.new_rows(history).index.tolist()
+        rows = np.array([True, True, True, False])
+        assert state.new_row_mask(history, rows).tolist() == [False, False, True, False]
+
+    def test_older_duplicate_of_an_evaluated_reading_is_skipped(self, make_history):
+        """Tests that a late upload older than the evaluated reading is skipped."""
+        history = make_history(**HISTORY)
+        state = TicketState("Q-1", "sig")
+        run(state, history.iloc[[2]])
+        stale = history.iloc[[2]].assign(measurement_date="2023-03-01")
+        assert len(state.new_rows(stale)) == 0
+
+    def test_empty_evaluated_frame(self, make_history):
+        """Tests that a run evaluating no rows leaves the state unchanged."""
+        history = make_history(**HISTORY)
+        state = TicketState("Q-1", "sig")
+        run(state, history)
+        evaluated = run(state, history)
+        assert len(evaluated) == 0
+        assert state.failure_count == 2
+        assert state.evaluated_rows == 4
+
+    def test_unread_files_follow_the_ingestion_watermark(self, make_history, tmp_path):
+        """Tests that only the store files ingested since the last run are read."""
+        state = TicketState("Q-1", "sig")
+        assert state.unread_files(["a.parquet"]) is None
+        evaluated = run(state, make_history(**HISTORY))
+        state.advance(evaluated, files=["a.parquet"])
+        state.save(tmp_path)
+        loaded = TicketState.load(tmp_path, "Q-1", "sig")
+        assert loaded.ingested_files == ["a.parquet"]
+        assert loaded.unread_files(["a.parquet", "b.parquet"]) == ["b.parquet"]
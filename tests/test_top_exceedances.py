@@ -0,0 +1,98 @@
+"""Unit tests for the streaming top-K exceedance operator."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from oot_engine import evaluate_numpy
+from top_exceedances import TopExceedances, top_exceedances
+
+
+@pytest.fixture
+def evaluated(make_evaluated):
+    """Evaluates a random history spread over three criticalities."""
+    rows = 200
+    rng = np.random.default_rng(7)
+    return make_evaluated(
+        -0.0005,
+        job_number=[f"WO-{i // 10:03d}" for i in range(rows)],
+        sample_serial_number=[f"SN-{i:04d}" for i in range(rows)],
+        measured_value=0.5 + rng.normal(0.0, 0.0008, rows),
+        criticality=rng.choice(["Critical", "Major", "Minor"], rows),
+        quantity=rng.integers(1, 100, rows),
+    )
+
+
+def full_sort_top(evaluated, k):
+    """Reference answer: sorts every failure and takes the head."""
+    adjusted = evaluated["adjusted_value"]
+    exceedance = np.maximum(
+        adjusted - evaluated["expanded_upper_tol"],
+        evaluated["expanded_lower_tol"] - adjusted,
+    )
+    frame = evaluated.assign(score=exceedance * evaluated["quantity"])
+    frame = frame[frame["score"] > 0]
+    return {
+        label: group.nlargest(k, "score")["sample_serial_number"].tolist()
+        for label, group in frame.groupby("criticality")
+    }
+
+
+class TestTopExceedances:
+    """Test suite for bounded per-criticality heaps."""
+
+    def test_matches_full_sort(self, evaluated):
+        """Tests that the heaps keep the same rows as a full sort."""
+        result = top_exceedances(evaluated, 5)
+        expected = full_sort_top(evaluated, 5)
+        for label, serials in expected.items():
+            kept = result[result["criticality"] == label]
+            assert kept["sample_serial_number"].tolist() == serials
+
+    def test_chunked_input_matches_single_pass(self, evaluated):
+        """Tests that chunking does not change the result."""
+        blocks = np.arange(len(evaluated)) // 17
+        chunks = [chunk for _, chunk in evaluated.groupby(blocks)]
+        single = top_exceedances(evaluated, 3)
+        chunked = top_exceedances(chunks, 3)
+        pd.testing.assert_frame_equal(single, chunked)
+
+    def test_merge_of_partitions(self, evaluated):
+        """Tests that merging per-partition heaps equals one pass."""
+        left = TopExceedances(3).update(evaluated.iloc[:120])
+        right = TopExceedances(3).update(evaluated.iloc[120:])
+        merged = left.merge(right).to_frame()
+        pd.testing.assert_frame_equal(merged, top_exceedances(evaluated, 3))
+
+    def test_heaps_are_bounded_and_ordered(self, evaluated):
+        """Tests that at most K entries are kept, most critical first."""
+        result = top_exceedances(evaluated, 2)
+        assert result.groupby("criticality").size().max() <= 2
+        assert result["criticality"].tolist()[0] == "Critical"
+        assert result.groupby("criticality")["rank"].apply(list).iloc[0] == [1, 2]
+
+    def test_quantity_weights_the_score(self):
+        """Tests that a small exceedance on many parts outranks a single part."""
+        evaluated = evaluate_numpy(
+            pd.DataFrame(
+                {
+                    "job_number": ["WO-1", "WO-2"],
+                    "sample_serial_number": ["SN-1", "SN-2"],
+                    "dimension_id": ["Char 1", "Char 1"],
+                    "measured_value": [0.5020, 0.5012],
+                    "nominal_value": [0.5, 0.5],
+                    "original_upper_tol": [0.501, 0.501],
+                    "original_lower_tol": [0.499, 0.499],
+                    "criticality": ["Critical", "Critical"],
+                    "quantity": [1, 50],
+                }
+            ),
+            0.0,
+        )
+        result = top_exceedances(evaluated, 1)
+        assert result["sample_serial_number"].tolist() == ["SN-2"]
+        assert result["score"].iloc[0] == pytest.approx(0.0002 * 50)
+
+    def test_rejects_empty_k(self):
+        """Tests that K must be positive."""
+        with pytest.raises(ValueError):
+            TopExceedances(0)
@@ -0,0 +1,140 @@
+"""Unit tests for mixed-unit measurement histories."""
+
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+import pytest
+from oot_engine import evaluate_fixed_point, evaluate_numpy
+from unit_conversion import (
+    CANONICAL_UNITS,
+    LOGGED_UNIT_COLUMN,
+    UNIT_COLUMN,
+    VALUE_COLUMNS,
+    conversion_factor,
+    known_units_mask,
+    logged_units,
+    normalize_units,
+    unit_counts,
+)
+
+# Three parts logged in inches.
+INCHES = {
+    "measured_value": [0.5005, 3.0001, 0.7511],
+    "nominal_value": [0.5000, 3.0000, 0.7500],
+    "original_upper_tol": [0.5010, 3.0005, 0.7510],
+    "original_lower_tol": [0.4990, 2.9995, 0.7490],
+    "criticality": ["Critical", "NotSpecified", "Minor"],
+    UNIT_COLUMN: "in",
+}
+
+
+@pytest.fixture
+def mixed_history(make_history):
+    """Builds the inch history followed by the same parts logged in mm."""
+    inches = make_history(**INCHES)
+    mm = inches.copy()
+    for column in VALUE_COLUMNS:
+        mm[column] = [float(Fraction(str(v)) * Fraction(254, 10)) for v in mm[column]]
+    mm[UNIT_COLUMN] = ["mm", " MM ", "millimetres"]
+    return pd.concat([inches, mm], ignore_index=True)
+
+
+class TestNormalizeUnits:
+    """Test suite for unit normalization at ingestion."""
+
+    def test_factors_are_exact(self):
+        """Tests that one inch is exactly 25.4 mm."""
+        assert conversion_factor("in", "mm") == Fraction(254, 10)
+        assert conversion_factor("millimeter", "inch") == Fraction(10, 254)
+        assert conversion_factor("mil", "um") == Fraction(254, 10)
+
+    def test_labels_normalized_and_unknown_set_aside(self):
+        """Tests that spellings are canonicalized and unknown units flagged."""
+        df = pd.DataFrame(
+            {
+                "measured_value": [1.0, 2.0, 3.0, 4.0, 5.0],
+                UNIT_COLUMN: ["Inches", "mm", "furlong", None, "µm"],
+            }
+        )
+        known, unknown = normalize_units(df, "mm")
+        assert known[LOGGED_UNIT_COLUMN].tolist() == ["in", "mm", "um"]
+        assert known[UNIT_COLUMN].tolist() == ["mm", "mm", "mm"]
+        assert list(known[UNIT_COLUMN].cat.categories) == CANONICAL_UNITS
+        assert known["measured_value"].tolist() == [25.4, 2.0, 0.005]
+        assert unknown["measured_value"].tolist() == [3.0, 4.0]
+        assert logged_units(known) == ["in", "mm", "um"]
+
+    def test_history_without_units_unchanged(self, make_history):
+        """Tests that a history without a unit column passes through."""
+        df = make_history(**INCHES).drop(columns=UNIT_COLUMN)
+        known, unknown = normalize_units(df, "in")
+        assert known is df
+        assert unknown.empty
+        assert logged_units(known) == []
+
+    def test_unknown_target_unit_rejected(self, make_history):
+        """Tests that the certificate's unit must be recognized."""
+        with pytest.raises(ValueError):
+            normalize_units(make_history(**INCHES), "furlong")
+
+    def test_unit_counts(self):
+        """Tests that the rows of each unit are counted, unknown under None."""
+        df = pd.DataFrame({UNIT_COLUMN: ["in", "furlong", None, " MM ", "Inches"]})
+        assert unit_counts(df) == {None: 2, "in": 2, "mm": 1}
+        assert unit_counts(df.drop(columns=UNIT_COLUMN)) == {}
+
+    def test_spark_unit_counts_match_pandas(self):
+        """Tests that the Spark aggregate counts the same units."""
+        pytest.importorskip("pyspark")
+        from pyspark.sql import SparkSession
+
+        spark = SparkSession.builder.master("local[1]").getOrCreate()
+        labels = ["in", "furlong", None, " MM ", "Inches"]
+        df = pd.DataFrame({UNIT_COLUMN: labels})
+        spark_df = spark.createDataFrame([(label,) for label in labels], UNIT_COLUMN)
+        assert unit_counts(spark_df) == unit_counts(df)
+
+    def test_known_units_mask(self):
+        """Tests that the mask marks the rows ``normalize_units`` keeps."""
+        df = pd.DataFrame({UNIT_COLUMN: ["in", "furlong", None, " MM "]})
+        assert known_units_mask(df).tolist() == [True, False, False, True]
+        assert known_units_mask(df.drop(columns=UNIT_COLUMN)).all()
+
+    def test_single_unit_history_keeps_its_columns(self, make_history):
+        """Tests that a history in the target unit is not rescaled."""
+        history = make_history(**INCHES)
+        rescaled, _ = normalize_units(history, "in")
+        for column in VALUE_COLUMNS:
+            assert np.shares_memory(
+                rescaled[column].to_numpy(), history[column].to_numpy()
+            )
+
+
+class TestRescaledHistory:
+    """Test suite for values rescaled into the certificate's unit."""
+
+    def test_values_rescaled_into_certificate_unit(self, mixed_history):
+        """Tests that mm rows are rescaled to the same inch values."""
+        rescaled, _ = normalize_units(mixed_history, "in")
+        for column in VALUE_COLUMNS:
+            values = rescaled[column].to_numpy()
+            np.testing.assert_allclose(values[3:], values[:3], rtol=0, atol=1e-15)
+        assert logged_units(rescaled) == ["in", "mm"]
+
+    def test_inch_rows_are_untouched(self, make_history, mixed_history):
+        """Tests that rows already in the certificate's unit keep their bits."""
+        rescaled, _ = normalize_units(mixed_history, "in")
+        original = make_history(**INCHES)
+        for column in VALUE_COLUMNS:
+            assert rescaled[column][:3].tolist() == original[column].tolist()
+
+    @pytest.mark.parametrize("deviation", [-0.0015, 0.0011, -0.0002])
+    def test_status_matches_across_units(self, make_history, mixed_history, deviation):
+        """Tests that parts logged in mm get the same status as in inches."""
+        rescaled, _ = normalize_units(mixed_history, "in")
+        for engine in (evaluate_numpy, evaluate_fixed_point):
+            status = engine(rescaled, deviation)["final_status"].tolist()
+            assert status[:3] == status[3:]
+            expected = engine(make_history(**INCHES), deviation)["final_status"]
+            assert status[:3] == expected.tolist()
@@ -0,0 +1,168 @@
+"""Unit tests for zone-map fast clearance."""
+
+import pytest
+from allowance_rules import AllowanceRules
+from measurement_store import write_measurements
+from oot_engine import STATUS_FAIL, ErrorCurve, evaluate_numpy
+from unit_conversion import VALUE_COLUMNS
+from zone_maps import ZoneMap, load_store_zone_map, open_store_zone_map
+
+# Two zones of tool BC1.
+ZONES = {
+    "measured_value": [0.5005, 0.5002, 1.2490],
+    "nominal_value": [0.5000, 0.5000, 1.2500],
+    "original_upper_tol": [0.5010, 0.5010, 1.2520],
+    "original_lower_tol": [0.4990, 0.4990, 1.2480],
+    "criticality": ["Critical", "Critical", "Minor"],
+    "feature_name": ["Hole Diameter", "Hole Diameter", "Step Height"],
+}
+
+
+class TestZoneMapSummaries:
+    """Test suite for maintaining zone summaries."""
+
+    def test_ingest_records_zone_summary(self, make_history):
+        """Tests that a zone records counts, extremes and margins."""
+        zone_map = ZoneMap().ingest(make_history(**ZONES))
+        zone = zone_map.zones[("BC1", "Hole Diameter", "Critical")]
+        assert zone["row_count"] == 2
+        assert zone["min_measured"] == pytest.approx(0.5002)
+        assert zone["max_measured"] == pytest.approx(0.5005)
+        assert zone["min_upper_margin"] == pytest.approx(0.0005)
+        assert zone["min_lower_margin"] == pytest.approx(0.0012)
+
+    def test_incremental_ingest_matches_single_ingest(self, make_history):
+        """Tests that ingesting in batches gives the same summaries."""
+        history = make_history(**ZONES)
+        batched = ZoneMap().ingest(history.iloc[:1]).ingest(history.iloc[1:])
+        assert batched.zones == ZoneMap().ingest(history).zones
+
+    def test_save_and_load_round_trip(self, make_history, tmp_path):
+        """Tests that a persisted zone map loads back unchanged."""
+        zone_map = ZoneMap().ingest(make_history(**ZONES))
+        path = tmp_path / "zone_map.json"
+        zone_map.save(path)
+        assert ZoneMap.load(path).zones == zone_map.zones
+
+    def test_zones_are_indexed_by_tool(self, make_history, tmp_path):
+        """Tests that a tool's zones are found among other tools' zones."""
+        history = make_history(**ZONES)
+        other = history.assign(tool_id="BC2")
+        zone_map = ZoneMap().ingest(history).ingest(other.iloc[:1])
+        assert zone_map.tool_zones("BC2") == [("BC2", "Hole Diameter", "Critical")]
+        assert len(zone_map.tool_zones("BC1")) == 2
+        path = tmp_path / "zone_map.json"
+        zone_map.save(path)
+        loaded = ZoneMap.load(path)
+        assert loaded.tool_zones("BC2") == zone_map.tool_zones("BC2")
+        assert loaded.at_risk_zones("BC2", -0.0006) == zone_map.tool_zones("BC2")
+
+    def test_map_for_other_rules_or_unit_is_not_loaded(self, make_history, tmp_path):
+        """Tests that margins computed under other settings are discarded."""
+        path = tmp_path / "zone_map.json"
+        assert ZoneMap.load(path) is None
+        ZoneMap(unit="in").ingest(make_history(**ZONES)).save(path)
+        assert ZoneMap.load(path, unit="inch") is not None
+        assert ZoneMap.load(path, unit="mm") is None
+        assert ZoneMap.load(path, AllowanceRules([{"allowance": 0}]), "in") is None
+
+    def test_values_are_rescaled_into_the_map_unit(self, make_history):
+        """Tests that mm rows are summarized in the map's unit."""
+        history = make_history(**ZONES).assign(units="in")
+        mm = history.copy()
+        for column in VALUE_COLUMNS:
+            mm[column] = mm[column] * 25.4
+        mm["units"] = "mm"
+        inches = ZoneMap(unit="in").ingest(history).zones
+        mixed = ZoneMap(unit="in").ingest(mm).zones
+        for key, zone in inches.items():
+            assert mixed[key]["min_measured"] == pytest.approx(zone["min_measured"])
+            assert mixed[key]["min_upper_margin"] == pytest.approx(
+                zone["min_upper_margin"]
+            )
+
+
+class TestStoreZoneMap:
+    """Test suite for the zone map kept with the measurement store."""
+
+    def test_writes_keep_the_map_current(self, make_history, tmp_path):
+        """Tests that folding each write matches a map of the whole store."""
+        history = make_history(**ZONES)
+        zone_map = open_store_zone_map(tmp_path)
+        write_measurements(history.iloc[:1], tmp_path, zone_map)
+        write_measurements(history.iloc[1:], tmp_path, zone_map)
+        loaded = load_store_zone_map(tmp_path)
+        assert loaded.zones == ZoneMap().ingest(history).zones
+
+    def test_write_without_the_map_makes_it_outdated(self, make_history, tmp_path):
+        """Tests that a map missing a write is neither used nor extended."""
+        history = make_history(**ZONES)
+        zone_map = open_store_zone_map(tmp_path)
+        write_measurements(history, tmp_path, zone_map)
+        write_measurements(history, tmp_path)
+        assert load_store_zone_map(tmp_path) is None
+        with pytest.raises(ValueError):
+            write_measurements(history, tmp_path, zone_map)
+
+    def test_outdated_map_is_rebuilt_from_the_store(self, make_history, tmp_path):
+        """Tests that opening an outdated map summarizes every stored row."""
+        history = make_history(**ZONES)
+        write_measurements(history, tmp_path)
+        write_measurements(history, tmp_path)
+        zone_map = open_store_zone_map(tmp_path)
+        zone = zone_map.zones[("BC1", "Hole Diameter", "Critical")]
+        assert zone["row_count"] == 4
+        assert load_store_zone_map(tmp_path).zones == zone_map.zones
+
+
+class TestZoneMapClearance:
+    """Test suite for clearing and pruning OOT tickets."""
+
+    def test_small_deviation_is_cleared(self, make_history):
+        """Tests that a deviation smaller than every margin clears the ticket."""
+        zone_map = ZoneMap().ingest(make_history(**ZONES))
+        assert zone_map.can_clear("BC1", -0.0004)
+
+    def test_large_deviation_is_not_cleared(self, make_history):
+        """Tests that a deviation beyond the tightest margin is at risk."""
+        zone_map = ZoneMap().ingest(make_history(**ZONES))
+        assert zone_map.at_risk_zones("BC1", -0.0006) == [
+            ("BC1", "Hole Diameter", "Critical")
+        ]
+
+    def test_deviation_exactly_at_margin_is_not_cleared(self, make_history):
+        """Tests that a boundary deviation is left for Block 7 to decide."""
+        zone_map = ZoneMap().ingest(make_history(**ZONES))
+        zone = zone_map.zones[("BC1", "Hole Diameter", "Critical")]
+        assert not zone_map.can_clear("BC1", -zone["min_upper_margin"])
+
+    def test_prune_keeps_every_failure(self, make_history):
+        """Tests that pruning never drops a row that Block 7 would fail."""
+        history = make_history(**ZONES)
+        zone_map = ZoneMap().ingest(history)
+        for deviation in [-0.0030, -0.0006, 0.0, 0.0006, 0.0030]:
+            pruned = zone_map.prune(history, "BC1", deviation)
+            all_failures = evaluate_numpy(history, deviation)["final_status"]
+            pruned_failures = evaluate_numpy(pruned, deviation)["final_status"]
+            assert (pruned_failures == STATUS_FAIL).sum() == (
+                all_failures == STATUS_FAIL
+            ).sum()
+
+    def test_prune_mask_marks_the_pruned_rows(self, make_history):
+        """Tests that the mask marks the rows ``prune`` keeps."""
+        history = make_history(**ZONES)
+        zone_map = ZoneMap().ingest(history)
+        mask = zone_map.prune_mask(history, "BC1", -0.0006)
+        assert mask.tolist() == [True, True, False]
+        assert history[mask].equals(zone_map.prune(history, "BC1", -0.0006))
+
+    def test_unknown_tool_is_cleared(self, make_history):
+        """Tests that a tool with no measurements has nothing at risk."""
+        zone_map = ZoneMap().ingest(make_history(**ZONES))
+        assert zone_map.can_clear("BC999", -0.0100)
+
+    def test_error_curve_uses_zone_size_range(self, make_history):
+        """Tests that a curve is judged by its error over each zone's sizes."""
+        zone_map = ZoneMap().ingest(make_history(**ZONES))
+        curve = ErrorCurve([0.6, 1.2], [0.0, -0.0040])
+        assert zone_map.at_risk_zones("BC1", curve) == [("BC1", "Step Height", "Minor")]
@@ -0,0 +1,317 @@
+"""CalibrationIQ: Per-ticket evaluated readings for incremental re-analysis.
+
+An OOT ticket often stays open while production keeps logging measurements.
+After each run the ticket's state is persisted: the ingestion watermark
+(the measurement store's data files already read), the latest evaluated
+date of every reading and the confirmed failures. The store only ever adds
+uniquely named files, so a rerun reads just the files ingested since and
+merges its failures into the stored list; both the query and the evaluation
+of follow-up runs are proportional to the new data. Records that arrive
+late, dated before readings already evaluated, are in new files and are
+still picked up; a date watermark would skip them. Sources without an
+ingestion log (CSV exports) are read in full for the window.
+
+The key check only de-duplicates the rows read: a row is skipped when its
+(tool, job, serial, dimension) was already evaluated at the same or a later
+date, i.e. a duplicate upload or an out-of-date late re-measurement.
+
+A re-measurement replaces the earlier result of its (tool, job, serial,
+dimension): the reading is counted once and a failure it supersedes is
+dropped from the stored list.
+
+The state is tied to a signature of the analysis inputs (certificate,
+evaluation mode, window); when they change the ticket is analyzed in full.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from latest_readings import READING_KEY_COLUMNS
+
+DATE_COLUMN = "measurement_date"
+# A reading's result is replaced by later evaluations of the same key.
+RESULT_KEY_COLUMNS = ["tool_id"] + READING_KEY_COLUMNS
+# A row was evaluated before when its result key and date were.
+ROW_KEY_COLUMNS = RESULT_KEY_COLUMNS + [DATE_COLUMN]
+# Dates are keyed as this text on both engines.
+KEY_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+SPARK_KEY_TIME_FORMAT = "yyyy-MM-dd HH:mm:ss"
+KEY_SEPARATOR = "\x1f"
+STATE_FILE = "state.json"
+FAILURES_FILE = "failures.parquet"
+READINGS_FILE = "readings.parquet"
+
+
+def analysis_signature(inputs):
+    """Returns a stable hash of the inputs that decide a ticket's results.
+
+    Args:
+        inputs: JSON-serializable description of the analysis inputs
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    text = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _row_key_frame(df):
+    """Returns the row key of each row of a pandas DataFrame as text."""
+    frame = df[RESULT_KEY_COLUMNS].astype(str)
+    stamps = pd.to_datetime(df[DATE_COLUMN])
+    frame[DATE_COLUMN] = stamps.dt.strftime(KEY_TIME_FORMAT).to_numpy()
+    return frame
+
+
+def _split_row_keys(keys):
+    """Splits delimited row keys (a pandas Series) into the key columns."""
+    if not len(keys):
+        return pd.DataFrame(columns=ROW_KEY_COLUMNS, dtype=str)
+    return (
+        keys.str.split(KEY_SEPARATOR, expand=True)
+        .set_axis(ROW_KEY_COLUMNS, axis=1)
+        .reset_index(drop=True)
+    )
+
+
+def _row_keys(df):
+    """Returns the distinct row keys of a pandas or Spark DataFrame as text."""
+    if hasattr(df, "rdd"):
+        return _split_row_keys(
+            df.select(_row_key_column().alias("_row_key"))
+            .distinct()
+            .toPandas()["_row_key"]
+        )
+    return _row_key_frame(df).drop_duplicates()
+
+
+def _row_key_column():
+    """Returns the row key of each Spark row as one delimited string."""
+    from pyspark.sql.functions import col, concat_ws, date_format, to_timestamp
+
+    parts = [
+        (
+            date_format(to_timestamp(col(name)), SPARK_KEY_TIME_FORMAT)
+            if name == DATE_COLUMN
+            else col(name).cast("string")
+        )
+        for name in ROW_KEY_COLUMNS
+    ]
+    return concat_ws(KEY_SEPARATOR, *parts)
+
+
+def _key_index(frame, columns):
+    return pd.MultiIndex.from_frame(frame[columns].astype(str))
+
+
+class TicketState:
+    """Evaluated readings and failures of one ticket's previous runs.
+
+    Args:
+        ticket_id: The OOT ticket
+        signature: ``analysis_signature`` of the inputs the state belongs to
+        readings: pandas DataFrame of the row keys evaluated so far, as text,
+            with the latest evaluated date of each (tool, job, serial,
+            dimension)
+        failures: pandas DataFrame of the confirmed failures so far
+        ingested_files: The measurement store's data files read so far, or
+            None when the ticket was not read from a store
+    """
+
+    def __init__(
+        self, ticket_id, signature, readings=None, failures=None, ingested_files=None
+    ):
+        self.ticket_id = ticket_id
+        self.signature = signature
+        if readings is None:
+            readings = pd.DataFrame(columns=ROW_KEY_COLUMNS, dtype=str)
+        self.readings = readings
+        self.failures = failures
+        self.ingested_files = ingested_files
+
+    @property
+    def evaluated_rows(self):
+        """Number of distinct readings evaluated over all runs."""
+        return len(self.readings)
+
+    @property
+    def failure_count(self):
+        """Number of confirmed failures over all runs."""
+        return 0 if self.failures is None else len(self.failures)
+
+    def unread_files(self, files):
+        """Returns the store's data files not read by previous runs.
+
+        Args:
+            files: The store's current data files (see ``data_files``)
+
+        Returns:
+            list: The files ingested since the last run, or None when the
+            ticket has no ingestion watermark and the store must be read
+            in full
+        """
+        if self.ingested_files is None or not len(self.readings):
+            return None
+        ingested = set(self.ingested_files)
+        return [name for name in files if name not in ingested]
+
+    def _evaluated(self, keys):
+        """Marks the row keys (text frame) evaluated at the same or a later date."""
+        latest = (
+            self.readings.set_index(RESULT_KEY_COLUMNS)[DATE_COLUMN]
+            .reindex(pd.MultiIndex.from_frame(keys[RESULT_KEY_COLUMNS]))
+            .fillna("")
+            .to_numpy(dtype=object)
+        )
+        # Key dates are zero-padded text, so they compare in date order.
+        return latest >= keys[DATE_COLUMN].to_numpy(dtype=object)
+
+    def new_rows(self, df):
+        """Keeps the rows that previous runs have not evaluated.
+
+        Args:
+            df: pandas or Spark DataFrame of the rows read for this run
+
+        Returns:
+            DataFrame: The rows whose reading was not evaluated at the same
+            or a later date, including late records of new readings
+        """
+        if not len(self.readings):
+            return df
+        if hasattr(df, "rdd"):
+            from pyspark.sql.functions import broadcast
+
+            # The keys of the rows read are collected, so only the ones
+            # already evaluated are broadcast back, not the whole state.
+            keys = _row_keys(df)
+            seen = keys[self._evaluated(keys)]
+            if not len(seen):
+                return df
+            seen = df.sparkSession.createDataFrame(
+                [(KEY_SEPARATOR.join(key),) for key in seen.itertuples(index=False)],
+                ["_row_key"],
+            )
+            return (
+                df.withColumn("_row_key", _row_key_column())
+                .join(broadcast(seen), "_row_key", "left_anti")
+                .drop("_row_key")
+            )
+        if not len(df):
+            return df
+        return df[self.new_row_mask(df)]
+
+    def new_row_mask(self, df, rows=None):
+        """Marks the rows of a pandas DataFrame not evaluated before.
+
+        Args:
+            df: pandas DataFrame of the rows read for this run
+            rows: Boolean mask of the rows to check; all rows when None
+
+        Returns:
+            ndarray: Boolean mask over the rows of ``df``, False outside
+            ``rows``
+        """
+        new = (
+            np.ones(len(df), dtype=bool) if rows is None else np.array(rows, dtype=bool)
+        )
+        if not len(self.readings) or not new.any():
+            return new
+        positions = np.flatnonzero(new)
+        candidates = _row_key_frame(df[ROW_KEY_COLUMNS].iloc[positions])
+        new[positions] = ~self._evaluated(candidates)
+        return new
+
+    def advance(self, df, files=None):
+        """Records the rows this run evaluated.
+
+        Each (tool, job, serial, dimension) keeps the date of its latest
+        evaluated reading.
+
+        Args:
+            df: pandas or Spark DataFrame of the rows this run evaluated
+            files: The store's data files this run read up to, which become
+                the ingestion watermark
+        """
+        if files is not None:
+            self.ingested_files = sorted(set(self.ingested_files or []) | set(files))
+        merged = pd.concat([self.readings, _row_keys(df)], ignore_index=True)
+        merged = merged.sort_values(DATE_COLUMN, kind="stable")
+        self.readings = merged.drop_duplicates(
+            RESULT_KEY_COLUMNS, keep="last"
+        ).reset_index(drop=True)
+
+    def add_failures(self, failures, evaluated=None):
+        """Merges this run's failures into the stored failure list.
+
+        A stored failure is dropped when this run evaluated a newer reading
+        of the same (tool, job, serial, dimension), whether or not that
+        reading failed as well.
+
+        Args:
+            failures: pandas or Spark DataFrame of new failures, or None
+            evaluated: pandas or Spark DataFrame of the rows this run
+                evaluated, or None
+        """
+        if evaluated is not None and self.failures is not None:
+            replaced = _key_index(_row_keys(evaluated), RESULT_KEY_COLUMNS)
+            stored = _key_index(self.failures, RESULT_KEY_COLUMNS)
+            self.failures = self.failures[~stored.isin(replaced)]
+        if failures is None:
+            return
+        if hasattr(failures, "rdd"):
+            failures = failures.toPandas()
+        if self.failures is None:
+            merged = failures
+        else:
+            merged = pd.concat([self.failures, failures], ignore_index=True)
+        self.failures = merged.drop_duplicates(RESULT_KEY_COLUMNS, keep="last")
+
+    def save(self, state_dir):
+        """Persists the state under ``state_dir/<ticket_id>``."""
+        path = os.path.join(state_dir, self.ticket_id)
+        os.makedirs(path, exist_ok=True)
+        state = {
+            "ticket_id": self.ticket_id,
+            "signature": self.signature,
+            "ingested_files": self.ingested_files,
+        }
+        with open(os.path.join(path, STATE_FILE), "w") as f:
+            json.dump(state, f, indent=2)
+        self.readings.to_parquet(os.path.join(path, READINGS_FILE), index=False)
+        if self.failures is not None:
+            self.failures.to_parquet(os.path.join(path, FAILURES_FILE), index=False)
+
+    @classmethod
+    def load(cls, state_dir, ticket_id, signature):
+        """Loads a ticket's state, or returns None when there is no usable state.
+
+        A state written for a different analysis signature is ignored, so a
+        changed certificate or configuration triggers a full analysis.
+        """
+        path = os.path.join(state_dir, ticket_id)
+        state_path = os.path.join(path, STATE_FILE)
+        if not os.path.exists(state_path):
+            return None
+        with open(state_path) as f:
+            state = json.load(f)
+        if state["signature"] != signature:
+            return None
+        failures = None
+        failures_path = os.path.join(path, FAILURES_FILE)
+        if os.path.exists(failures_path):
+            failures = pd.read_parquet(failures_path)
+        readings = None
+        readings_path = os.path.join(path, READINGS_FILE)
+        if os.path.exists(readings_path):
+            readings = pd.read_parquet(readings_path)
+        return cls(
+            ticket_id,
+            signature,
+            readings=readings,
+            failures=failures,
+            ingested_files=state.get("ingested_files"),
+        )
@@ -0,0 +1,194 @@
+"""CalibrationIQ: Streaming top-K worst exceedances per criticality.
+
+The triage list engineers start from ranks failures by criticality and by
+how far they are beyond their expanded limits, weighted by the quantity of
+parts affected. Instead of sorting the whole failure set, a bounded min-heap
+of K entries is kept per criticality. Chunks of a local export and Spark
+partitions each build their own heaps, which are merged at the end, so the
+work is O(n log K) and the memory O(K) per criticality.
+"""
+
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from part_rollup import CRITICALITY_ORDER
+
+DEFAULT_RECORD_COLUMNS = ["job_number", "sample_serial_number", "dimension_id"]
+QUANTITY_COLUMN = "quantity"
+
+
+def _exceedance(df):
+    """Returns how far each adjusted value is beyond its expanded limits."""
+    adjusted = df["adjusted_value"].to_numpy(dtype=np.float64)
+    return np.maximum(
+        adjusted - df["expanded_upper_tol"].to_numpy(dtype=np.float64),
+        df["expanded_lower_tol"].to_numpy(dtype=np.float64) - adjusted,
+    )
+
+
+class TopExceedances:
+    """Bounded heaps of the K worst weighted exceedances per criticality.
+
+    Each heap entry is ``(score, key, values)``: the weighted exceedance,
+    the record as strings for a deterministic tie-break, and the record
+    values. The smallest kept score sits at the root, so a new row only
+    enters a full heap when it beats it.
+
+    Args:
+        k: Number of exceedances to keep per criticality
+        record_columns: Columns identifying each reported characteristic
+        quantity_column: Column with the quantity of parts each row
+            represents; rows count once when it is missing
+    """
+
+    def __init__(
+        self,
+        k,
+        record_columns=DEFAULT_RECORD_COLUMNS,
+        quantity_column=QUANTITY_COLUMN,
+    ):
+        if k < 1:
+            raise ValueError("k must be at least 1.")
+        self.k = k
+        self.record_columns = list(record_columns)
+        self.quantity_column = quantity_column
+        self.heaps = {}
+
+    def add(self, criticality, score, values):
+        """Offers one weighted exceedance to its criticality's heap."""
+        entry = (float(score), tuple(str(value) for value in values), tuple(values))
+        heap = self.heaps.setdefault(criticality, [])
+        if len(heap) < self.k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    def update(self, df):
+        """Folds a pandas chunk of evaluated measurements into the heaps.
+
+        Rows inside their expanded limits are skipped. Within each
+        criticality only rows scoring at least the chunk's K-th largest
+        score are offered to the heap, so ties are kept and the result does
+        not depend on how the data is chunked.
+
+        Returns:
+            TopExceedances: ``self``, so calls can be chained
+        """
+        scores = _exceedance(df)
+        if self.quantity_column in df:
+            scores = scores * df[self.quantity_column].to_numpy(dtype=np.float64)
+        outside = np.flatnonzero(scores > 0)
+        if outside.size == 0:
+            return self
+
+        criticality = df["criticality"].to_numpy(dtype=object)[outside]
+        records = df[self.record_columns].iloc[outside]
+        for label in pd.unique(criticality):
+            rows = np.flatnonzero(criticality == label)
+            if rows.size > self.k:
+                kth = np.partition(scores[outside[rows]], rows.size - self.k)
+                rows = rows[scores[outside[rows]] >= kth[rows.size - self.k]]
+            for row in rows:
+                self.add(
+                    label,
+                    scores[outside[row]],
+                    records.iloc[row].tolist(),
+                )
+        return self
+
+    def update_rows(self, rows):
+        """Folds an iterable of Spark Rows (one partition) into the heaps.
+
+        Returns:
+            TopExceedances: ``self``, so calls can be chained
+        """
+        for row in rows:
+            exceedance = max(
+                row["adjusted_value"] - row["expanded_upper_tol"],
+                row["expanded_lower_tol"] - row["adjusted_value"],
+            )
+            quantity = 1.0
+            if self.quantity_column in row:
+                quantity = float(row[self.quantity_column])
+            score = exceedance * quantity
+            if score > 0:
+                values = [row[name] for name in self.record_columns]
+                self.add(row["criticality"], score, values)
+        return self
+
+    def merge(self, other):
+        """Merges another instance's heaps (e.g. from another partition).
+
+        Returns:
+            TopExceedances: ``self``, so calls can be chained
+        """
+        for criticality, heap in other.heaps.items():
+            for score, _, values in heap:
+                self.add(criticality, score, values)
+        return self
+
+    def to_frame(self):
+        """Returns the kept exceedances, most critical and largest first.
+
+        Returns:
+            DataFrame: One row per kept exceedance with its criticality, rank
+            within the criticality, weighted ``score`` and record columns
+        """
+        order = {label: rank for rank, label in enumerate(CRITICALITY_ORDER)}
+        rows = []
+        for criticality in sorted(
+            self.heaps, key=lambda label: order.get(label, -1), reverse=True
+        ):
+            ranked = sorted(self.heaps[criticality], reverse=True)
+            for rank, (score, _, values) in enumerate(ranked, start=1):
+                rows.append((criticality, rank, score, *values))
+        return pd.DataFrame(
+            rows, columns=["criticality", "rank", "score"] + self.record_columns
+        )
+
+
+def top_exceedances(chunks, k, **kwargs):
+    """Finds the K worst weighted exceedances per criticality.
+
+    Args:
+        chunks: An evaluated pandas DataFrame, an iterable of them (e.g. a
+            chunked CSV reader), or an evaluated Spark DataFrame
+        k: Number of exceedances to keep per criticality
+        **kwargs: Passed through to ``TopExceedances``
+
+    Returns:
+        DataFrame: The result of ``TopExceedances.to_frame``
+    """
+    if hasattr(chunks, "rdd"):
+        return top_exceedances_spark(chunks, k, **kwargs).to_frame()
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    top = TopExceedances(k, **kwargs)
+    for chunk in chunks:
+        top.update(chunk)
+    return top.to_frame()
+
+
+def top_exceedances_spark(df, k, **kwargs):
+    """Builds per-partition heaps in Spark and merges them on the driver.
+
+    Each partition returns one ``TopExceedances`` of at most K entries per
+    criticality, so nothing but the heaps leaves the executors.
+
+    Args:
+        df: Spark DataFrame evaluated by one of the Block 7 engines
+        k: Number of exceedances to keep per criticality
+        **kwargs: Passed through to ``TopExceedances``
+
+    Returns:
+        TopExceedances: The merged heaps
+    """
+
+    def partition_heaps(rows):
+        yield TopExceedances(k, **kwargs).update_rows(row.asDict() for row in rows)
+
+    return df.rdd.mapPartitions(partition_heaps).fold(
+        TopExceedances(k, **kwargs), lambda left, right: left.merge(right)
+    )
@@ -0,0 +1,258 @@
+"""CalibrationIQ: Measurement units of mixed-unit histories.
+
+Certificates state the tool deviation in one unit (Block 3 extracts it, e.g.
+"in"), while plants may log their measurements in millimetres. Ingestion
+normalizes each history row's unit label to a canonical unit, sets aside
+rows whose unit is not recognized and rescales the measured value and limits
+into the certificate's unit. The labels are resolved once per distinct
+label, not per row, and the rescaling is one vectorized multiply per column
+with the factor of each row's unit group, so the check stays off the hot
+path. Every later step (evaluation, zone maps, statistics, rollups) then
+compares values in one unit; the logged unit is kept in its own column.
+
+Conversion factors are exact fractions (one inch is defined as exactly
+25.4 mm), rounded to float64 once per unit, which is far below tenth-micron
+tolerances.
+"""
+
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+
+UNIT_COLUMN = "units"
+LOGGED_UNIT_COLUMN = "logged_units"
+# Columns rescaled into the certificate's unit at ingestion.
+VALUE_COLUMNS = [
+    "measured_value",
+    "nominal_value",
+    "original_upper_tol",
+    "original_lower_tol",
+]
+
+# Exact size of each canonical unit in millimetres.
+UNIT_SIZES_MM = {
+    "in": Fraction(254, 10),
+    "mil": Fraction(254, 10000),
+    "mm": Fraction(1),
+    "um": Fraction(1, 1000),
+}
+
+# Spellings found in measurement exports, compared lower-cased and stripped.
+UNIT_ALIASES = {
+    "in": "in",
+    "in.": "in",
+    "inch": "in",
+    "inches": "in",
+    '"': "in",
+    "mil": "mil",
+    "mils": "mil",
+    "thou": "mil",
+    "mm": "mm",
+    "millimeter": "mm",
+    "millimeters": "mm",
+    "millimetre": "mm",
+    "millimetres": "mm",
+    "um": "um",
+    "µm": "um",
+    "μm": "um",
+    "micron": "um",
+    "microns": "um",
+    "micrometer": "um",
+    "micrometers": "um",
+    "micrometre": "um",
+    "micrometres": "um",
+}
+CANONICAL_UNITS = list(UNIT_SIZES_MM)
+
+
+def canonical_unit(label):
+    """Returns the canonical unit of a label, or None if it is not recognized."""
+    if label is None or (isinstance(label, float) and np.isnan(label)):
+        return None
+    return UNIT_ALIASES.get(str(label).strip().lower())
+
+
+def conversion_factor(from_unit, to_unit):
+    """Returns the exact factor converting values from one unit to another.
+
+    Raises:
+        ValueError: If either unit is not recognized
+    """
+    sizes = []
+    for label in (from_unit, to_unit):
+        unit = canonical_unit(label)
+        if unit is None:
+            raise ValueError(f"Unknown measurement unit '{label}'.")
+        sizes.append(UNIT_SIZES_MM[unit])
+    return sizes[0] / sizes[1]
+
+
+def _factors_to(target_unit):
+    """Returns the float64 factor from each canonical unit to ``target_unit``."""
+    return np.array(
+        [float(conversion_factor(unit, target_unit)) for unit in CANONICAL_UNITS],
+        dtype=np.float64,
+    )
+
+
+def _unit_codes(labels):
+    """Returns each label's index in ``CANONICAL_UNITS``, -1 when unknown."""
+    if isinstance(labels.dtype, pd.CategoricalDtype):
+        codes = labels.cat.codes.to_numpy()
+        uniques = labels.cat.categories
+    else:
+        codes, uniques = pd.factorize(labels)
+    # Each distinct label is resolved once; -1 (missing) stays unknown.
+    lookup = np.array(
+        [
+            CANONICAL_UNITS.index(unit) if unit is not None else -1
+            for unit in map(canonical_unit, uniques)
+        ]
+        + [-1],
+        dtype=np.int64,
+    )
+    return lookup[codes]
+
+
+def known_units_mask(df):
+    """Marks the rows of a pandas DataFrame whose unit is recognized.
+
+    Returns:
+        ndarray: Boolean mask over the rows of ``df``; all True for
+        histories without a ``units`` column
+    """
+    if UNIT_COLUMN not in df:
+        return np.ones(len(df), dtype=bool)
+    return _unit_codes(df[UNIT_COLUMN]) >= 0
+
+
+def unit_counts(df):
+    """Counts the rows of each canonical unit of a history in one pass.
+
+    On Spark this is a single small aggregate, so the unrecognized-unit
+    count and the logged units do not each cost a job over the history.
+
+    Returns:
+        dict: Canonical unit -> row count, with rows whose unit is missing
+        or not recognized under None; empty for histories without a
+        ``units`` column
+    """
+    if hasattr(df, "rdd"):
+        if UNIT_COLUMN not in df.columns:
+            return {}
+        from pyspark.sql.functions import col, count, lit
+
+        unit = _canonical_unit_spark(col(UNIT_COLUMN)).alias("_unit")
+        rows = df.groupBy(unit).agg(count(lit(1))).collect()
+        return {row[0]: row[1] for row in rows}
+    if UNIT_COLUMN not in df:
+        return {}
+    counts = np.bincount(
+        _unit_codes(df[UNIT_COLUMN]) + 1, minlength=len(CANONICAL_UNITS) + 1
+    )
+    units = [None] + CANONICAL_UNITS
+    return {units[code]: int(n) for code, n in enumerate(counts) if n}
+
+
+def normalize_units(df, target_unit):
+    """Normalizes and rescales the measurements at ingestion.
+
+    Args:
+        df: pandas or Spark DataFrame of measurements. Histories without a
+            ``units`` column are in the certificate's unit and are returned
+            unchanged
+        target_unit: The certificate's unit, which the values are rescaled to
+
+    Returns:
+        tuple: (measurements in ``target_unit``, measurements whose unit is
+        missing or not recognized). The logged unit moves to
+        ``logged_units`` and ``units`` holds ``target_unit``; pandas units
+        are categoricals over ``CANONICAL_UNITS``
+
+    Raises:
+        ValueError: If ``target_unit`` is not recognized
+    """
+    target = canonical_unit(target_unit)
+    if target is None:
+        raise ValueError(f"Unknown measurement unit '{target_unit}'.")
+    if hasattr(df, "rdd"):
+        return normalize_units_spark(df, target)
+    if UNIT_COLUMN not in df:
+        return df, df.iloc[:0]
+
+    unit_codes = _unit_codes(df[UNIT_COLUMN])
+    known = unit_codes >= 0
+    if not known.all():
+        df, unknown, unit_codes = df[known], df[~known], unit_codes[known]
+    else:
+        unknown = df.iloc[:0]
+
+    result = df.copy(deep=False)
+    factors = _factors_to(target)[unit_codes]
+    # A history already logged in the target unit keeps its value columns.
+    if not (factors == 1.0).all():
+        for name in VALUE_COLUMNS:
+            if name in result:
+                result[name] = result[name].to_numpy(np.float64) * factors
+    result[LOGGED_UNIT_COLUMN] = pd.Categorical.from_codes(
+        unit_codes, categories=CANONICAL_UNITS
+    )
+    result[UNIT_COLUMN] = pd.Categorical.from_codes(
+        np.full(len(result), CANONICAL_UNITS.index(target)),
+        categories=CANONICAL_UNITS,
+    )
+    return result, unknown
+
+
+def _canonical_unit_spark(labels):
+    """Maps a Spark column of unit labels to canonical units (null if unknown)."""
+    from pyspark.sql.functions import create_map, lit, lower, trim
+
+    pairs = []
+    for alias, unit in UNIT_ALIASES.items():
+        pairs += [lit(alias), lit(unit)]
+    return create_map(*pairs)[lower(trim(labels))]
+
+
+def normalize_units_spark(df, target_unit):
+    """Normalizes and rescales the rows of a Spark DataFrame.
+
+    Returns:
+        tuple: (measurements in ``target_unit``, unrecognized units), see
+        ``normalize_units``
+    """
+    if UNIT_COLUMN not in df.columns:
+        return df, df.limit(0)
+    from pyspark.sql.functions import col, create_map, lit
+
+    labelled = df.withColumn("_unit", _canonical_unit_spark(col(UNIT_COLUMN)))
+    known = labelled.filter(col("_unit").isNotNull())
+    unknown = labelled.filter(col("_unit").isNull()).drop("_unit")
+
+    pairs = []
+    for unit, factor in zip(CANONICAL_UNITS, _factors_to(target_unit)):
+        pairs += [lit(unit), lit(float(factor))]
+    factor = create_map(*pairs)[col("_unit")]
+    for name in VALUE_COLUMNS:
+        if name in known.columns:
+            known = known.withColumn(name, col(name).cast("double") * factor)
+    known = (
+        known.withColumn(LOGGED_UNIT_COLUMN, col("_unit"))
+        .withColumn(UNIT_COLUMN, lit(target_unit))
+        .drop("_unit")
+    )
+    return known, unknown
+
+
+def logged_units(df):
+    """Returns the sorted canonical units a normalized history was logged in."""
+    if hasattr(df, "rdd"):
+        if LOGGED_UNIT_COLUMN not in df.columns:
+            return []
+        return sorted(
+            row[0] for row in df.select(LOGGED_UNIT_COLUMN).distinct().collect()
+        )
+    if LOGGED_UNIT_COLUMN not in df:
+        return []
+    return sorted(df[LOGGED_UNIT_COLUMN].dropna().unique().tolist())
@@ -0,0 +1,319 @@
+"""CalibrationIQ: Zone-map summaries for fast OOT clearance.
+
+A zone map keeps one small summary per (tool, feature, criticality) zone of
+the measurement history. The summaries are updated as measurements are
+ingested, so an OOT ticket can be checked against them before Block 7 ever
+touches the detail data.
+
+The measurement store keeps its zone map next to the Parquet files. Each
+write folds the new batch into it, and the map records the data files it
+summarizes, the allowance rules its margins were computed with and the unit
+its values were rescaled to. A map that no longer matches any of them is
+not used for clearance.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from measurement_store import data_snapshot, open_store, zone_map_path
+from oot_engine import DEFAULT_ALLOWANCE_RULES, expand_limits, rule_config_version
+from unit_conversion import canonical_unit, normalize_units
+
+ZONE_KEY_COLUMNS = ["tool_id", "feature_name", "criticality"]
+
+# Margins within this distance of the deviation are treated as at-risk, so
+# floating-point rounding can never clear a zone that Block 7 would fail.
+CLEARANCE_EPSILON = 1e-12
+
+
+def _empty_summary():
+    return {
+        "row_count": 0,
+        "min_measured": float("inf"),
+        "max_measured": float("-inf"),
+        "min_upper_margin": float("inf"),
+        "min_lower_margin": float("inf"),
+    }
+
+
+def _summarize_pandas(df, rules):
+    """Computes per-zone summaries for a pandas batch of measurements."""
+    measured = df["measured_value"].to_numpy(dtype=np.float64)
+    _, expanded_upper, expanded_lower = expand_limits(
+        df["nominal_value"],
+        df["original_upper_tol"],
+        df["original_lower_tol"],
+        rules.fractions(df),
+    )
+    frame = df[ZONE_KEY_COLUMNS].copy()
+    frame["measured_value"] = measured
+    frame["upper_margin"] = expanded_upper - measured
+    frame["lower_margin"] = measured - expanded_lower
+
+    grouped = frame.groupby(
+        ZONE_KEY_COLUMNS, dropna=False, sort=False, observed=True
+    ).agg(
+        row_count=("measured_value", "size"),
+        min_measured=("measured_value", "min"),
+        max_measured=("measured_value", "max"),
+        min_upper_margin=("upper_margin", "min"),
+        min_lower_margin=("lower_margin", "min"),
+    )
+    for key, row in grouped.iterrows():
+        yield tuple(key), {name: row[name] for name in grouped.columns}
+
+
+def _summarize_spark(df, rules):
+    """Computes per-zone summaries in Spark and collects the small result."""
+    from pyspark.sql import functions as F
+
+    from oot_engine import evaluate_spark
+
+    limits = evaluate_spark(df, 0.0, rules)
+    grouped = limits.groupBy(*ZONE_KEY_COLUMNS).agg(
+        F.count(F.lit(1)).alias("row_count"),
+        F.min("measured_value").alias("min_measured"),
+        F.max("measured_value").alias("max_measured"),
+        F.min(F.col("expanded_upper_tol") - F.col("measured_value")).alias(
+            "min_upper_margin"
+        ),
+        F.min(F.col("measured_value") - F.col("expanded_lower_tol")).alias(
+            "min_lower_margin"
+        ),
+    )
+    for row in grouped.collect():
+        record = row.asDict()
+        key = tuple(record.pop(name) for name in ZONE_KEY_COLUMNS)
+        yield key, record
+
+
+class ZoneMap:
+    """Per-(tool, feature, criticality) summaries of the measurement history.
+
+    Each zone records its row count, the min/max measured value and the
+    smallest distance from any measurement to its expanded upper and lower
+    limits. A measurement stays inside its expanded band after the Block 7
+    adjustment ``measured - deviation`` exactly when
+    ``-upper_margin <= deviation <= lower_margin``, so the two minimum
+    margins decide whether any row in the zone can fail.
+
+    Args:
+        zones: Mapping of zone key -> summary
+        rules: The ``AllowanceRules`` the expanded limits are built with
+        unit: Unit the ingested values are rescaled to, or None to take them
+            as logged
+        snapshot: ``data_snapshot`` of the store files the zones summarize
+
+    Raises:
+        ValueError: If ``unit`` is not recognized
+    """
+
+    def __init__(self, zones=None, rules=None, unit=None, snapshot=None):
+        self.zones = {}
+        # Zone keys by tool, so a ticket only looks at its own tool's zones.
+        self._tool_keys = {}
+        for key, summary in (zones or {}).items():
+            self._add_zone(key, summary)
+        self.rules = rules or DEFAULT_ALLOWANCE_RULES
+        self.unit = None
+        if unit is not None:
+            self.unit = canonical_unit(unit)
+            if self.unit is None:
+                raise ValueError(f"Unknown measurement unit '{unit}'.")
+        self.snapshot = snapshot
+
+    def _add_zone(self, key, summary):
+        self.zones[key] = summary
+        self._tool_keys.setdefault(key[0], []).append(key)
+        return summary
+
+    def ingest(self, df):
+        """Folds a batch of measurements (pandas or Spark) into the zones.
+
+        Args:
+            df: A batch of measurements with the historical schema. With a
+                ``unit``, rows whose unit is not recognized are skipped, as
+                Block 7 never evaluates them
+
+        Returns:
+            ZoneMap: ``self``, so calls can be chained
+        """
+        if self.unit is not None:
+            df, _ = normalize_units(df, self.unit)
+        if hasattr(df, "rdd"):
+            batch = _summarize_spark(df, self.rules)
+        else:
+            batch = _summarize_pandas(df, self.rules)
+        for key, summary in batch:
+            zone = self.zones.get(key)
+            if zone is None:
+                zone = self._add_zone(key, _empty_summary())
+            zone["row_count"] += int(summary["row_count"])
+            zone["min_measured"] = min(zone["min_measured"], summary["min_measured"])
+            zone["max_measured"] = max(zone["max_measured"], summary["max_measured"])
+            zone["min_upper_margin"] = min(
+                zone["min_upper_margin"], summary["min_upper_margin"]
+            )
+            zone["min_lower_margin"] = min(
+                zone["min_lower_margin"], summary["min_lower_margin"]
+            )
+        return self
+
+    def tool_zones(self, tool_id):
+        """Returns the zone keys recorded for one tool."""
+        return list(self._tool_keys.get(tool_id, []))
+
+    def at_risk_zones(self, tool_id, deviation):
+        """Returns the zones of a tool that can hold failures for a deviation.
+
+        Args:
+            tool_id: The OOT tool
+            deviation: The tool deviation (measured - nominal), either a
+                scalar or a per-row deviation providing ``bounds``
+
+        Returns:
+            list: Zone keys whose rows may fall outside their expanded limits
+        """
+        at_risk = []
+        for key in self._tool_keys.get(tool_id, []):
+            zone = self.zones[key]
+            if hasattr(deviation, "bounds"):
+                low, high = deviation.bounds(zone["min_measured"], zone["max_measured"])
+            else:
+                low = high = deviation
+            if (
+                low < -zone["min_upper_margin"] + CLEARANCE_EPSILON
+                or high > zone["min_lower_margin"] - CLEARANCE_EPSILON
+            ):
+                at_risk.append(key)
+        return at_risk
+
+    def can_clear(self, tool_id, deviation):
+        """Returns True when no measurement of the tool can fail."""
+        return not self.at_risk_zones(tool_id, deviation)
+
+    def prune(self, df, tool_id, deviation):
+        """Filters a measurement DataFrame down to the at-risk zones.
+
+        Args:
+            df: pandas or Spark DataFrame of the tool's measurements
+            tool_id: The OOT tool
+            deviation: The tool deviation (measured - nominal), either a
+                scalar or a per-row deviation providing ``bounds``
+
+        Returns:
+            DataFrame: Only the rows belonging to zones that can hold failures
+        """
+        at_risk = self.at_risk_zones(tool_id, deviation)
+        if hasattr(df, "rdd"):
+            from pyspark.sql.functions import broadcast
+
+            keys_df = df.sparkSession.createDataFrame(
+                at_risk, df.select(*ZONE_KEY_COLUMNS).schema
+            )
+            return df.join(broadcast(keys_df), ZONE_KEY_COLUMNS, "left_semi")
+
+        return df[self.prune_mask(df, tool_id, deviation, at_risk)]
+
+    def prune_mask(self, df, tool_id, deviation, at_risk=None):
+        """Marks the rows of a pandas DataFrame in the at-risk zones.
+
+        Args:
+            df: pandas DataFrame of measurements
+            tool_id: The OOT tool
+            deviation: The tool deviation, see ``prune``
+            at_risk: The tool's ``at_risk_zones``, when already computed
+
+        Returns:
+            ndarray: Boolean mask over the rows of ``df``
+        """
+        if at_risk is None:
+            at_risk = self.at_risk_zones(tool_id, deviation)
+        keys = pd.MultiIndex.from_frame(df[ZONE_KEY_COLUMNS])
+        return keys.isin(at_risk)
+
+    def save(self, path):
+        """Persists the zone map as JSON."""
+        records = [
+            dict(zip(ZONE_KEY_COLUMNS, key), **zone) for key, zone in self.zones.items()
+        ]
+        state = {
+            "rules_version": rule_config_version(self.rules),
+            "unit": self.unit,
+            "snapshot": self.snapshot,
+            "zones": records,
+        }
+        with open(path, "w") as f:
+            json.dump(state, f, indent=2)
+
+    @classmethod
+    def load(cls, path, rules=None, unit=None):
+        """Loads a zone map, or returns None when there is no usable map.
+
+        A map saved with other allowance rules or another unit is ignored,
+        since its margins do not apply.
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            state = json.load(f)
+        zone_map = cls(rules=rules, unit=unit, snapshot=state["snapshot"])
+        if state["rules_version"] != rule_config_version(zone_map.rules):
+            return None
+        if state["unit"] != zone_map.unit:
+            return None
+        for record in state["zones"]:
+            key = tuple(record.pop(name) for name in ZONE_KEY_COLUMNS)
+            zone_map._add_zone(key, record)
+        return zone_map
+
+
+def load_store_zone_map(path, rules=None, unit=None):
+    """Loads the measurement store's zone map if it is current.
+
+    Args:
+        path: Root directory of the store
+        rules: The ``AllowanceRules`` in use
+        unit: The unit the map's values must be in
+
+    Returns:
+        ZoneMap: The map, or None when it is missing, was built with other
+        rules or another unit, or does not cover the store's current files
+    """
+    zone_map = ZoneMap.load(zone_map_path(path), rules, unit)
+    if zone_map is None or zone_map.snapshot != data_snapshot(path):
+        return None
+    return zone_map
+
+
+def open_store_zone_map(path, rules=None, unit=None):
+    """Returns the store's current zone map, rebuilding it when needed.
+
+    Ingestion jobs open the map once and pass it to ``write_measurements``,
+    which folds each batch into it. A missing or outdated map is rebuilt
+    from the stored batches and saved.
+
+    Args:
+        path: Root directory of the store
+        rules: The ``AllowanceRules`` in use
+        unit: The unit values are rescaled to, e.g. the plant's certificate
+            unit
+
+    Returns:
+        ZoneMap: The map covering every stored measurement
+    """
+    zone_map = load_store_zone_map(path, rules, unit)
+    if zone_map is not None:
+        return zone_map
+    zone_map = ZoneMap(rules=rules, unit=unit)
+    snapshot = data_snapshot(path)
+    if os.path.isdir(path):
+        for batch in open_store(path).to_batches():
+            zone_map.ingest(batch.to_pandas())
+    zone_map.snapshot = snapshot
+    os.makedirs(path, exist_ok=True)
+    zone_map.save(zone_map_path(path))
+    return zone_map